@@ -0,0 +1,102 @@
+'''
+Created on Oct 18, 2026
+
+Measure how isosurface extraction scales with the number of worker 
+processes, and check that the stitched mesh matches a single marching 
+cubes pass over the whole volume.
+
+Usage (from the ProkaryMetrics folder):
+
+> $> python -m bench.contour [size]
+'''
+from data.imageIO.stack import importVolume
+from render.contour import ContourPool, parallelContour
+
+from multiprocessing import cpu_count
+import numpy as np
+import sys
+import time
+import vtk
+
+
+def syntheticVolume(size, cells=200, seed=0):
+    """
+    Create a size x size x size/4 volume of blurred ellipsoidal blobs 
+    resembling a stained biofilm.
+    """
+    rng = np.random.RandomState(seed)
+    shape = (size // 4, size, size)
+    volume = np.zeros(shape, dtype=np.float32)
+    z, y, x = np.ogrid[:shape[0], :shape[1], :shape[2]]
+    for _ in range(cells):
+        c = rng.uniform(0, 1, 3) * shape
+        r = rng.uniform(2, 6, 3)
+        d = ((z-c[0])/r[0])**2 + ((y-c[1])/r[1])**2 + ((x-c[2])/r[2])**2
+        volume += np.exp(-d)
+    
+    return (volume * 30000).astype(np.uint16)
+
+
+def serialContour(image, values):
+    mc = vtk.vtkMarchingCubes()
+    mc.GenerateValues(1, values)
+    mc.ComputeNormalsOff()
+    mc.ComputeScalarsOff()
+    mc.SetInput(image)
+    mc.Update()
+    return mc.GetOutput()
+
+
+def eulerCharacteristic(polydata):
+    """
+    V - E + F of a triangle mesh; equal meshes have equal characteristics.
+    """
+    edges = vtk.vtkExtractEdges()
+    edges.SetInput(polydata)
+    edges.Update()
+    return (polydata.GetNumberOfPoints() - edges.GetOutput().GetNumberOfCells() 
+            + polydata.GetNumberOfCells())
+
+
+def timeRun(func, repeat=3):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        result = func()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    
+    return best, result
+
+
+def main(size):
+    volume = syntheticVolume(size)
+    importer = importVolume(volume, (0.1, 0.1, 0.56))
+    importer.Update()
+    image = importer.GetOutput()
+    values = (15000, 15000)
+    
+    serial, expected = timeRun(lambda: serialContour(image, values))
+    expectedCounts = (expected.GetNumberOfPoints(), expected.GetNumberOfCells(),
+                      eulerCharacteristic(expected))
+    print 'volume: %s' % (volume.shape,)
+    print '%-14s %8.3fs  points=%i cells=%i euler=%i' % (('serial',serial) + 
+                                                         expectedCounts)
+    
+    workers = 1
+    while workers <= cpu_count():
+        pool = ContourPool(workers)
+        try:
+            t, mesh = timeRun(lambda: parallelContour(image, values, pool))
+        finally:
+            pool.Close()
+        counts = (mesh.GetNumberOfPoints(), mesh.GetNumberOfCells(),
+                  eulerCharacteristic(mesh))
+        status = 'ok' if counts == expectedCounts else 'MISMATCH %s' % (counts,)
+        print '%-14s %8.3fs  (%.2fx)  %s' % ('%i process(es)' % workers, t, 
+                                             serial/t, status)
+        workers *= 2
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 256)
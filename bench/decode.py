@@ -0,0 +1,54 @@
+'''
+Created on Oct 18, 2026
+
+Compare the serial VTK slice reader against parallel decoding into a 
+single volume buffer.
+
+Usage (from the ProkaryMetrics folder):
+
+> $> python -m bench.decode slice_000.tif slice_001.tif ...
+'''
+import data.imageIO.types as imageIOTypes
+
+from multiprocessing import cpu_count
+import os.path
+import sys
+import time
+
+
+def timeLoad(readerClass, paths, workers, repeat=3):
+    """
+    Load the volume repeat times and return the best wall time in seconds.
+    """
+    best = None
+    for _ in range(repeat):
+        imgReader = readerClass(paths, workers)
+        start = time.time()
+        reader = imgReader.LoadVTKReader((1, 1, 1))
+        reader.Update()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    
+    return best
+
+
+def main(paths):
+    ftype = os.path.splitext(paths[0])[1]
+    readerClass = imageIOTypes.GetReaderByType(ftype)
+    
+    serial = timeLoad(readerClass, paths, None)
+    print 'slices: %i' % len(paths)
+    print '%-12s %8.3fs' % ('serial', serial)
+    
+    workers = 1
+    while workers <= cpu_count():
+        t = timeLoad(readerClass, paths, workers)
+        print '%-12s %8.3fs  (%.2fx)' % ('%i thread(s)' % workers, t, serial/t)
+        workers *= 2
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print __doc__
+        sys.exit(1)
+    main(sys.argv[1:])
@@ -0,0 +1,73 @@
+'''
+Created on Oct 18, 2026
+
+Time the community distance statistics at increasing numbers of
+bacteria and check the streamed pairwise statistics against exact ones,
+both the exact quartiles and the single-pass sketch estimates. The
+original nested loop is timed at the smallest size only.
+
+Usage (from the ProkaryMetrics folder):
+
+> $> python -m bench.distance [count ...]
+'''
+from calc.distance import (BLOCK_SIZE, QUANTILE_BINS, 
+                           nearestNeighbourDistances, pairwiseDistanceStats)
+from calc.stat import generateDescriptiveStats
+from vector import Vec3f
+
+import numpy as np
+import sys
+import time
+
+
+def loopStats(centers):
+    """
+    The distance computation communityDistanceStats used to perform.
+    """
+    centers = [Vec3f(tuple(c)) for c in centers]
+    dist = []
+    for i in range(len(centers)-1):
+        for j in range(i+1, len(centers)):
+            dist.append((centers[i] - centers[j]).length())
+    return generateDescriptiveStats(dist)
+
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return time.time() - start, result
+
+
+def main(counts):
+    rng = np.random.RandomState(0)
+    for count in counts:
+        # bacteria spread through a biofilm of 200 x 200 x 40 microns
+        centers = rng.uniform(0, 1, (count, 3)) * (200, 200, 40)
+
+        t, stats = timed(pairwiseDistanceStats, centers)
+        print '%7i bacteria  pairwise %8.2fs  %s' % (count, t, stats)
+
+        t, approx = timed(pairwiseDistanceStats, centers, BLOCK_SIZE,
+                          QUANTILE_BINS, False)
+        print '%7i bacteria  sketch   %8.2fs  %s' % (count, t, approx)
+
+        t, nn = timed(nearestNeighbourDistances, centers)
+        print '%7i bacteria  nearest  %8.2fs  %s' % (count, t,
+                                                    generateDescriptiveStats(nn))
+
+        if count <= 10000:
+            exact = generateDescriptiveStats(np.concatenate(
+                [np.sqrt(((centers[i+1:] - centers[i])**2).sum(axis=1))
+                 for i in range(count-1)]))
+            error = max(abs(a - b) for a, b in zip(stats, exact))
+            print '%7i bacteria  max abs error vs exact: %.2e' % (count, error)
+            error = max(abs(a - b) for a, b in zip(approx, exact))
+            print '%7i bacteria  sketch max abs error:   %.2e' % (count, error)
+
+        if count == counts[0]:
+            t, _ = timed(loopStats, centers)
+            print '%7i bacteria  old loop %8.2fs' % (count, t)
+
+
+if __name__ == '__main__':
+    main([int(c) for c in sys.argv[1:]] or [1000, 10000, 100000])
@@ -0,0 +1,159 @@
+'''
+Created on Oct 18, 2026
+
+Time the Lowner ellipsoid fit at increasing numbers of markers: the
+original solver on every point against the convex hull reduction with the
+vectorized solver, and check that both enclose all the points with about
+the same volume. The original solver is only timed up to a limit.
+
+Then time the minimum volume ellipsoid (MVE) solver: the original, which
+forms N x N matrices, against the O(N*d) version fitted from scratch and
+refitted from the previous weights after a few markers are added.
+
+Usage (from the ProkaryMetrics folder):
+
+> $> python -m bench.ellipsoid [count ...]
+'''
+from calc.ellipsoid import (hullVertices, lownerEllipsoid, minimumVolumeEllipsoid,
+                            quadraticForm)
+
+from itertools import count as icount, izip
+import numpy as np
+import numpy.linalg as la
+import sys
+import time
+
+# Largest number of markers the original solver is run on
+ORIGINAL_LIMIT = 10000
+# The original MVE solver needs several N x N matrices
+ORIGINAL_MVE_LIMIT = 2000
+# Largest number of markers the MVE solvers are run on
+MVE_LIMIT = 100000
+
+
+def originalLowner(P, tol):
+    """
+    calc.fitting.lownerEllipsoid as it was before the hull reduction.
+    """
+    n, m = P.shape
+    F = originalKhachiyan(np.vstack((P, np.ones((1,m)))), tol)
+    A = F[0:n][:,0:n]
+    b = F[-1][0:n][:,np.newaxis]
+    c = la.solve(-A,b)
+    E = A/(1-np.dot(c[:,0].T,b-F[-1][-1])[0])
+    ac = P - np.tile(c, (1,m))
+    E = E/max(originalBdot(ac,np.dot(E,ac)))
+    return E, c
+
+
+def originalKhachiyan(a, tol):
+    n, m = a.shape
+    invA = m * la.inv(np.dot(a, a.T))
+    w = originalBdot(a, np.dot(invA, a))
+    while True:
+        w_r, r = max(izip(w, icount()))
+        f = w_r / n
+        epsilon = f - 1
+        if epsilon <= tol:
+            break
+        g = epsilon / ((n - 1) * f)
+        h = 1 + g
+        g = g / f
+        b = np.dot(invA, a[:, r])
+        invA = h * invA - g * b[:, np.newaxis] * b
+        bTa = np.dot(b, a)
+        w = h * w - g * (bTa * bTa)
+    return invA / max(originalBdot(a, np.dot(invA, a)))
+
+
+def originalMVE(P, tol):
+    """
+    calc.fitting.minimumVolumeEllipsoid as it was before it was made lean.
+    """
+    d, N = P.shape
+    Q = np.zeros((d+1,N))
+    Q[0:d][:] = P[0:d][0:N]
+    Q[d,:] = np.ones((1,N))
+    err = 1
+    u = (1.0/N) * np.ones((N,1))
+    while err > tol:
+        X = np.dot(np.dot(Q,np.diag(u[:,0])), Q.T)
+        M = np.diag(np.dot(np.dot(Q.T, la.inv(X)), Q))
+        maximum, j = max(izip(M, icount()))
+        step_size = (maximum - d -1)/((d+1)*(maximum-1))
+        new_u = (1 - step_size) * u
+        new_u[j] = new_u[j] + step_size
+        err = la.norm(new_u - u)
+        u = new_u
+    U = np.diag(u[:,0])
+    A = (1.0/d) * la.inv(np.dot(np.dot(P,U),P.T) - np.dot(np.dot(P, u), np.dot(P, u).T))
+    return A, np.dot(P, u)
+
+
+def originalBdot(a, b):
+    _, m = a.shape
+    return np.array([np.dot(a[:,i],b[:,i]) for i in range(m)])
+
+
+def community(count, rng):
+    """
+    Markers scattered through a tilted, flattened ellipsoidal biofilm.
+
+    :@rtype: numpy.ndarray
+    :@return: (3 x count) points.
+    """
+    x = rng.normal(size=(3, count))
+    x *= rng.uniform(0, 1, count)**(1/3.0) / np.sqrt((x**2).sum(axis=0))
+    R, _ = la.qr(rng.normal(size=(3, 3)))
+    return np.dot(R, x * np.array([[60], [40], [15]])) + 100
+
+
+def volume(E):
+    return 4.0/3.0 * np.pi / np.sqrt(la.det(E))
+
+
+def timed(func, *args):
+    start = time.time()
+    result = func(*args)
+    return time.time() - start, result
+
+
+def main(counts, tol=0.001):
+    rng = np.random.RandomState(0)
+    print '%9s %8s %10s %10s %8s %12s %10s' % ('markers', 'hull', 'original',
+                                             'hull fit', 'iters', 'vol ratio',
+                                             'max q')
+    for count in counts:
+        P = community(count, rng)
+        nHull = hullVertices(P).shape[1]
+        t, (E, c, iterations) = timed(lownerEllipsoid, P, tol)
+        maxQ = quadraticForm(P, E, c).max()
+
+        original = ratio = '-'
+        if count <= ORIGINAL_LIMIT:
+            to, (Eo, _) = timed(originalLowner, P, tol)
+            original = '%.3fs' % to
+            ratio = '%.4f' % (volume(E) / volume(Eo))
+
+        print '%9i %8i %10s %9.3fs %8i %12s %10.6f' % (count, nHull, original,
+                                                      t, iterations, ratio, maxQ)
+
+    print
+    print '%9s %10s %10s %8s %10s %8s' % ('markers', 'original', 'MVE',
+                                         'iters', 'refit', 'iters')
+    for count in counts:
+        if count > MVE_LIMIT:
+            continue
+        P = community(count + 10, rng)
+        original = '-'
+        if count <= ORIGINAL_MVE_LIMIT:
+            original = '%.3fs' % timed(originalMVE, P[:, :count], tol)[0]
+        t, (_, _, u, iterations) = timed(minimumVolumeEllipsoid, P[:, :count], tol)
+        tw, (_, _, _, refits) = timed(minimumVolumeEllipsoid, P, tol, u)
+
+        print '%9i %10s %9.3fs %8i %9.3fs %8i' % (count, original, t,
+                                                  iterations, tw, refits)
+
+
+if __name__ == '__main__':
+    main([int(c) for c in sys.argv[1:]] or [100, 1000, 10000, 100000, 1000000])
@@ -0,0 +1,199 @@
+'''
+Created on Oct 18, 2026
+
+Measure cursor latency (time from a mouse move event to the end of the
+pick and overlay redraw it triggers) by replaying a mouse trace against
+a large synthetic mesh. Compares picking every event synchronously, as
+the 3D cursor used to, with coalesced picking by ray casting and by
+reading back the depth buffer.
+
+Traces are recorded in the render window by pressing M to start and stop
+(saved under ~/.prokarymetrics/traces). Without a trace, a 120 Hz
+circular sweep across the window is replayed.
+
+Usage (from the ProkaryMetrics folder):
+
+> $> python -m bench.picking [trace.json] [size]
+'''
+from bench.contour import syntheticVolume, serialContour
+from data.imageIO.stack import importVolume
+from render.overlay import SceneCache
+from render.picking import (PickScheduler, RayCastPicker, ZBufferPicker,
+                            loadTrace)
+
+import heapq
+import math
+import numpy as np
+import sys
+import time
+import vtk
+
+WINDOW_SIZE = (800, 600)
+
+
+def circularTrace(seconds=3.0, rate=120.0, size=WINDOW_SIZE):
+    """
+    A mouse sweeping a circle around the window center twice a second.
+    """
+    cx, cy = size[0] / 2.0, size[1] / 2.0
+    r = min(size) / 3.0
+    events = []
+    for i in range(int(seconds * rate)):
+        t = i / rate
+        a = 2 * math.pi * 2 * t
+        events.append((t, int(cx + r*math.cos(a)), int(cy + r*math.sin(a))))
+    return events
+
+
+class ReplayLoop(object):
+    """
+    A single threaded event loop with a virtual clock. Handlers run for
+    real and the time they take advances the clock, so trace events that
+    arrive while a handler is running queue up as they would in the GUI.
+    """
+    def __init__(self):
+        self.now = 0.0
+        self.started = None
+        self.calls = []
+        self.seq = 0
+
+    def Clock(self):
+        if self.started is None:
+            return self.now
+        return self.now + time.time() - self.started
+
+    def Post(self, delay, func):
+        heapq.heappush(self.calls, (self.Clock() + delay, self.seq, func))
+        self.seq += 1
+
+    def _Call(self, func, *args):
+        self.started = time.time()
+        try:
+            func(*args)
+        finally:
+            self.now += time.time() - self.started
+            self.started = None
+
+    def Replay(self, trace, handler):
+        """
+        Deliver each (timestamp, x, y) event to handler(x, y, timestamp).
+        Queued input events are handled before posted calls that are due
+        at the same time, like wx.CallAfter.
+        """
+        i = 0
+        while i < len(trace) or self.calls:
+            if i < len(trace) and (not self.calls or
+                                   trace[i][0] <= max(self.now, self.calls[0][0])):
+                t, x, y = trace[i]
+                i += 1
+                self.now = max(self.now, t)
+                self._Call(handler, x, y, t)
+            else:
+                t, _, func = heapq.heappop(self.calls)
+                self.now = max(self.now, t)
+                self._Call(func)
+
+
+def buildScene(size):
+    """
+    :@rtype: tuple
+    :@return: The offscreen render window, scene and overlay renderers,
+              a vtkVolumePicker for the mesh, the cursor cone, and the
+              number of triangles in the mesh.
+    """
+    importer = importVolume(syntheticVolume(size), (0.1, 0.1, 0.56))
+    importer.Update()
+    mesh = serialContour(importer.GetOutput(), (15000, 15000))
+
+    normals = vtk.vtkPolyDataNormals()
+    normals.SetInput(mesh)
+    normals.Update()
+    mapper = vtk.vtkPolyDataMapper()
+    mapper.SetInput(normals.GetOutput())
+    mapper.ScalarVisibilityOff()
+    actor = vtk.vtkActor()
+    actor.SetMapper(mapper)
+
+    locator = vtk.vtkCellLocator()
+    locator.SetDataSet(normals.GetOutput())
+    locator.LazyEvaluationOn()
+    picker = vtk.vtkVolumePicker()
+    picker.SetTolerance(1e-6)
+    picker.AddLocator(locator)
+
+    scene = vtk.vtkRenderer()
+    scene.AddActor(actor)
+    overlay = vtk.vtkRenderer()
+    cone = vtk.vtkConeSource()
+    cone.SetHeight(1.0)
+    cone.SetRadius(0.3)
+    coneMapper = vtk.vtkPolyDataMapper()
+    coneMapper.SetInputConnection(cone.GetOutputPort())
+    coneActor = vtk.vtkActor()
+    coneActor.SetMapper(coneMapper)
+    overlay.AddActor(coneActor)
+
+    renwin = vtk.vtkRenderWindow()
+    renwin.SetOffScreenRendering(1)
+    renwin.SetSize(*WINDOW_SIZE)
+    renwin.AddRenderer(scene)
+    renwin.AddRenderer(overlay)
+    scene.ResetCamera()
+
+    return renwin, scene, overlay, picker, coneActor, mesh.GetNumberOfCells()
+
+
+def replay(trace, mode, renwin, scene, overlay, picker, cone):
+    """
+    :@rtype: dict
+    :@return: PickScheduler.Stats for the replayed trace.
+    """
+    cache = SceneCache(renwin, scene, overlay)
+    renwin.Render()
+    rayPicker = RayCastPicker(picker, scene)
+    pickers = {'raycast': rayPicker,
+               'zbuffer': ZBufferPicker(scene, cache.Depth)}
+    loop = ReplayLoop()
+
+    def pickRaycastRender(x, y):
+        # the old cursor: ray cast and redraw the whole window
+        hit = rayPicker.Pick(x, y)
+        if hit is not None:
+            cone.SetPosition(hit[0])
+        renwin.Render()
+
+    def pickOverlay(x, y):
+        hit = pickers[mode].Pick(x, y)
+        if hit is not None:
+            cone.SetPosition(hit[0])
+        cache.RenderOverlay()
+
+    if mode == 'every event':
+        # pick straight away, with nothing to wait for
+        scheduler = PickScheduler(pickRaycastRender, 0,
+                                  post=lambda delay, func: func(),
+                                  clock=loop.Clock)
+    else:
+        scheduler = PickScheduler(pickOverlay, 1/60.0, post=loop.Post,
+                                  clock=loop.Clock)
+
+    loop.Replay(trace, scheduler.Post)
+    return scheduler.Stats
+
+
+def main(trace, size):
+    renwin, scene, overlay, picker, cone, cells = buildScene(size)
+    print 'mesh: %i triangles, trace: %i events over %.2fs' % (
+        cells, len(trace), trace[-1][0] - trace[0][0])
+    print '%-14s %10s %10s %8s %8s' % ('', 'median', 'p95', 'picks', 'dropped')
+
+    for mode in ('every event', 'raycast', 'zbuffer'):
+        s = replay(trace, mode, renwin, scene, overlay, picker, cone)
+        print '%-14s %8.1fms %8.1fms %8i %8i' % (mode, s['median']*1000,
+                                                  s['p95']*1000, s['picks'],
+                                                  s['dropped'])
+
+
+if __name__ == '__main__':
+    trace = loadTrace(sys.argv[1]) if len(sys.argv) > 1 else circularTrace()
+    main(trace, int(sys.argv[2]) if len(sys.argv) > 2 else 256)
@@ -0,0 +1,92 @@
+'''
+Created on Oct 18, 2026
+
+Time changing the radius of a layer of recorded bacteria, and check that
+repeated resizes leave the number of actors, DataStore entries and the
+memory used by the layer unchanged. The script exits with status 1 if
+any of them grew, so it can be run as a regression check.
+
+Usage (from the ProkaryMetrics folder):
+
+> $> python -m bench.resize [bacteria] [resizes]
+'''
+from data.objects import Bacterium
+from render.bacteria import BacteriaLayer
+from store import DataStore
+
+import numpy as np
+import sys
+import time
+import vtk
+
+
+def recordBacteria(count, seed=0):
+    """
+    Record a mix of coccoids, bacilli and filaments (2:2:1) scattered
+    through a 100 micron cube.
+    """
+    rng = np.random.RandomState(seed)
+    for i in range(count):
+        n = (1, 1, 2, 2, 4)[i % 5]
+        start = rng.uniform(0, 100, 3)
+        markers = [tuple(start + j * rng.uniform(-2, 2, 3)) for j in range(n)]
+        DataStore.AddBacterium(Bacterium(markers))
+
+
+def layerCounts(renderer, layer):
+    """
+    :@rtype: tuple
+    :@return: The number of actors in the renderer, the number of
+              bacterium actors in the DataStore, and the memory (KiB) used
+              by the glyph and batch data.
+    """
+    memory = 0
+    if layer.coccoidGlyphs is not None:
+        memory += layer.coccoidGlyphs.polydata.GetActualMemorySize()
+    if layer.batch is not None:
+        memory += layer.batch.polydata.GetActualMemorySize()
+    return (renderer.GetActors().GetNumberOfItems(),
+            len(DataStore.BacteriaActors()), memory)
+
+
+def main(count, resizes):
+    """
+    :@rtype: bool
+    :@return: True if no resize changed the layer's counts.
+    """
+    renderer = vtk.vtkRenderer()
+    renwin = vtk.vtkRenderWindow()
+    renwin.SetOffScreenRendering(1)
+    renwin.AddRenderer(renderer)
+
+    recordBacteria(count)
+    ok = True
+    for mode in ('actors', 'glyphs+batch'):
+        batched = mode != 'actors'
+        renderer.RemoveAllViewProps()
+        del DataStore.BacteriaActors()[:]
+        layer = BacteriaLayer(renderer, renwin.Render, glyphs=batched,
+                              batched=batched)
+        layer.AddStoredBacteria()
+        renwin.Render()
+
+        before = layerCounts(renderer, layer)
+        times = []
+        for i in range(resizes):
+            start = time.time()
+            layer.UpdateRadius((0.5, 0.8)[i % 2])
+            times.append(time.time() - start)
+        after = layerCounts(renderer, layer)
+
+        ok &= before == after
+        status = 'ok' if before == after else 'GREW %s -> %s' % (before, after)
+        print '%-13s %6i bacteria  resize median %8.1fms  actors=%i  %s' % (
+            mode, count, 1000 * np.median(times), after[0], status)
+
+    return ok
+
+
+if __name__ == '__main__':
+    ok = main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000,
+              int(sys.argv[2]) if len(sys.argv) > 2 else 10)
+    sys.exit(0 if ok else 1)
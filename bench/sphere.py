@@ -0,0 +1,54 @@
+'''
+Created on Oct 18, 2026
+
+Time the exact minimum enclosing sphere against the Lowner ellipsoid fit
+at increasing numbers of markers, check that the sphere contains every
+marker and is minimal (its center is a convex combination of the markers
+on its surface), and compare the volumes of the two estimates.
+
+Usage (from the ProkaryMetrics folder):
+
+> $> python -m bench.sphere [count ...]
+'''
+from bench.ellipsoid import community, timed, volume
+from calc.ellipsoid import lownerEllipsoid
+from calc.sphere import minimumEnclosingSphere
+
+import numpy as np
+from scipy.optimize import nnls
+import sys
+
+
+def optimality(points, center, radius):
+    """
+    :@rtype: tuple
+    :@return: The largest distance of a point outside the sphere (<= 0
+              if they are all in), and the residual of expressing the
+              center as a convex combination of the points on the sphere
+              (0 if the sphere is minimal).
+    """
+    d = np.sqrt(((points - center)**2).sum(axis=1))
+    surface = points[d >= radius * (1 - 1e-7)]
+    # weight the sum-to-one row heavily so it is met almost exactly
+    A = np.vstack([surface.T, 1e3 * np.ones(len(surface))])
+    b = np.concatenate([center, [1e3]])
+    return d.max() - radius, nnls(A, b)[1]
+
+
+def main(counts, tol=0.001):
+    rng = np.random.RandomState(0)
+    print '%9s %10s %10s %12s %12s %10s' % ('markers', 'sphere', 'ellipsoid',
+                                          'outside', 'residual', 'vol ratio')
+    for count in counts:
+        P = community(count, rng)
+        ts, (center, radius) = timed(minimumEnclosingSphere, P.T, 0)
+        te, (E, _, _) = timed(lownerEllipsoid, P, tol)
+        outside, residual = optimality(P.T, center, radius)
+        ratio = 4.0/3.0 * np.pi * radius**3 / volume(E)
+
+        print '%9i %9.3fs %9.3fs %12.2e %12.2e %10.2f' % (count, ts, te, outside,
+                                                         residual, ratio)
+
+
+if __name__ == '__main__':
+    main([int(c) for c in sys.argv[1:]] or [100, 1000, 10000, 100000, 1000000])
@@ -0,0 +1,172 @@
+'''
+Created on Oct 18, 2026
+
+Compare the slotted Vec3f and the batched Vec3fArray against the
+dict-backed Vec3f they replace, on the operations the statistics and
+fitting loops use: construction, differences and their lengths, dot
+products, normalization and accumulation.
+
+Usage (from the ProkaryMetrics folder):
+
+> $> python -m bench.vectors [count] [repeats]
+'''
+from vector import Vec3f, Vec3fArray
+
+import math
+import numpy as np
+import sys
+import time
+
+
+class DictVec3f(object):
+    """
+    The Vec3f operations used here as they were before Vec3f was slotted.
+    """
+    def __init__(self, x=0, y=0, z=0):
+        if isinstance(x, tuple) or isinstance(x, list):
+            self.x = x[0]
+            self.y = x[1]
+            self.z = x[2]
+        else:
+            self.x = x
+            self.y = y
+            self.z = z
+
+    def normalize(self):
+        ln = self.length()
+        self.x /= ln
+        self.y /= ln
+        self.z /= ln
+
+    def length(self):
+        return math.sqrt( self.x*self.x + self.y*self.y + self.z*self.z )
+
+    def dot(self, other):
+        return sum([self.x*other.x, self.y*other.y, self.z*other.z])
+
+    def __add__(self, other):
+        if (isinstance(other, int) or isinstance(other, float)):
+            return DictVec3f(self.x + other, self.y + other, self.z + other)
+        return DictVec3f(self.x + other.x, self.y + other.y, self.z + other.z)
+
+    def __sub__(self, other):
+        if (isinstance(other, int) or isinstance(other, float)):
+            return DictVec3f(self.x - other, self.y - other, self.z - other)
+        return DictVec3f(self.x - other.x, self.y - other.y, self.z - other.z)
+
+
+def objectWorkloads(cls, points):
+    """
+    :@type cls: class
+    :@param cls: DictVec3f or Vec3f
+    :@rtype: list
+    :@return: (name, function) pairs run on a list of cls.
+    """
+    vecs = [cls(p) for p in points]
+    basis = cls(0, 0, 1)
+
+    def construct():
+        return [cls(p) for p in points]
+
+    def lengths():
+        return [(vecs[i] - vecs[i+1]).length() for i in range(len(vecs)-1)]
+
+    def dots():
+        out = []
+        for i in range(len(vecs)-1):
+            v = vecs[i] - vecs[i+1]
+            v.normalize()
+            out.append(basis.dot(v))
+        return out
+
+    def accumulate():
+        total = cls()
+        for v in vecs:
+            total = total + v
+        return total
+
+    work = [('construct', construct), ('diff length', lengths),
+            ('normalize dot', dots), ('sum (a = a + b)', accumulate)]
+
+    if hasattr(cls, '__iadd__'):
+        def accumulateInPlace():
+            total = cls()
+            for v in vecs:
+                total += v
+            return total
+        work.append(('sum (a += b)', accumulateInPlace))
+
+    return work
+
+
+def arrayWorkloads(points):
+    vecs = Vec3fArray(points)
+    basis = Vec3f(0, 0, 1)
+
+    def construct():
+        return Vec3fArray(points)
+
+    def lengths():
+        return (vecs[:-1] - vecs[1:]).length()
+
+    def dots():
+        v = vecs[:-1] - vecs[1:]
+        v.normalize()
+        return v.dot(basis)
+
+    def accumulate():
+        return vecs.data.sum(axis=0)
+
+    return [('construct', construct), ('diff length', lengths),
+            ('normalize dot', dots), ('sum (a = a + b)', accumulate)]
+
+
+def best(func, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.time()
+        func()
+        times.append(time.time() - start)
+    return min(times)
+
+
+def instanceSize(v):
+    """
+    :@rtype: int
+    :@return: The bytes used by a vector object and its attribute dict.
+    """
+    size = sys.getsizeof(v)
+    if hasattr(v, '__dict__'):
+        size += sys.getsizeof(v.__dict__)
+    return size
+
+
+def main(count, repeats):
+    rng = np.random.RandomState(0)
+    points = [tuple(p) for p in rng.uniform(0, 100, (count, 3)).tolist()]
+
+    results = {}
+    for name, work in (('dict Vec3f', objectWorkloads(DictVec3f, points)),
+                       ('slotted Vec3f', objectWorkloads(Vec3f, points)),
+                       ('Vec3fArray', arrayWorkloads(points))):
+        for op, func in work:
+            results[name, op] = best(func, repeats)
+
+    ops = ['construct', 'diff length', 'normalize dot', 'sum (a = a + b)',
+           'sum (a += b)']
+    print '%i vectors, best of %i (ms)' % (count, repeats)
+    print '%-16s %12s %14s %12s' % ('', 'dict Vec3f', 'slotted Vec3f',
+                                    'Vec3fArray')
+    for op in ops:
+        print '%-16s %12s %14s %12s' % ((op,) + tuple(
+            '%.2f' % (1000 * results[name, op]) if (name, op) in results else '-'
+            for name in ('dict Vec3f', 'slotted Vec3f', 'Vec3fArray')))
+
+    print 'bytes per vector: dict %i  slotted %i  array %i' % (
+        instanceSize(DictVec3f(1.0, 2.0, 3.0)), instanceSize(Vec3f(1.0, 2.0, 3.0)),
+        Vec3fArray(points).data.itemsize * 3)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 5)
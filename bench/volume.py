@@ -0,0 +1,107 @@
+'''
+Created on Oct 18, 2026
+
+Time the voxelized union volume of increasing numbers of recorded
+bacteria, and compare the summed voxel volume of the bacteria with their
+exact summed volume (as calc.fitting.bacterialVolume adds them up) to
+show the error due to the voxel size. Before timing, a few known layouts
+are checked; the script exits with status 1 if any of them fails.
+
+Usage (from the ProkaryMetrics folder):
+
+> $> python -m bench.volume [voxel] [count ...]
+'''
+from calc.volume import capsuleSegments, unionVolume
+from data.objects import Bacterium
+from store import BacteriaColumns
+
+import numpy as np
+import sys
+import time
+
+
+def community(count, seed=0):
+    """
+    A mix of coccoids, bacilli and filaments (1:2:1) of 1-4 markers,
+    densely packed in a biofilm of 100 x 100 x 20 marker units per 10k
+    bacteria.
+
+    :@rtype: store.BacteriaColumns
+    """
+    rng = np.random.RandomState(seed)
+    side = (count / 10000.0)**(1/3.0)
+    columns = BacteriaColumns()
+    for i in range(count):
+        n = (1, 2, 2, 4)[i % 4]
+        start = rng.uniform(0, 1, 3) * (100, 100, 20) * side
+        step = rng.normal(size=3)
+        step *= 1.5 / np.sqrt((step**2).sum())
+        columns.Append(Bacterium([tuple(start + j*step) for j in range(n)]))
+    return columns
+
+
+def summedBacteria(A, B, owners, radius):
+    """
+    :@rtype: float
+    :@return: The exact total volume of the (straight) bacteria, overlaps
+              between them included.
+    """
+    lengths = np.sqrt(((B - A)**2).sum(axis=1))
+    return (np.pi * radius**2 * lengths.sum() +
+            4.0/3.0 * np.pi * radius**3 * len(np.unique(owners)))
+
+
+def check(voxel, radius=1.0):
+    """
+    Compare the union volume of a few known layouts with their expected
+    values.
+
+    :@rtype: list
+    :@return: The descriptions of the layouts that failed.
+    """
+    failed = []
+    one = 4.0/3.0 * np.pi * radius**3 + np.pi * radius**2 * np.sqrt(3)
+
+    # capsules far apart, leaving most slabs of the grid empty
+    A = np.array([[0, 0, 0], [0, 1500, 150], [400, 0, 0]], dtype=float)
+    union = unionVolume(A, A + 1, radius, voxel)
+    if union.overlap != 0 or abs(union.volume / (3 * one) - 1) > 0.05:
+        failed.append('sparse capsules: volume %.2f overlap %.4f' %
+                      (union.volume, union.overlap))
+
+    # a lone filament, bent at its joints, overlaps nothing but itself
+    columns = BacteriaColumns()
+    columns.Append(Bacterium([(0, 0, 0), (3, 0, 0), (3, 3, 1), (0, 4, 3)]))
+    A, B, owners = capsuleSegments(columns)
+    union = unionVolume(A, B, radius, voxel, owners=owners)
+    if union.overlap != 0:
+        failed.append('lone filament: overlap %.4f' % union.overlap)
+
+    return failed
+
+
+def main(voxel, counts, radius=1.0):
+    failed = check(voxel, radius)
+    for failure in failed:
+        print 'FAILED', failure
+    print '%8s %9s %10s %12s %12s %9s %9s' % ('bacteria', 'capsules', 'time',
+                                            'union', 'summed', 'overlap',
+                                            'error')
+    for count in counts:
+        A, B, owners = capsuleSegments(community(count))
+        start = time.time()
+        union = unionVolume(A, B, radius, voxel, owners=owners)
+        t = time.time() - start
+        exact = summedBacteria(A, B, owners, radius)
+
+        print '%8i %9i %9.2fs %12.1f %12.1f %9.4f %9.4f' % (count, len(A), t,
+            union.volume, union.summedVolume, union.overlap,
+            union.summedVolume / exact - 1)
+
+    return not failed
+
+
+if __name__ == '__main__':
+    voxel = float(sys.argv[1]) if len(sys.argv) > 1 else 0.25
+    ok = main(voxel, [int(c) for c in sys.argv[2:]] or [1000, 10000, 100000])
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,233 @@
+'''
+Created on Oct 18, 2026
+
+Distance distributions between bacteria computed with numpy/scipy in
+bounded memory. All pairwise distances are generated block by block and
+folded into running moments and a fine histogram, so they are never held
+in memory at once. The histogram locates the distances the quartiles
+depend on, which further passes then find exactly. Where one pass is
+enough, the distances can instead be folded into a DescriptiveAccumulator,
+whose approximate quartiles can be merged with those of other chunks,
+worker processes or projects.
+'''
+from calc.online import DescriptiveAccumulator, RunningMoments
+from calc.stat import DescriptiveStats, generateDescriptiveStats
+from store import FILAMENT
+
+import numpy as np
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import cdist, pdist
+
+# Number of bacteria per block; a block pair holds BLOCK_SIZE^2 distances
+BLOCK_SIZE = 2048
+# Histogram bins used to locate pairwise quantiles
+QUANTILE_BINS = 1 << 16
+# Largest number of distances kept in memory to find an order statistic;
+# a histogram range holding more is subdivided by another pass
+EXACT_LIMIT = 1 << 22
+
+
+def centerArray(columns, scale):
+    """
+    Collect the centers of the coccoids and bacilli (filaments are
+    excluded): the marker of a coccoid, the midpoint of a bacillus.
+
+    :@type columns: store.BacteriaColumns
+    :@param columns: The bacteria, e.g. DataStore.Columns().
+    :@type scale: tuple
+    :@param scale: x,y,z factors converting marker coordinates to microns.
+    :@rtype: numpy.ndarray
+    :@return: An (n x 3) array of centers.
+    """
+    keep = columns.Morphology != FILAMENT
+    starts = columns.Offsets[:-1][keep]
+    last = columns.Offsets[1:][keep] - 1
+    # the first and last markers coincide for a coccoid
+    centers = (columns.Coords[starts] + columns.Coords[last]) / 2.0
+    return centers * scale
+
+
+def pairwiseBlocks(centers, blockSize=BLOCK_SIZE):
+    """
+    Generate the distances between every pair of centers, each pair
+    once, as a sequence of flat arrays of at most blockSize^2 values.
+
+    :@type centers: numpy.ndarray
+    :@param centers: An (n x 3) array of points.
+    """
+    n = len(centers)
+    for i in range(0, n, blockSize):
+        block = centers[i:i+blockSize]
+        yield pdist(block)
+        for j in range(i + blockSize, n, blockSize):
+            yield cdist(block, centers[j:j+blockSize]).ravel()
+
+
+def pairwiseDistanceAccumulator(centers, blockSize=BLOCK_SIZE, k=200):
+    """
+    Fold the distances between all pairs of centers into a
+    DescriptiveAccumulator in a single pass. The mean and standard
+    deviation are exact; the median and quartiles are within a rank error
+    of about 1.7 / k. Accumulators of separate sets of distances can be
+    merged, and pickled to return them from worker processes. Every block
+    is sorted by the sketch, so on its own this is slower than the exact
+    pairwiseDistanceStats; it pays off where partial results are merged.
+
+    :@type k: int
+    :@param k: The size of the quantile sketch, see calc.online.KLLSketch.
+    :@rtype: calc.online.DescriptiveAccumulator
+    """
+    accumulator = DescriptiveAccumulator(k)
+    for d in pairwiseBlocks(centers, blockSize):
+        accumulator.AddArray(d)
+    return accumulator
+
+
+def pairwiseDistanceStats(centers, blockSize=BLOCK_SIZE, bins=QUANTILE_BINS,
+                          exact=True):
+    """
+    DescriptiveStats of the distances between all pairs of centers, the 
+    same as generateDescriptiveStats of every distance.
+
+    When all the pairs fit in one block they are computed at once. 
+    Otherwise the mean and standard deviation (population) are accumulated
+    block by block together with a histogram, and the median and quartiles
+    are interpolated between the order statistics on either side of them, 
+    as scoreatpercentile does. The histogram counts locate each of those 
+    order statistics within a range of distances, and further passes over 
+    the pairs find them exactly (see orderStatistics).
+
+    :@type exact: bool
+    :@param exact: If False, make a single pass with 
+                   pairwiseDistanceAccumulator instead, with approximate 
+                   median and quartiles.
+    :@rtype: DescriptiveStats
+    :@return: The statistics, or None if there are fewer than two centers.
+    """
+    if len(centers) < 2:
+        return None
+    if len(centers) <= blockSize:
+        return generateDescriptiveStats(pdist(centers))
+    if not exact:
+        return pairwiseDistanceAccumulator(centers, blockSize).Stats()
+
+    top = np.sqrt(((centers.max(axis=0) - centers.min(axis=0))**2).sum())
+    top = top or 1.0
+    counts = np.zeros(bins, dtype=np.int64)
+    moments = RunningMoments()
+    for d in pairwiseBlocks(centers, blockSize):
+        moments.AddArray(d)
+        counts += np.bincount(histogramBins(d, top, bins), minlength=bins)
+
+    positions = [q * (moments.n - 1) for q in (0.25, 0.5, 0.75)]
+    ranks = sorted(set(r for p in positions 
+                         for r in (int(p), min(int(p) + 1, moments.n - 1))))
+    stats = orderStatistics(centers, ranks, counts, top, blockSize)
+
+    q1, med, q3 = [stats[int(p)] + (p - int(p)) * 
+                   (stats[min(int(p) + 1, moments.n - 1)] - stats[int(p)]) 
+                   for p in positions]
+    return DescriptiveStats(moments.mean, med, moments.Std, q1, q3)
+
+
+def histogramBins(d, top, bins):
+    """
+    :@rtype: numpy.ndarray
+    :@return: The bin of each distance in a histogram of bins equal 
+              bins from 0 to top.
+    """
+    return np.minimum((d * (bins / top)).astype(np.int64), bins - 1)
+
+
+def orderStatistics(centers, ranks, counts, top, blockSize=BLOCK_SIZE, 
+                    limit=EXACT_LIMIT):
+    """
+    Find the pairwise distances of the given ranks exactly, from a 
+    histogram of all the distances, in bounded memory.
+
+    Each rank lies in a known histogram bin; a pass over the pairs keeps 
+    the distances in that bin (widened by a bin on each side, so that no 
+    rounding in histogramBins can put the distance outside it) and counts 
+    those below it, which places the rank among the kept distances. A 
+    range that holds more than limit distances is split into as many 
+    bins as counts has by a pass of its own first.
+
+    :@type ranks: list
+    :@param ranks: 0-based ranks among the ascending distances.
+    :@type counts: numpy.ndarray
+    :@param counts: A histogram of all the distances, see histogramBins.
+    :@rtype: dict
+    :@return: The distance of each rank.
+    """
+    bins = len(counts)
+    cum = np.cumsum(counts)
+    # (low, high, estimated count) of the range of distances each rank is in
+    ranges = {}
+    for r in ranks:
+        b = np.searchsorted(cum, r, side='right')
+        lo = top * (b - 1) / float(bins) if b > 1 else -np.inf
+        hi = top * (b + 2) / float(bins) if b < bins - 2 else np.inf
+        ranges[r] = (lo, hi, counts[max(b-1, 0):b+2].sum())
+
+    stats = {}
+    while ranges:
+        # distinct ranges, each to be collected or split by the next pass
+        todo = dict(((lo, hi), est > limit) for lo, hi, est in ranges.values())
+        below = dict((key, 0) for key in todo)
+        kept = dict((key, []) for key in todo)
+        split = dict((key, (np.linspace(key[0], key[1], bins + 1) 
+                            if np.isfinite(key).all() else None,
+                            np.zeros(bins + 2, dtype=np.int64), 
+                            RunningMoments()))
+                     for key, many in todo.items() if many)
+
+        for d in pairwiseBlocks(centers, blockSize):
+            for key in todo:
+                lo, hi = key
+                below[key] += int((d < lo).sum())
+                inside = d[(d >= lo) & (d < hi)]
+                if key not in split:
+                    kept[key].append(inside)
+                    continue
+                edges, subCounts, moments = split[key]
+                moments.AddArray(inside)
+                if edges is None:
+                    continue
+                subCounts += np.bincount(np.searchsorted(edges, inside, side='right'),
+                                         minlength=bins + 2)
+
+        for r, (lo, hi, _) in ranges.items():
+            key = (lo, hi)
+            if key not in split:
+                stats[r] = np.sort(np.concatenate(kept[key]))[r - below[key]]
+                del ranges[r]
+                continue
+            edges, subCounts, moments = split[key]
+            # every distance in the range is the same
+            if moments.min == moments.max:
+                stats[r] = moments.min
+                del ranges[r]
+                continue
+            if edges is None:
+                # an open range: close it at the distances it holds
+                lo = max(lo, moments.min)
+                hi = np.nextafter(min(hi, moments.max), np.inf)
+                ranges[r] = (lo, hi, moments.n)
+                continue
+            # the bin of searchsorted(edges, d, 'right') = j is 
+            # edges[j-1] <= d < edges[j]
+            j = np.searchsorted(below[key] + np.cumsum(subCounts), r, side='right')
+            ranges[r] = (edges[j-1], edges[j], subCounts[j])
+
+    return stats
+
+
+def nearestNeighbourDistances(centers):
+    """
+    :@rtype: numpy.ndarray
+    :@return: The distance from each center to its nearest other center.
+    """
+    if len(centers) < 2:
+        return np.zeros(0)
+    d, _ = cKDTree(centers).query(centers, k=2)
+    return d[:, 1]
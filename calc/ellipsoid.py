@@ -0,0 +1,194 @@
+'''
+Created on Oct 18, 2026
+
+Minimum volume enclosing ellipsoid solvers working on numpy arrays only.
+The points are first reduced to the vertices of their convex hull, since
+only those can touch the ellipsoid, and Khachiyan's algorithm then runs
+on the few hundred vertices with every iteration vectorized. The result
+is checked against the full set of points.
+
+The minimum volume ellipsoid (MVE) solver keeps its dual weights so a
+refit after a few bacteria are added can start where the last one ended.
+'''
+import numpy as np
+import numpy.linalg as la
+from scipy.spatial import ConvexHull
+from scipy.spatial.qhull import QhullError
+
+# Number of points per block when evaluating the ellipsoid over all points
+CHUNK_SIZE = 1 << 16
+
+
+def hullVertices(P):
+    """
+    :@type P: numpy.ndarray
+    :@param P: (d x N) array containing N points in R^d.
+    :@rtype: numpy.ndarray
+    :@return: The (d x k) columns of P that are vertices of its convex
+              hull, or P itself if the hull is degenerate (e.g. all the
+              points are coplanar).
+    """
+    d, N = P.shape
+    if N <= d + 1:
+        return P
+    try:
+        hull = ConvexHull(P.T)
+    except QhullError:
+        return P
+    return P[:, hull.vertices]
+
+
+def quadraticForm(P, E, c, chunk=CHUNK_SIZE):
+    """
+    Evaluate (x-c)' * E * (x-c) for every column x of P, a block of
+    columns at a time.
+
+    :@type P: numpy.ndarray
+    :@param P: (d x N) array of points.
+    :@type E: numpy.ndarray
+    :@param E: (d x d) ellipsoid matrix in 'center form'.
+    :@type c: numpy.ndarray
+    :@param c: (d x 1) center.
+    :@rtype: numpy.ndarray
+    :@return: N values; the points with values <= 1 are in the ellipsoid.
+    """
+    N = P.shape[1]
+    q = np.empty(N)
+    for i in range(0, N, chunk):
+        x = P[:, i:i+chunk] - c
+        q[i:i+chunk] = np.einsum('ij,ij->j', x, np.dot(E, x))
+    return q
+
+
+def khachiyan(a, tol, maxIter=100000):
+    """
+    Khachiyan's barycentric coordinate descent for the Lowner ellipsoid
+    of the centrally symmetric set of the columns of a. Each iteration is
+    a rank-1 update of the inverse and of the column weights.
+
+    :@type a: numpy.ndarray
+    :@param a: (n x m) array of points.
+    :@type tol: float
+    :@param tol: Relative error in the volume of the ellipsoid.
+    :@rtype: tuple
+    :@return: The (n x n) ellipsoid matrix and the number of iterations.
+    """
+    n, m = a.shape
+    invA = m * la.inv(np.dot(a, a.T))
+    w = np.einsum('ij,ij->j', a, np.dot(invA, a))
+
+    for it in xrange(maxIter):
+        r = w.argmax()
+        f = w[r] / n
+        epsilon = f - 1
+        if epsilon <= tol:
+            break
+        g = epsilon / ((n - 1) * f)
+        h = 1 + g
+        g = g / f
+        b = np.dot(invA, a[:, r])
+        invA = h * invA - g * np.outer(b, b)
+        bTa = np.dot(b, a)
+        w = h * w - g * (bTa * bTa)
+
+    return invA / np.einsum('ij,ij->j', a, np.dot(invA, a)).max(), it
+
+
+def lownerEllipsoid(P, tol, hull=True):
+    """
+    Finds an approximation of the Lowner (minimum volume enclosing)
+    ellipsoid of the points in the columns of P, with a volume of about
+    (1+tol) times the minimum. See calc.fitting.lownerEllipsoid.
+
+    :@type P: numpy.ndarray
+    :@param P: (d x N) array containing N points in R^d.
+    :@type tol: float
+    :@param tol: Error in the solution with respect to the optimal value.
+    :@type hull: bool
+    :@param hull: Fit the convex hull vertices instead of every point.
+    :@rtype: tuple
+    :@return: E: (d x d) matrix of the ellipse equation in 'center form':
+                 (x-c)' * E * (x-c) = 1
+              c: (d x 1) center of the ellipse.
+              iterations: The number of Khachiyan iterations.
+    """
+    P = np.asarray(P, dtype=float)
+    n = P.shape[0]
+    if n < 1:
+        raise ValueError("P must be of at least 1 dimension")
+    V = hullVertices(P) if hull else P
+    m = V.shape[1]
+
+    # Find the Lowner ellipsoid of the centrally symmetric set lifted
+    # to a hyperplane in a higher dimension.
+    F, iterations = khachiyan(np.vstack((V, np.ones((1, m)))), tol)
+    # Intersect with the hyperplane where the input points lie.
+    A = F[:n, :n]
+    b = F[-1, :n][:, np.newaxis]
+    c = la.solve(-A, b)
+    E = A / (1 - np.dot(c[:, 0], b[:, 0] - F[-1, -1]))
+
+    # Force all the points to really be covered.
+    E = E / quadraticForm(P, E, c).max()
+
+    return E, c, iterations
+
+
+def minimumVolumeEllipsoid(P, tol, u=None, maxIter=100000):
+    """
+    Finds the minimum volume enclosing ellipsoid of the columns of P with
+    Khachiyan's algorithm on the dual weights u, as in
+    calc.fitting.minimumVolumeEllipsoid, but without forming any N x N
+    matrix: the weighted scatter matrix is a weighted sum and the
+    distances are row-wise quadratic forms, so memory is O(N*d).
+
+    :@type P: numpy.ndarray
+    :@param P: (d x N) array containing N points in R^d.
+    :@type tol: float
+    :@param tol: Stop when the weights change by less than this.
+    :@type u: numpy.ndarray
+    :@param u: Weights returned by a previous fit to warm start from. If
+               points were appended since, they start with no weight;
+               any other mismatch only slows convergence.
+    :@rtype: tuple
+    :@return: A: (d x d) matrix of the ellipse equation in 'center form':
+                 (x-c)' * A * (x-c) = 1
+              c: (d x 1) center of the ellipse.
+              u: The N final weights, to warm start a later fit.
+              iterations: The number of Khachiyan iterations.
+    """
+    P = np.asarray(P, dtype=float)
+    d, N = P.shape
+    Q = np.vstack((P, np.ones((1, N))))
+    u = startWeights(u, N)
+
+    for it in xrange(maxIter):
+        X = np.dot(Q * u, Q.T)
+        M = np.einsum('ij,ij->j', Q, la.solve(X, Q))
+        j = M.argmax()
+        step = (M[j] - d - 1) / ((d + 1) * (M[j] - 1))
+        # the norm of the change from u to (1-step)*u + step*e_j
+        err = step * np.sqrt(max(np.dot(u, u) - 2*u[j] + 1, 0.0))
+        u *= 1 - step
+        u[j] += step
+        if err <= tol:
+            break
+
+    c = np.dot(P, u)[:, np.newaxis]
+    A = (1.0/d) * la.inv(np.dot(P * u, P.T) - np.dot(c, c.T))
+
+    return A, c, u, it + 1
+
+
+def startWeights(u, N):
+    """
+    :@rtype: numpy.ndarray
+    :@return: Khachiyan's starting weights for N points: u resized to N
+              and normalized, or uniform weights if u is None or empty.
+    """
+    if u is not None:
+        u = np.asarray(u, dtype=float)[:N]
+        u = np.concatenate([u, np.zeros(N - len(u))])
+        if u.sum() > 0:
+            return u / u.sum()
+    return np.ones(N) / N
@@ -3,15 +3,45 @@ Created on Jul 24, 2011
 
 @author: shareef
 '''
+from calc import ellipsoid as mvee
+from calc.sphere import minimumEnclosingSphere
+from calc.volume import capsuleSegments, unionVolume
 from render.basic import createEllipsoid, createSphere
-from store import DataStore
+from store import DataStore, position
 from vector import Vec3f
 
+from collections import namedtuple
 from numpy import *
 import numpy.linalg as la
+import time
 import vtk
 
 HFF = 2.86
+# dual weights of the last MVE fit, to warm start the next one
+_mveWeights = None
+
+# The reported ellipsoid is the fitted one scaled by this factor
+ELLIPSOID_SCALE = 2.8
+
+# The result of fitting an ellipsoid to the recorded bacteria:
+#  method: 'MVE' or 'Lowner'
+#  radii: The (a,b,c) radii of the fitted ellipsoid, in marker coordinates
+#  rotation: The 3x3 rotation matrix aligning the radii with the axes
+#  center: The x,y,z center of the ellipsoid, in marker coordinates
+#  scaledRadii: The radii scaled by ELLIPSOID_SCALE, as reported
+#  volume: The volume of the scaled ellipsoid in cubic microns
+#  bacteriaVolume: The volume of the recorded bacteria in cubic microns, 
+#                  or None if the fit used the placed markers
+#  density: bacteriaVolume / volume, or None
+#  iterations: The number of Khachiyan iterations of the fit
+#  seconds: The time taken by the fit
+EllipsoidFit = namedtuple('EllipsoidFit', 'method radii rotation center '
+                          'scaledRadii volume bacteriaVolume density '
+                          'iterations seconds')
+# The result of fitting a sphere; the fields are those of EllipsoidFit
+SphereFit = namedtuple('SphereFit', 'radius center scaledRadius volume '
+                       'bacteriaVolume density seconds')
+
 
 def fitEllipsoid(ds, actorRadius, mve=False):
     """
@@ -26,63 +56,101 @@ def fitEllipsoid(ds, actorRadius, mve=False):
     :@param mve: A flag indicating whether to use the MinimumVolumeEllipsoid 
                  or the Lowner method for fitting.
     
-    :@rtype: tuple -> (vtkActor, vtkActor)
-    :@return: parametric ellipsoid actor and text actor displaying the volume
+    :@rtype: tuple -> (vtkActor, str)
+    :@return: parametric ellipsoid actor and the text describing the fit
     """
-    points = [[],[],[]]
-    fBacteria = False
-    
-    for bact in DataStore.Bacteria():
-        points[0].extend([marker.x for marker in bact.Markers])
-        points[1].extend([marker.y for marker in bact.Markers])
-        points[2].extend([marker.z for marker in bact.Markers])
-        
-    # if no recorded bacteria, use the placed markers
-    if not points[0]:
-        for marker in DataStore.Markers():
-            pt = Vec3f(marker.GetCenter())
-            points[0].append(pt.x)
-            points[1].append(pt.y)
-            points[2].append(pt.z)
-    else:
-        fBacteria = True
-    
-    if not points[0] or len(points[0]) < 9:
-        raise RuntimeError('At least 9 markers are needed to fit an ellipsoid')
-    
-    
-    # output data to file
-#    with open('ellipse.csv', 'w') as e:
-#        writer = csv.writer(e, delimiter=',')
-#        writer.writerows(points)
+    fit = communityEllipsoid(ds, mve)
+    return ellipsoidActor(fit, actorRadius), ellipsoidReport(fit)
+
+
+def communityEllipsoid(ds, mve=False, tol=0.001):
+    """
+    Fit an ellipsoid once to the recorded bacteria, or to the placed 
+    markers if there are none. The reported ellipsoid is derived from 
+    the fit by scaling it about the origin by ELLIPSOID_SCALE: the 
+    matrix is divided by its square and the radii multiplied by it.
     
-    points = array(points)
+    :@type ds: Vec3f 
+    :@param ds: Data spacing. The ratio of microns/pixel
+    :@type mve: bool
+    :@param mve: Use the MinimumVolumeEllipsoid instead of the Lowner 
+                 method for fitting.
+    :@type tol: float
+    :@param tol: Error in the solution with respect to the optimal value.
     
-    fpoints = 2.8 * points
+    :@rtype: EllipsoidFit
+    """
+    global _mveWeights
+    points, fBacteria = fitPoints(9)
     
+    start = time.time()
     if mve:
-        print 'fitting MVE'
-        A, center = minimumVolumeEllipsoid(points, tol=0.001)
-        fA, fcenter = lownerEllipsoid(fpoints, tol=0.001)
+        # start from the weights of the last fit; they stay aligned with 
+        # the markers as long as bacteria were only appended since
+        A, center, _mveWeights, iterations = mvee.minimumVolumeEllipsoid(
+                                                    points, tol, _mveWeights)
     else:
-        print 'fitting Lowner'
-        A, center = lownerEllipsoid(points, tol=0.001)
-        fA, fcenter = lownerEllipsoid(fpoints, tol=0.001)
+        A, center, iterations = mvee.lownerEllipsoid(points, tol)
+    seconds = time.time() - start
     
-    r, RM   = extractEllipsoidParams(A)
-    fr, fRM = extractEllipsoidParams(fA)
-    radius = Vec3f(r)
-    fradius = Vec3f(fr)
+    r, RM = extractEllipsoidParams(A)
+    fr = tuple(ELLIPSOID_SCALE * x for x in r)
     
-    center = Vec3f(list(center[:,0]))
+    volume = 4.0/3.0 * math.pi * fr[0] * fr[1] * fr[2] * ds.x * ds.y * ds.z
+    bactVol, ibcDensity = bacteriaDensity(ds, volume, fBacteria)
     
-    print str(ds)
-    volume = 4.0/3.0 * math.pi * fradius.x * fradius.y * fradius.z * ds.x * ds.y * ds.z
-    
-    bactVol = bacterialVolume() * ds.x * ds.y * ds.z if fBacteria else 0
+    return EllipsoidFit('MVE' if mve else 'Lowner', tuple(r), RM, 
+                        tuple(center[:,0]), fr, volume, bactVol, ibcDensity, 
+                        iterations, seconds)
+
+
+def fitPoints(minimum):
+    """
+    :@type minimum: int
+    :@param minimum: The fewest points the fit can use.
+    :@rtype: tuple
+    :@return: The (3 x N) markers of the recorded bacteria, or of the placed 
+              markers if there are no bacteria, and whether they are the 
+              bacteria.
+    """
+    points = DataStore.BacteriaMarkers()
+    fBacteria = True
+        
+    # if no recorded bacteria, use the placed markers
+    if not points.shape[1]:
+        points = array([position(marker) for marker in DataStore.Markers()], 
+                       dtype=float).reshape(-1, 3).T
+        fBacteria = False
     
-    ibcDensity = bactVol/volume
+    if points.shape[1] < minimum:
+        raise RuntimeError('At least %i markers are needed for the fit' % minimum)
     
+    return points, fBacteria
+
+
+def bacteriaDensity(ds, volume, fBacteria):
+    """
+    :@rtype: tuple
+    :@return: The volume of the recorded bacteria in cubic microns and its 
+              ratio to the given volume, or (None, None) if the fit was 
+              not to the bacteria.
+    """
+    if not fBacteria:
+        return None, None
+    bactVol = bacterialVolume() * ds.x * ds.y * ds.z
+    return bactVol, bactVol/volume
+
+
+def ellipsoidActor(fit, actorRadius):
+    """
+    :@type fit: EllipsoidFit
+    :@type actorRadius: float
+    :@param actorRadius: The radius of the recorded bacteria
+    :@rtype: vtkActor
+    :@return: A translucent actor of the fitted ellipsoid.
+    """
+    RM = fit.rotation
+    center = Vec3f(fit.center)
     rm = vtk.vtkMatrix4x4()
     rm.DeepCopy((RM[0,0], RM[0,1], RM[0,2], center.x,
                  RM[1,0], RM[1,1], RM[1,2], center.y,
@@ -90,15 +158,7 @@ def fitEllipsoid(ds, actorRadius, mve=False):
                     0   ,    0   ,    0   , 1))
     
     # make the ellipsoid cover the whole actor since it is fit using the centers
-    radius += actorRadius
-    
-    out = []
-    out.append("Ellipsoid type:\t%s" % ellipsoidType(fradius))
-    out.append("Ellipsoid radii:\t%s" % str(fradius))
-    out.append("Ellipsoid Volume:\t%f" % volume)
-    if fBacteria:
-        out.append("Bacteria Volume:\t%f" % bactVol)
-        out.append("Bacterial Mass to Ellipsoid Volume ratio:\t%f" % ibcDensity)
+    radius = Vec3f(fit.radii) + actorRadius
     
     ellipsoid = createEllipsoid(radius, Vec3f())
     ellipsoid.SetUserMatrix(rm)
@@ -107,7 +167,25 @@ def fitEllipsoid(ds, actorRadius, mve=False):
     ellipsoid.GetProperty().SetSpecularPower(5)
     ellipsoid.GetProperty().SetOpacity(0.2)
     
-    return ellipsoid, '\n'.join(out)
+    return ellipsoid
+
+
+def ellipsoidReport(fit):
+    """
+    :@type fit: EllipsoidFit
+    :@rtype: str
+    :@return: The fit described in a few tab separated lines.
+    """
+    fradius = Vec3f(fit.scaledRadii)
+    out = []
+    out.append("Ellipsoid type:\t%s" % ellipsoidType(fradius))
+    out.append("Ellipsoid radii:\t%s" % str(fradius))
+    out.append("Ellipsoid Volume:\t%f" % fit.volume)
+    if fit.bacteriaVolume is not None:
+        out.append("Bacteria Volume:\t%f" % fit.bacteriaVolume)
+        out.append("Bacterial Mass to Ellipsoid Volume ratio:\t%f" % fit.density)
+    
+    return '\n'.join(out)
 
 
 def bacterialVolume():
@@ -118,22 +196,40 @@ def bacterialVolume():
     :@rtype: float
     :@return: The total volume of all recorded bacteria 
     """
-    accumVol = 0.0
     r = 1
-    cylvol = lambda pt1,pt2: (math.pi)*(r**2)*(pt1-pt2).length()
     spvol = (4.0/3) * math.pi * r**3
     
-    for bact in DataStore.Bacteria():
-        for i in range(len(bact.Markers)-1):
-#            v = cylvol(convert(bact.Markers[i], ds), 
-#                       convert(bact.Markers[i+1], ds))
-#            l = (HFF*bact.Markers[i] - HFF*bact.Markers[i+1]).length()
-            tmp = cylvol(HFF*bact.Markers[i], HFF*bact.Markers[i+1])
-#            print "cylvol: ", tmp, str(l)
-            accumVol += tmp
-        accumVol += spvol
+    # a cylinder between each pair of consecutive markers of a bacterium,
+    # skipping the pairs that straddle two bacteria
+    columns = DataStore.Columns()
+    seg = HFF * (columns.Coords[1:] - columns.Coords[:-1])
+    within = ones(len(seg), dtype=bool)
+    within[columns.Offsets[1:-1] - 1] = False
+    cylinders = math.pi * r**2 * sqrt((seg[within]**2).sum(axis=1)).sum()
     
-    return accumVol
+    return float(cylinders + spvol * columns.count)
+
+
+def bacterialUnionVolume(ds, voxel=0.25, r=1):
+    """
+    Calculate the volume of the union of all recorded bacteria, in the 
+    same units as bacterialVolume() but counting the space where bacteria 
+    overlap only once. See calc.volume.
+    
+    :@type ds: Vec3f 
+    :@param ds: Data spacing. The ratio of microns/pixel
+    :@type voxel: float
+    :@param voxel: The voxel size, relative to the bacteria radius of 1.
+    :@rtype: calc.volume.UnionVolume
+    :@return: The union and summed volumes in cubic microns and the 
+              fraction of the summed volume in overlaps between 
+              bacteria.
+    """
+    A, B, owners = capsuleSegments(DataStore.Columns(), HFF)
+    fit = unionVolume(A, B, r, voxel * r, owners=owners)
+    cell = ds.x * ds.y * ds.z
+    return fit._replace(volume=fit.volume * cell, 
+                        summedVolume=fit.summedVolume * cell)
 
 def convert(pt, ds):
     return Vec3f(pt.x*ds.x, pt.y*ds.y, pt.z*ds.z)
@@ -181,38 +277,11 @@ def minimumVolumeEllipsoid(P, tol):
     :@return: A: (d x d) matrix of the ellipse equation in the 'center form': 
                   (x-c)' * A * (x-c) = 1 
               c: 'd' dimensional vector as the center of the ellipse.
-    """
-    d, N = P.shape
-    
-    # Solving the dual problem
-    Q = zeros((d+1,N))
-    Q[0:d][:] = P[0:d][0:N]
-    Q[d,:] = ones((1,N))
-    
-    cnt = 1
-    err = 1
-    u = (1.0/N) * ones((N,1))
-    
-    # Khachiyan Algorithm
-    while err > tol:
-        X = dot(dot(Q,diag(u[:,0])), Q.T)
-        M = diag(dot(dot(Q.T, la.inv(X)), Q))
-        (_,maximum),(_,j) = extents(M)
-        step_size = (maximum - d -1)/((d+1)*(maximum-1))
-        new_u = (1 - step_size) * u
-        new_u[j] = new_u[j] + step_size
-        cnt += 1
-        err = la.norm(new_u - u)
-        u = new_u
-    
-    # Finds the ellipse equation in the 'center form': 
-    # (x-c)' * A * (x-c) = 1
-    # It computes a dxd matrix 'A' and a d dimensional vector 'c' as the center
-    # of the ellipse. 
-    U = diag(u[:,0])
-    A = (1.0/d) * la.inv(dot(dot(P,U),P.T) - dot(dot(P, u), dot(P, u).T))
-    c = dot(P, u)
     
+    Note: No N x N matrix is formed; see calc.ellipsoid.minimumVolumeEllipsoid
+          for the O(N*d) version used, which can also be warm started.
+    """
+    A, c, _, _ = mvee.minimumVolumeEllipsoid(P, tol)
     return A, c
 
 
@@ -237,6 +306,8 @@ def lownerEllipsoid(P, tol):
     http://www.mathworks.com/matlabcentral/fileexchange/21930
     
     This method is slightly faster than minimumVolumeEllipsoid().
+    The points are reduced to their convex hull vertices before fitting; 
+    see calc.ellipsoid.lownerEllipsoid.
     
     :@type P: numpy.ndarray
     :@param P: (d x N) dimensional array containing N points in R^d.
@@ -248,48 +319,11 @@ def lownerEllipsoid(P, tol):
                   (x-c)' * A * (x-c) = 1 
               c: 'd' dimensional vector as the center of the ellipse.
     """
-    n, m = P.shape
-    if n < 1:
-        raise Exception("P must be of at least 1 dimension")
-    
-    # Find the Lowner ellipsoid of the centrally symmetric set lifted
-    # to a hyperplane in a higher dimension.
-    F = khachiyan(vstack((P, ones((1,m)))), tol)
-    # Intersect with the hyperplane where the input points lie.
-    A = F[0:n][:,0:n]
-    b = F[-1][0:n][:,newaxis]
-    c = la.solve(-A,b)
-    E = A/(1-dot(c[:,0].T,b-F[-1][-1])[0])
-    
-    # Force all the points to really be covered.
-    ac = P - tile(c, (1,m))
-    E = E/max(bdot(ac,dot(E,ac)))
-
+    E, c, _ = mvee.lownerEllipsoid(P, tol)
     return E, c
 
 def khachiyan(a, tol):
-    n, m = a.shape
-    # Initialize the barycentric coordinate descent.
-    invA = m * la.inv(dot(a, a.T))
-    w = bdot(a, dot(invA, a))
-    
-    # Khachiyan's BCD algorithm for finding the Lowner ellipsoid of a
-    # centrally symmetric set.
-    while True:
-        (_, w_r), (_, r) = extents(w)
-        f = w_r / n
-        epsilon = f - 1
-        if epsilon <= tol: 
-            break
-        g = epsilon / ((n - 1) * f)
-        h = 1 + g 
-        g = g / f
-        b = dot(invA, a[:, r])
-        invA = h * invA - g * b[:, newaxis] * b
-        bTa = dot(b, a)
-        w = h * w - g * (bTa * bTa)
-    
-    return invA / max(bdot(a, dot(invA, a)))
+    return mvee.khachiyan(a, tol)[0]
 
 
 
@@ -304,8 +338,7 @@ def bdot(a, b):
     :@return: An array of size 1 x m containing the scalar results 
               of m dot products between each column of a and b.
     """
-    _, m = a.shape 
-    return array([dot(a[:,i],b[:,i]) for i in range(m)])
+    return einsum('ij,ij->j', a, b)
     
 
 def extractEllipsoidParams(A):
@@ -349,57 +382,81 @@ def singular(A):
     return False
 
 
-from itertools import count, izip
-from collections import namedtuple
-
-Extent = namedtuple('Extent', 'min, max')
-
-def fastSphere(actorRadius):
-    points = DataStore.BacteriaMarkers()
+def communitySphere(ds):
+    """
+    Fit the exact minimum enclosing sphere to the recorded bacteria, or 
+    to the placed markers if there are none, as a cheaper alternative to 
+    communityEllipsoid. It is reported scaled by ELLIPSOID_SCALE so the 
+    two volume estimates are comparable.
     
-    # min/max for all components
-    extX, idxX = extents(points[0])
-    extY, idxY = extents(points[1])
-    extZ, idxZ = extents(points[2])
-    
-    dVx = Vec3f(points[0][idxX.max], points[1][idxX.max], points[2][idxX.max]) - Vec3f(points[0][idxX.min], points[1][idxX.min], points[2][idxX.min])
-    dVy = Vec3f(points[0][idxX.max], points[1][idxX.max], points[2][idxX.max]) - Vec3f(points[0][idxX.min], points[1][idxX.min], points[2][idxX.min])
-    dVz = Vec3f(points[0][idxX.max], points[1][idxX.max], points[2][idxX.max]) - Vec3f(points[0][idxX.min], points[1][idxX.min], points[2][idxX.min])
-    dx2 = dVx.dot(dVx)
-    dy2 = dVy.dot(dVy)
-    dz2 = dVz.dot(dVz)
-    
-    mdd = max(izip([dx2,dy2,dz2], count()))[1]  # maximum distance dimension
-    dlist = [dVx, dVy, dVz]
-    idxlist = [idxX, idxY, idxZ]
-    # Center = midpoint of extremes
-    C = Vec3f(points[0][idxlist[mdd].min], points[1][idxlist[mdd].min], points[2][idxlist[mdd].min]) + (dlist[mdd] / 2.0)
-    # radius squared: max point in dimension mdd - Center 
-    rad2 = Vec3f(points[0][idxlist[mdd].max], points[1][idxlist[mdd].max], points[2][idxlist[mdd].max]) - C
-    rad2 = rad2.dot(rad2)
-    radius = sqrt(rad2)
-    
-    # now check that all points V[i] are in the ball
-    # and if not, expand the ball just enough to include them
-    for i in range(points[0]):
-        dV = Vec3f(points[0][i], points[1][i], points[2][i]) - C
-        dist2 = dV.dot(dV)
-        if dist2 <= rad2:    # the point is inside the ball already
-            continue
-        # point not in ball, so expand ball to include it
-        dist = sqrt(dist2)
-        radius = (radius + dist) / 2.0   # enlarge radius just enough
-        rad2 = radius**2
-        C = C + ((dist-radius)/dist) * dV   # shift Center toward V[i] 
+    :@type ds: Vec3f 
+    :@param ds: Data spacing. The ratio of microns/pixel
+    :@rtype: SphereFit
+    """
+    points, fBacteria = fitPoints(1)
     
-    volume = 4.0/3.0 * math.pi * radius**3
+    start = time.time()
+    center, radius = minimumEnclosingSphere(points.T, seed=0)
+    seconds = time.time() - start
+    
+    fr = ELLIPSOID_SCALE * radius
+    volume = 4.0/3.0 * math.pi * fr**3 * ds.x * ds.y * ds.z
+    bactVol, ibcDensity = bacteriaDensity(ds, volume, fBacteria)
     
-    sphere = createSphere(radius, C)
+    return SphereFit(radius, tuple(center), fr, volume, bactVol, ibcDensity, 
+                     seconds)
+
+
+def sphereActor(fit, actorRadius):
+    """
+    :@type fit: SphereFit
+    :@type actorRadius: float
+    :@param actorRadius: The radius of the recorded bacteria
+    :@rtype: vtkActor
+    :@return: A translucent actor of the fitted sphere.
+    """
+    sphere = createSphere(fit.radius + actorRadius, Vec3f(fit.center))
     sphere.GetProperty().SetDiffuseColor(1, 1, 1)
     sphere.GetProperty().SetSpecular(.1)
     sphere.GetProperty().SetSpecularPower(5)
     sphere.GetProperty().SetOpacity(0.2)
     
+    return sphere
+
+
+def sphereReport(fit):
+    """
+    :@type fit: SphereFit
+    :@rtype: str
+    :@return: The fit described in a few tab separated lines.
+    """
+    out = []
+    out.append("Sphere radius:\t%f" % fit.scaledRadius)
+    out.append("Sphere Volume:\t%f" % fit.volume)
+    if fit.bacteriaVolume is not None:
+        out.append("Bacteria Volume:\t%f" % fit.bacteriaVolume)
+        out.append("Bacterial Mass to Sphere Volume ratio:\t%f" % fit.density)
+    
+    return '\n'.join(out)
+
+
+def fastSphere(actorRadius):
+    """
+    The minimum enclosing sphere of the recorded bacteria with a label 
+    of its volume and radius in marker coordinates.
+    
+    :@type actorRadius: float
+    :@param actorRadius: The radius of the recorded bacteria
+    :@rtype: tuple -> (vtkActor, vtkActor2D)
+    :@return: The sphere actor and the text actor.
+    """
+    fit = communitySphere(Vec3f(1, 1, 1))
+    C = Vec3f(fit.center)
+    radius = fit.radius
+    volume = 4.0/3.0 * math.pi * radius**3
+    
+    sphere = sphereActor(fit, actorRadius)
+    
     sTextMapper = vtk.vtkTextMapper()
     sTextMapper.SetInput("Volume: %d\nRadius: %d" % (volume, radius))
     sTextMapper.GetTextProperty().SetJustificationToCentered()
@@ -412,12 +469,3 @@ def fastSphere(actorRadius):
     sTextActor.GetPositionCoordinate().SetValue(C.x-30, C.y-30, C.z)
     
     return sphere, sTextActor
-    
-    
-
-def extents(points):
-    """"min/max for values in points and the indices of each"""
-    (vmin, imin), (vmax, imax) = min(izip(points, count())), max(izip(points, count()))
-    ext = Extent(vmin, vmax)
-    idx = Extent(imin, imax)
-    return ext, idx
\ No newline at end of file
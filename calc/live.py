@@ -0,0 +1,106 @@
+'''
+Created on Oct 18, 2026
+
+Community statistics kept up to date as bacteria are recorded and
+deleted, so they can be shown live at a constant cost per change instead
+of being recomputed from every recorded bacterium.
+'''
+from calc.online import RunningMoments
+from store import DataStore
+
+import numpy as np
+
+MORPHOLOGIES = ('coccus', 'bacillus', 'filament')
+
+
+def morphology(bact):
+    """
+    :@type bact: data.objects.Bacterium
+    :@rtype: str
+    :@return: 'coccus', 'bacillus' or 'filament' by the number of markers.
+    """
+    return MORPHOLOGIES[min(len(bact.Markers), 3) - 1]
+
+
+class LiveStats(object):
+    """
+    Running aggregates of the bacteria in the DataStore: counts per
+    morphology, bacillus lengths, bacillus orientations (the absolute dot
+    product with each axis, as in communityOrientationStats) and the sum
+    of bacterium centers. Each is updated in O(1) by observing
+    DataStore.AddBacterium and DataStore.RemoveBacterium.
+
+    Note: the min and max of the length and orientation moments are not
+          lowered when bacteria are deleted.
+    """
+    def __init__(self, observe=True):
+        """
+        :@type observe: bool
+        :@param observe: Start with the bacteria already in the DataStore
+                         and follow its changes.
+        """
+        self.Reset()
+        if observe:
+            for bact in DataStore.Bacteria():
+                self.Add(bact)
+            DataStore.AddObserver('BacteriumAdded', self.Add)
+            DataStore.AddObserver('BacteriumRemoved', self.Remove)
+
+    def Reset(self):
+        self.counts = dict((m, 0) for m in MORPHOLOGIES)
+        self.lengths = RunningMoments()
+        self.orientations = [RunningMoments() for _ in range(3)]
+        self.centerSum = np.zeros(3)
+
+    def Add(self, bact):
+        self._Update(bact, 1)
+
+    def Remove(self, bact):
+        self._Update(bact, -1)
+
+    def _Update(self, bact, sign):
+        kind = morphology(bact)
+        self.counts[kind] += sign
+        self.centerSum += sign * np.mean([m.toTuple() for m in bact.Markers], axis=0)
+
+        if kind != 'bacillus':
+            return
+        length = (bact.Markers[0] - bact.Markers[1]).length()
+        o = bact.Orientation.toTuple()
+        if sign > 0:
+            self.lengths.Add(length)
+            for axis in range(3):
+                self.orientations[axis].Add(abs(o[axis]))
+        else:
+            self.lengths.Remove(length)
+            for axis in range(3):
+                self.orientations[axis].Remove(abs(o[axis]))
+
+    @property
+    def Count(self):
+        return sum(self.counts.values())
+
+    @property
+    def Centroid(self):
+        """
+        :@rtype: numpy.ndarray
+        :@return: The mean center of all recorded bacteria, or None.
+        """
+        if not self.Count:
+            return None
+        return self.centerSum / self.Count
+
+    def Summary(self):
+        """
+        Format the statistics in a few short lines.
+
+        :@rtype: str
+        """
+        lines = ['Cocci: %i  Bacilli: %i  Filaments: %i' %
+                 tuple(self.counts[m] for m in MORPHOLOGIES)]
+        if self.lengths.n:
+            lines.append('Bacillus length: %.2f (std %.2f)' %
+                         (self.lengths.mean, self.lengths.Std))
+            lines.append('Orientation |x| |y| |z|: %.2f %.2f %.2f' %
+                         tuple(o.mean for o in self.orientations))
+        return '\n'.join(lines)
@@ -0,0 +1,222 @@
+'''
+Created on Oct 18, 2026
+
+Online descriptive statistics in constant memory. Values are folded
+into a RunningMoments (exact mean and variance) and a KLLSketch
+(approximate quantiles) as they arrive. Accumulators built over separate
+chunks, worker processes or projects can be merged afterwards, and are
+picklable so they can be returned from a multiprocessing pool or stored
+in a project file.
+'''
+import numpy as np
+
+
+class RunningMoments(object):
+    """
+    Count, mean, variance, minimum and maximum using Welford's update for
+    single values and Chan et al.'s pairwise update for arrays and merges.
+    """
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def Add(self, x):
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+        self.min = min(self.min, x)
+        self.max = max(self.max, x)
+
+    def Remove(self, x):
+        """
+        Undo the Add of a value. The min and max are left unchanged.
+        """
+        if self.n <= 1:
+            self.__init__()
+            return
+        n = self.n - 1
+        mean = (self.n * self.mean - x) / n
+        self.m2 = max(self.m2 - (x - self.mean) * (x - mean), 0.0)
+        self.mean = mean
+        self.n = n
+
+    def AddArray(self, values):
+        """
+        :@type values: numpy.ndarray
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        if not len(values):
+            return
+        block = RunningMoments()
+        block.n = len(values)
+        block.mean = values.mean()
+        block.m2 = ((values - block.mean)**2).sum()
+        block.min = values.min()
+        block.max = values.max()
+        self.Merge(block)
+
+    def Merge(self, other):
+        """
+        Add the values summarized by another RunningMoments.
+        """
+        if not other.n:
+            return
+        total = self.n + other.n
+        delta = other.mean - self.mean
+        self.mean += delta * other.n / total
+        self.m2 += other.m2 + delta**2 * self.n * other.n / total
+        self.n = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    @property
+    def Variance(self):
+        """
+        The population variance (ddof=0, as scipy.std uses).
+        """
+        return self.m2 / self.n if self.n else 0.0
+
+    @property
+    def Std(self):
+        return np.sqrt(self.Variance)
+
+
+class KLLSketch(object):
+    """
+    The KLL quantile sketch (Karnin, Lang and Liberty, 2016). Values are
+    kept in a hierarchy of compactors; level h holds values standing for
+    2^h inputs each. When a level is over capacity it is sorted and every
+    other value, from a random offset, is promoted to the next level.
+    Capacities shrink by c per level below the top, so memory is about
+    k / (1 - c) values regardless of the number of inputs, and the rank
+    error of a quantile is about 1.7 / k with high probability.
+    """
+    def __init__(self, k=200, c=2/3.0, seed=None):
+        """
+        :@type k: int
+        :@param k: The capacity of the top level; larger is more accurate.
+        :@type c: float
+        :@param c: The capacity ratio between adjacent levels.
+        :@type seed: int
+        :@param seed: Seed for the random compaction offsets.
+        """
+        self.k = k
+        self.c = c
+        self.n = 0
+        self.levels = [np.zeros(0)]
+        self.rng = np.random.RandomState(seed)
+
+    def Update(self, x):
+        self.UpdateArray([x])
+
+    def UpdateArray(self, values):
+        """
+        :@type values: numpy.ndarray
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        self.n += len(values)
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._Compress()
+
+    def Merge(self, other):
+        """
+        Add the values summarized by another sketch with the same k and c.
+        """
+        if (other.k, other.c) != (self.k, self.c):
+            raise ValueError('Cannot merge KLL sketches with different parameters')
+
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.zeros(0))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = np.concatenate([self.levels[h], level])
+        self.n += other.n
+        self._Compress()
+
+    def Quantiles(self, qs):
+        """
+        :@type qs: list
+        :@param qs: Quantiles from 0 to 1.
+        :@rtype: numpy.ndarray
+        :@return: The estimated value at each quantile.
+        """
+        values = np.concatenate(self.levels)
+        if not len(values):
+            return np.array([np.nan] * len(qs))
+        weights = np.concatenate([np.ones(len(level)) * 2**h
+                                  for h, level in enumerate(self.levels)])
+        order = np.argsort(values)
+        cum = np.cumsum(weights[order])
+        idx = np.searchsorted(cum, np.asarray(qs) * cum[-1], side='left')
+        return values[order][np.minimum(idx, len(values) - 1)]
+
+    def Quantile(self, q):
+        return self.Quantiles([q])[0]
+
+    @property
+    def Size(self):
+        """
+        The number of values held by the sketch.
+        """
+        return sum(len(level) for level in self.levels)
+
+    def _Capacity(self, h):
+        depth = len(self.levels) - h - 1
+        return max(int(np.ceil(self.k * self.c**depth)), 2)
+
+    def _Compress(self):
+        h = 0
+        while h < len(self.levels):
+            level = self.levels[h]
+            if len(level) > self._Capacity(h):
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.zeros(0))
+                level = np.sort(level)
+                # an odd value stays behind so compacted values pair up
+                odd = len(level) % 2
+                pairs = level[odd:]
+                promoted = pairs[self.rng.randint(2)::2]
+                self.levels[h] = level[:odd]
+                self.levels[h+1] = np.concatenate([self.levels[h+1], promoted])
+            h += 1
+
+
+class DescriptiveAccumulator(object):
+    """
+    Accumulates the values needed for calc.stat.DescriptiveStats:
+    exact mean and standard deviation, approximate median and quartiles.
+    """
+    def __init__(self, k=200, seed=None):
+        self.moments = RunningMoments()
+        self.sketch = KLLSketch(k, seed=seed)
+
+    def Add(self, x):
+        self.moments.Add(x)
+        self.sketch.Update(x)
+
+    def AddArray(self, values):
+        self.moments.AddArray(values)
+        self.sketch.UpdateArray(values)
+
+    def Merge(self, other):
+        self.moments.Merge(other.moments)
+        self.sketch.Merge(other.sketch)
+
+    @property
+    def Count(self):
+        return self.moments.n
+
+    def Stats(self):
+        """
+        :@rtype: calc.stat.DescriptiveStats
+        :@return: The statistics of the values added so far, or None if
+                  there are none.
+        """
+        from calc.stat import DescriptiveStats
+        if not self.moments.n:
+            return None
+        q1, med, q3 = self.sketch.Quantiles([0.25, 0.5, 0.75])
+        return DescriptiveStats(self.moments.mean, med, self.moments.Std, q1, q3)
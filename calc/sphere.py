@@ -0,0 +1,105 @@
+'''
+Created on Oct 18, 2026
+
+The exact minimum enclosing sphere of a set of points by Welzl's
+randomized algorithm with the move-to-front heuristic, in expected linear
+time. The search for the next point outside the current sphere is done
+with numpy over blocks of points, so only the few points that change the
+sphere are handled in Python.
+'''
+import numpy as np
+import numpy.linalg as la
+
+# Size of the first block searched for a point outside the sphere; it
+# doubles for each further block
+FIRST_BLOCK = 256
+# Relative slack on the squared radius so points on the sphere count as in
+EPSILON = 1e-10
+
+
+def minimumEnclosingSphere(points, seed=None):
+    """
+    :@type points: numpy.ndarray
+    :@param points: (N x d) array of points.
+    :@type seed: int
+    :@param seed: Seed for the random order the points are visited in.
+    :@rtype: tuple
+    :@return: The center (a d array) and radius of the smallest sphere
+              containing all the points.
+    """
+    points = np.asarray(points, dtype=float)
+    if not len(points):
+        raise ValueError('Cannot enclose an empty set of points')
+    P = points[np.random.RandomState(seed).permutation(len(points))]
+
+    center, r2 = _moveToFront(P, len(P), [])
+    return center, np.sqrt(r2)
+
+
+def _moveToFront(P, n, boundary):
+    """
+    The smallest sphere containing P[:n] with the given points on its
+    surface. Each point found outside the sphere is moved to the front of
+    P, so the points that define the sphere are tested first next time.
+    """
+    center, r2 = circumsphere(boundary)
+    if len(boundary) == P.shape[1] + 1:
+        return center, r2
+
+    i = 0
+    while True:
+        j = _firstOutside(P, i, n, center, r2)
+        if j is None:
+            return center, r2
+        p = P[j].copy()
+        center, r2 = _moveToFront(P, j, boundary + [p])
+        P[1:j+1] = P[:j].copy()
+        P[0] = p
+        i = j + 1
+
+
+def _firstOutside(P, start, stop, center, r2):
+    """
+    :@rtype: int
+    :@return: The index of the first of P[start:stop] outside the sphere,
+              or None.
+    """
+    limit = r2 * (1 + EPSILON) + EPSILON
+    block = FIRST_BLOCK
+    while start < stop:
+        end = min(start + block, stop)
+        if center is None:
+            return start
+        x = P[start:end] - center
+        outside = np.einsum('ij,ij->i', x, x) > limit
+        if outside.any():
+            return start + int(outside.argmax())
+        start = end
+        block *= 2
+    return None
+
+
+def circumsphere(boundary):
+    """
+    The smallest sphere with every one of up to d+1 affinely independent
+    points on its surface: its center is in their affine hull and at the
+    same distance from each.
+
+    :@type boundary: list
+    :@param boundary: d arrays.
+    :@rtype: tuple
+    :@return: The center and the squared radius, or (None, -1) when there
+              are no points.
+    """
+    if not boundary:
+        return None, -1.0
+    p0 = boundary[0]
+    if len(boundary) == 1:
+        return p0, 0.0
+
+    # center = p0 + V' * lambda with (V V') lambda = |v|^2 / 2 for the
+    # rows v of V; lstsq copes with nearly degenerate point sets
+    V = np.array(boundary[1:]) - p0
+    lam = la.lstsq(np.dot(V, V.T), 0.5 * (V**2).sum(axis=1), rcond=-1)[0]
+    offset = np.dot(lam, V)
+    return p0 + offset, np.dot(offset, offset)
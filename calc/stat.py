@@ -4,14 +4,14 @@ Created on Jul 24, 2011
 @author: shareef
 '''
 from render.basic import generateSpline
-from store import DataStore
-from vector import Vec3f
+from store import BACILLUS, FILAMENT, DataStore
+from vector import Vec3f, Vec3fArray
 import scipy as s
 import scipy.stats as ss
 from collections import namedtuple
 
 #from data.io import writeCSV
-#import numpy as np
+import numpy as np
 
 DescriptiveStats = namedtuple('DescriptiveStats', 'mean med std q1 q3')
 
@@ -22,17 +22,12 @@ def calculateLengths():
     """
     Calculate the lengths of all the recorded bacteria
     """
-    lengths = []
-    
-    for _, bact in enumerate(DataStore.Bacteria()):
-        blen = len(bact.Markers)
-        if blen == 2:
-            v = bact.Markers[0] - bact.Markers[1]
-            lengths.append(str(v.length()))
+    columns = DataStore.Columns()
+    starts = columns.Offsets[:-1][columns.Morphology == BACILLUS]
+    v = columns.Coords[starts] - columns.Coords[starts+1]
+    lengths = [str(l) for l in np.sqrt((v**2).sum(axis=1)).tolist()]
 
-        #TODO: calculate filament lengths
-        if blen > 2:
-            pass
+    #TODO: calculate filament lengths
     
     # if there are no bacteria, return
     if not lengths:
@@ -41,32 +36,30 @@ def calculateLengths():
     return lengths
 
 
-def communityDistanceStats():
+def communityDistanceStats(nearest=False, exact=True):
     """
     Calculate DescriptiveStats for the distance between all bacteria (excluding filaments)
+    
+    :@type nearest: bool
+    :@param nearest: Only use the distance from each bacterium to its 
+                     nearest neighbour.
+    :@type exact: bool
+    :@param exact: If False, the pairwise median and quartiles are 
+                   estimated in a single pass (see 
+                   calc.distance.pairwiseDistanceStats).
+    :@rtype: DescriptiveStats
+    :@return: The statistics, or None if fewer than two bacteria qualify.
     """
-    centers = []
-    for bact in DataStore.Bacteria():
-        blen = len(bact.Markers)
-        if blen == 1:
-            c = HFF*bact.Markers[0]*ds
-        elif blen == 2:
-            p1 = HFF*bact.Markers[0]*ds
-            p2 = HFF*bact.Markers[1]*ds
-            c = p1.midpoint(p2)
-        else:
-            continue
-        centers.append(c)
-    
-    dist = []
-    for i in range(len(centers)-1):
-        for j in range(i+1, len(centers)):
-            dist.append((centers[i] - centers[j]).length())
-
+    from calc.distance import (centerArray, nearestNeighbourDistances, 
+                               pairwiseDistanceStats)
+    centers = centerArray(DataStore.Columns(), (HFF*ds).toTuple())
     
-#    writeCSV(np.vstack(dist), ['dist'], 'density.csv')
-
-    return generateDescriptiveStats(dist)
+    if nearest:
+        if len(centers) < 2:
+            return None
+        return generateDescriptiveStats(nearestNeighbourDistances(centers))
+    
+    return pairwiseDistanceStats(centers, exact=exact)
 
 
 def communityOrientationStats():
@@ -80,37 +73,32 @@ def communityOrientationStats():
     bdots = [[],[],[]]
     fdots = [[],[],[]]
     sRes = []
-    bacilli = []
     filaments = []
     #lengths = []
     xbasis = Vec3f(1,0,0)
     ybasis = Vec3f(0,1,0)
     zbasis = Vec3f(0,0,1)
     
-    for i, bact in enumerate(DataStore.Bacteria()):
-        blen = len(bact.Markers)
-        if blen == 2:
-            bacilli.append(DataStore.BacteriaActors()[i])
-            v = bact.Markers[0] - bact.Markers[1]
-            #lengths.append(v.length())
-            v.normalize()
-            bdots[0].append(xbasis.dot(v))
-            bdots[1].append(ybasis.dot(v))
-            bdots[2].append(zbasis.dot(v))
-        # calculate filament orientations b/t each two markers
-        if blen > 2:
-            filaments.append(i)
-            _, _, _, splinePoints = generateSpline(bact.Markers)
-            sRes.append(len(splinePoints) - 1)  # -1 b/c we're using every pair, not every point
-            sMarkers = [Vec3f(point) for point in splinePoints]
-            for j in range(len(sMarkers)-1):
-                v = sMarkers[j] - sMarkers[j+1]
-                v.normalize()
-                fdots[0].append(xbasis.dot(v))
-                fdots[1].append(ybasis.dot(v))
-                fdots[2].append(zbasis.dot(v))
-            
-            
+    # the dot product with a basis vector is just the component
+    columns = DataStore.Columns()
+    isBacillus = columns.Morphology == BACILLUS
+    starts = columns.Offsets[:-1][isBacillus]
+    v = columns.Coords[starts] - columns.Coords[starts+1]
+    v /= np.sqrt((v**2).sum(axis=1))[:, np.newaxis]
+    bdots = v.T.tolist() if len(v) else bdots
+    bacilli = [DataStore.BacteriaActors()[i] for i in np.flatnonzero(isBacillus)]
+    
+    # calculate filament orientations b/t each two markers
+    for i in np.flatnonzero(columns.Morphology == FILAMENT).tolist():
+        filaments.append(i)
+        _, _, _, splinePoints = generateSpline(DataStore.Bacteria()[i].Markers)
+        sRes.append(len(splinePoints) - 1)  # -1 b/c we're using every pair, not every point
+        sMarkers = Vec3fArray(splinePoints)
+        v = sMarkers[:-1] - sMarkers[1:]
+        v.normalize()
+        fdots[0].extend(v.dot(xbasis).tolist())
+        fdots[1].extend(v.dot(ybasis).tolist())
+        fdots[2].extend(v.dot(zbasis).tolist())
     
 #    data = np.hstack((np.array(angles).T, np.array(lengths)[:,np.newaxis]))
 #    writeCSV(data, ['x','y','z','len'], 'olen.csv')
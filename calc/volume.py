@@ -0,0 +1,290 @@
+'''
+Created on Oct 18, 2026
+
+The volume of the union of the recorded bacteria, measured by
+voxelizing them into a shared occupancy grid so that where bacteria
+overlap the volume is counted once. Every bacterium is a set of capsules
+(a segment swept by a sphere): a coccus is one zero-length capsule, a
+bacillus one capsule between its two markers, and a filament one capsule
+between each pair of consecutive markers.
+
+The grid is processed a slab at a time. Since a capsule is convex, each
+line of voxels along z crosses it in a single interval, which is solved
+for directly with numpy for every capsule and (x, y) column of its
+bounding box at once. The union volume is the length of the union of the
+intervals, found by sorting them, and the summed volume the total of the
+same for the intervals of each bacterium on its own, so that the joints
+of a filament are not taken for overlap; the occupancy grid itself is
+only built when asked for.
+'''
+from store import COCCUS
+
+from collections import namedtuple
+import numpy as np
+
+# Voxels in one slab of the grid; a slab's occupancy grid, when asked
+# for, takes 8 bytes per voxel while it is built
+SLAB_VOXELS = 1 << 25
+# (x, y) columns solved at once by a batch of capsules
+BATCH_COLUMNS = 1 << 18
+# Bounding box sizes are rounded up to a multiple of this, so that
+# capsules of similar size share a batch
+BLOCK_ROUND = 2
+
+# volume: The volume of the union of the capsules
+# summedVolume: The sum of the volumes of each bacterium (or of each
+#               capsule, if their owners are not given), at the same
+#               resolution, so overlaps are counted as often as they occur
+# overlap: The fraction of summedVolume counted more than once,
+#          1 - volume / summedVolume, i.e. shared by distinct bacteria
+# voxelSize: The edge length of a voxel
+# origin: The x,y,z position of the corner of the grid
+# shape: The number of voxels along each axis of the grid
+# grid: The occupancy bit-packed with numpy.packbits, in C order, or None
+UnionVolume = namedtuple('UnionVolume', 'volume summedVolume overlap voxelSize '
+                         'origin shape grid')
+
+
+def capsuleSegments(columns, scale=1.0):
+    """
+    The segments of the capsules making up a set of bacteria.
+
+    :@type columns: store.BacteriaColumns
+    :@param columns: The bacteria, e.g. DataStore.Columns().
+    :@type scale: float or tuple
+    :@param scale: Factor(s) applied to the marker coordinates.
+    :@rtype: tuple
+    :@return: (K x 3) arrays of the start and end of each segment, and
+              the index of the bacterium owning each segment.
+    """
+    coords = columns.Coords * scale
+    # consecutive markers of the same bacterium
+    within = np.ones(max(len(coords) - 1, 0), dtype=bool)
+    within[columns.Offsets[1:-1] - 1] = False
+    isCoccus = columns.Morphology == COCCUS
+    cocci = coords[columns.Offsets[:-1][isCoccus]]
+
+    return (np.vstack([coords[:-1][within], cocci]),
+            np.vstack([coords[1:][within], cocci]),
+            np.concatenate([columns.Owners()[:-1][within],
+                            np.flatnonzero(isCoccus)]))
+
+
+def unionVolume(A, B, radius, voxel, grid=False, owners=None):
+    """
+    Voxelize the capsules of the given radius around the segments A-B.
+    A voxel is occupied if its center is within radius of a segment.
+
+    :@type A, B: numpy.ndarray
+    :@param A, B: (K x 3) arrays of the ends of each segment.
+    :@type radius: float
+    :@type voxel: float
+    :@param voxel: The edge length of a voxel, in the units of A and B.
+    :@type grid: bool
+    :@param grid: Also return the bit-packed occupancy grid.
+    :@type owners: numpy.ndarray
+    :@param owners: The bacterium owning each segment, as returned by
+                    capsuleSegments(). Without them, each capsule is taken
+                    for a bacterium of its own.
+    :@rtype: UnionVolume
+    """
+    A = np.asarray(A, dtype=float).reshape(-1, 3)
+    B = np.asarray(B, dtype=float).reshape(-1, 3)
+    if owners is not None:
+        owners = np.asarray(owners)
+    if not len(A):
+        return UnionVolume(0.0, 0.0, 0.0, voxel, np.zeros(3), (0, 0, 0),
+                           np.zeros(0, dtype=np.uint8) if grid else None)
+
+    lo = np.minimum(A, B).min(axis=0) - radius
+    hi = np.maximum(A, B).max(axis=0) + radius
+    shape = np.ceil((hi - lo) / voxel).astype(np.int64) + 1
+
+    # the columns of voxels around each capsule
+    first = np.floor((np.minimum(A, B) - radius - lo) / voxel).astype(np.int64)
+    last = np.floor((np.maximum(A, B) + radius - lo) / voxel).astype(np.int64)
+    first = np.maximum(first, 0)
+    dims = -(-(last - first + 1)[:, :2] // BLOCK_ROUND) * BLOCK_ROUND
+
+    nx, ny, nz = shape.tolist()
+    slab = max(1, SLAB_VOXELS // (ny * (nz + 1)))
+    union = summed = 0
+    packed = []
+    for start in range(0, nx, slab):
+        stop = min(start + slab, nx)
+        inSlab = np.flatnonzero((first[:, 0] < stop) & (last[:, 0] >= start))
+        first0, last0, capsule0 = _zIntervals(start, stop, ny, nz, inSlab, A,
+                                              B, first, dims, lo, radius, voxel)
+        if owners is None:
+            summed += int((last0 - first0 + 1).sum())
+        else:
+            summed += _unionLength(first0, last0, owners[capsule0])
+        union += _unionLength(first0, last0)
+        if grid:
+            packed.append(_occupancy(first0, last0, (stop - start, ny, nz)))
+
+    if grid:
+        packed = np.packbits(np.concatenate(packed))
+    cell = voxel**3
+    return UnionVolume(union * cell, summed * cell,
+                       1.0 - float(union) / summed if summed else 0.0,
+                       voxel, lo, tuple(shape.tolist()),
+                       packed if grid else None)
+
+
+def _zIntervals(start, stop, ny, nz, capsules, A, B, first, dims, lo, radius,
+                voxel):
+    """
+    Find the voxels of each column along z of the slab x = start:stop
+    that are inside each of the given capsules. Voxels are numbered
+    ((x - start) * ny + y) * (nz + 1) + z, so that the intervals of
+    different columns never touch.
+
+    :@rtype: tuple
+    :@return: Arrays of the numbers of the first and last voxel of each
+              interval, and of the capsule it belongs to.
+    """
+    firsts = [np.zeros(0, dtype=np.int64)]
+    lasts = [np.zeros(0, dtype=np.int64)]
+    which = [np.zeros(0, dtype=np.intp)]
+    if not len(capsules):
+        return firsts[0], lasts[0], which[0]
+
+    shapes, group = np.unique(dims[capsules], axis=0, return_inverse=True)
+    for g, (bx, by) in enumerate(shapes.tolist()):
+        members = capsules[group == g]
+        batch = max(1, BATCH_COLUMNS // (bx * by))
+        for i in range(0, len(members), batch):
+            k = members[i:i+batch]
+            # the x,y indices and centers of the columns, (K x bx x by)
+            ix = (first[k, 0][:, np.newaxis] + np.arange(bx))[:, :, np.newaxis]
+            iy = (first[k, 1][:, np.newaxis] + np.arange(by))[:, np.newaxis, :]
+            x = lo[0] + (ix + 0.5) * voxel
+            y = lo[1] + (iy + 0.5) * voxel
+
+            zlo, zhi = _capsuleInterval(x, y, A[k], B[k], radius)
+            # the voxel centers within [zlo, zhi]
+            k0 = np.maximum(np.ceil((zlo - lo[2]) / voxel - 0.5), 0)
+            k1 = np.minimum(np.floor((zhi - lo[2]) / voxel - 0.5), nz - 1)
+            valid = ((k0 <= k1) & (ix >= start) & (ix < stop) & (iy < ny))
+            column = (((ix - start) * ny + iy) * (nz + 1))
+            column = np.broadcast_to(column, valid.shape)[valid]
+
+            firsts.append(column + k0[valid].astype(np.int64))
+            lasts.append(column + k1[valid].astype(np.int64))
+            which.append(np.broadcast_to(k[:, np.newaxis, np.newaxis],
+                                          valid.shape)[valid])
+
+    return np.concatenate(firsts), np.concatenate(lasts), np.concatenate(which)
+
+
+def _unionLength(first, last, groups=None):
+    """
+    :@type first, last: numpy.ndarray
+    :@param first, last: The first and last integer of each interval.
+    :@type groups: numpy.ndarray
+    :@param groups: If given, the group of each interval; the union is
+                    then taken within each group and the lengths summed.
+    :@rtype: int
+    :@return: The number of integers in the union of the intervals.
+    """
+    if not len(first):
+        return 0
+    if groups is not None:
+        # move the intervals of each group past those of the one before
+        rank = np.unique(groups, return_inverse=True)[1]
+        span = int(last.max()) + 2
+        first = first + rank * span
+        last = last + rank * span
+    if int(last.max()) < 1 << 43:
+        # sort the intervals by their first integer, packed with their
+        # length (a column is far shorter than 2^20 voxels) into one key
+        key = np.sort((first << 20) | (last - first))
+        first = key >> 20
+        last = first + (key & 0xFFFFF)
+    else:
+        order = np.argsort(first)
+        first = first[order]
+        last = last[order]
+    # the furthest any earlier interval reaches
+    reach = np.empty_like(last)
+    reach[0] = first[0] - 1
+    np.maximum.accumulate(last[:-1], out=reach[1:])
+    return int(np.maximum(last - np.maximum(first, reach + 1) + 1, 0).sum())
+
+
+def _occupancy(first, last, shape):
+    """
+    :@rtype: numpy.ndarray
+    :@return: The boolean voxels of a slab in the union of the intervals.
+    """
+    nx, ny, nz = shape
+    size = nx * ny * (nz + 1)
+    steps = np.bincount(first, minlength=size) - np.bincount(last + 1, minlength=size)
+    return (np.cumsum(steps.reshape(nx, ny, nz + 1), axis=2)[:, :, :nz] > 0).ravel()
+
+
+def _capsuleInterval(x, y, A, B, radius):
+    """
+    The interval along the line (x, y, z) within radius of the segment A-B,
+    for arrays of lines and segments. The capsule is the union of the end
+    spheres and the cylinder between them; being convex, the line crosses
+    it in a single interval.
+
+    :@type x, y: numpy.ndarray
+    :@param x, y: (K x bx x 1) and (K x 1 x by) coordinates of the lines.
+    :@type A, B: numpy.ndarray
+    :@param A, B: (K x 3) ends of the segments.
+    :@rtype: tuple
+    :@return: (K x bx x by) arrays of the ends of the intervals; zlo > zhi
+              where a line misses its capsule.
+    """
+    A = [A[:, d, np.newaxis, np.newaxis] for d in range(3)]
+    B = [B[:, d, np.newaxis, np.newaxis] for d in range(3)]
+    r2 = radius**2
+    zlo = np.inf
+    zhi = -np.inf
+
+    # the end spheres
+    for P in (A, B):
+        h2 = r2 - (x - P[0])**2 - (y - P[1])**2
+        h = np.sqrt(np.maximum(h2, 0))
+        zlo = np.where(h2 >= 0, np.minimum(zlo, P[2] - h), zlo)
+        zhi = np.where(h2 >= 0, np.maximum(zhi, P[2] + h), zhi)
+
+    # the cylinder: with w = (x,y,z) - A and unit axis u of length L, the
+    # squared distance to the axis |w|^2 - (w.u)^2 is a quadratic in z,
+    # and 0 <= w.u <= L bounds z to a range along the axis
+    ab = [B[d] - A[d] for d in range(3)]
+    L = np.sqrt(ab[0]**2 + ab[1]**2 + ab[2]**2)
+    u = [ab[d] / np.where(L > 0, L, 1) for d in range(3)]
+    wx = x - A[0]
+    wy = y - A[1]
+    wz = -A[2]
+    wu = wx*u[0] + wy*u[1] + wz*u[2]
+    a = 1 - u[2]**2
+    b = wz - wu*u[2]
+    c = wx**2 + wy**2 + wz**2 - wu**2 - r2
+    flat = a < 1e-12
+    disc = b**2 - a*c
+    root = np.sqrt(np.maximum(disc, 0))
+    safeA = np.where(flat, 1, a)
+    clo = np.where(flat, -np.inf, (-b - root) / safeA)
+    chi = np.where(flat, np.inf, (-b + root) / safeA)
+    hit = np.where(flat, c <= 0, disc >= 0)
+
+    # along the axis, w.u = wu + z*u_z
+    uz = np.where(np.abs(u[2]) > 1e-12, u[2], 1)
+    t0 = -wu / uz
+    t1 = (L - wu) / uz
+    alongZ = np.abs(u[2]) > 1e-12
+    tlo = np.where(alongZ, np.minimum(t0, t1), np.where((wu >= 0) & (wu <= L), -np.inf, np.inf))
+    thi = np.where(alongZ, np.maximum(t0, t1), np.where((wu >= 0) & (wu <= L), np.inf, -np.inf))
+
+    lo = np.maximum(clo, tlo)
+    hi = np.minimum(chi, thi)
+    hit &= (lo <= hi) & (L > 0)
+    zlo = np.where(hit, np.minimum(zlo, lo), zlo)
+    zhi = np.where(hit, np.maximum(zhi, hi), zhi)
+
+    return zlo, zhi
@@ -3,44 +3,76 @@ Created on Apr 6, 2011
 
 @author: shareef
 '''
+from .stack import cropVolume, decodeStack, importVolume
+
 import Image
 import vtk
 
 class VolumeImageReader(object):
-    def __init__(self, filepaths):
+    def __init__(self, filepaths, workers=None, cache=None):
         """
         @type filenames: list
         @param filenames: The list of image filenames to open as a volume
+        @type workers: int
+        @param workers: If set, slices are decoded on this many threads 
+                        into a single volume buffer instead of being 
+                        read serially by the VTK image reader.
+        @type cache: data.imageIO.cache.VolumeCache
+        @param cache: If set, the decoded volume is stored in and 
+                      memory-mapped from this cache.
         """
         self.reader = None
+        self.importer = None
+        self.volume = None
+        self.workers = workers
+        self.cache = cache
         self.filepaths = filepaths
         xmax, ymax = getImageSize(filepaths[0])
-        self.pixelExtents = (0, xmax, 0, ymax)
+        self.imageSize = (xmax, ymax)
+        self.pixelExtents = (0, xmax-1, 0, ymax-1)
         self.sliceRange = None
         self.dataSpacing = None
+        self.margin = (0, 0, 0)
+        self.readExtents = None
         
         self.imageArray = vtk.vtkStringArray()
         for fname in filepaths:
             self.imageArray.InsertNextValue(fname)
 
         
-    def LoadVTKReader(self, dataSpacing, sliceRange=None):
+    def LoadVTKReader(self, dataSpacing, sliceRange=None, margin=(0, 0, 0)):
         """
+        Only the slices in the slice range and the pixels within the 
+        pixel extents (plus margin) are kept when the volume is imported. 
+        Of each slice, only the strips that overlap the pixel extents are 
+        decoded for multi-strip TIFFs; other formats are decoded whole and 
+        cropped. The serial VTK reader streams just the extent requested 
+        by the downstream filters.
+        
+        @type margin: tuple
+        @param margin: The number of extra voxels along x, y and z to read 
+                       on each side of the requested region, e.g. to give 
+                       a smoothing kernel its full support.
         @rtype vtkImageReader2
         @return: The supplied image files loaded as a volume into an 
                  appropriate vtk image container
         """
         self.dataSpacing = dataSpacing
+        self.margin = margin
 
         if sliceRange is None:
             self.sliceRange = (0, len(self.filepaths)-1)
         else:
             self.sliceRange = sliceRange
         
-        self.reader.SetDataExtent(self.pixelExtents[0],
-                                      self.pixelExtents[1],
-                                      self.pixelExtents[2],
-                                      self.pixelExtents[3],
+        if self.workers is not None or self.cache is not None:
+            return self._LoadImportedVolume()
+        
+        whole = self.WholeExtents
+        self.reader.SetDataExtent(whole[0],
+                                      whole[1],
+                                      whole[2],
+                                      whole[3],
                                       self.sliceRange[0],
                                       self.sliceRange[1])
         self.reader.SetDataByteOrderToLittleEndian() 
@@ -49,6 +81,37 @@ class VolumeImageReader(object):
         
         return self.reader
     
+    def _LoadImportedVolume(self):
+        """
+        Decode the slices within ReadExtents in parallel into one buffer 
+        (or map them from the volume cache) and expose it through a 
+        vtkImageImport.
+        
+        :@rtype: vtk.vtkImageImport
+        """
+        ext = self.ReadExtents
+        if ext == self.readExtents:
+            self.importer.SetDataSpacing(self.dataSpacing)
+            return self.importer
+        
+        # the new region is already in memory
+        if self.readExtents is not None and within(ext, self.readExtents):
+            volume = cropVolume(self.volume, self.readExtents, ext)
+        # use (or create, if the whole stack is needed) the cached volume
+        elif self.cache is not None and (ext == self.WholeExtents or 
+                                         self.cache.Contains(self.filepaths)):
+            volume = self.cache.Load(self.filepaths, self.workers)
+            volume = cropVolume(volume, self.WholeExtents, ext)
+        else:
+            volume = decodeStack(self.filepaths[ext[4]:ext[5]+1], 
+                                 self.workers, region=ext[:4])
+        
+        self.volume = volume
+        self.readExtents = ext
+        self.importer = importVolume(self.volume, self.dataSpacing, 
+                                     (ext[0], ext[2], ext[4]), self.importer)
+        return self.importer
+    
     @property
     def VolumeExtents(self):
         """
@@ -61,11 +124,41 @@ class VolumeImageReader(object):
         ext.extend(self.sliceRange)
         return ext
     
+    @property
+    def WholeExtents(self):
+        """
+        The 6D extents of the full image stack.
+        
+        :@rtype: list
+        """
+        return [0, self.imageSize[0]-1, 0, self.imageSize[1]-1, 
+                0, len(self.filepaths)-1]
+    
+    @property
+    def ReadExtents(self):
+        """
+        The VolumeExtents grown by the margin on each side and clipped 
+        to the image stack. This is the region that is actually imported.
+        
+        :@rtype: list
+        :@return: 6D list of data extents
+        """
+        ext = self.VolumeExtents
+        whole = self.WholeExtents
+        read = []
+        for axis in range(3):
+            lo, hi = sorted(ext[2*axis:2*axis+2])
+            read.append(max(whole[2*axis], lo - self.margin[axis]))
+            read.append(min(whole[2*axis+1], hi + self.margin[axis]))
+        return read
+    
     @property
     def VolumeReader(self):
         """
-        :@rtype: vtk.vtkImageReader2
+        :@rtype: vtk.vtkImageReader2 or vtk.vtkImageImport
         """
+        if self.importer is not None:
+            return self.importer
         return self.reader
     
     @property
@@ -77,6 +170,14 @@ class VolumeImageReader(object):
         pass
 
 
+def within(inner, outer):
+    """
+    Determine whether the 6D extents inner lie entirely within outer.
+    """
+    return all(outer[2*i] <= inner[2*i] and inner[2*i+1] <= outer[2*i+1] 
+               for i in range(3))
+
+
 def getImageSize(fname):
     """
     Use the Python Imaging Library (PIL) to find the size of a 2D image.
@@ -0,0 +1,241 @@
+'''
+Created on Oct 18, 2026
+
+An on-disk cache of decoded image volumes. Each image set is decoded once
+into a .npy file which is then memory-mapped, so reopening the set is
+nearly free and every layer built from it shares the same pages.
+
+Entries are keyed by the image file paths together with each file's size
+and modification time, so an edited image set is decoded again, and the
+least recently used entries are evicted once the cache exceeds its size cap.
+'''
+from .stack import decodeStack, stackLayout
+
+from collections import namedtuple
+import hashlib
+import numpy as np
+import os
+import tempfile
+import threading
+import weakref
+
+CacheStats = namedtuple('CacheStats', 'hits misses hitRate size')
+
+
+class VolumeCache(object):
+    """
+    Stores decoded volumes as .npy files in a single directory.
+
+    Volumes that are currently mapped are also tracked at the class level
+    so that all readers in the process share a single mapping per image set.
+    The modification time of each .npy file records when it was last used.
+    
+    Layers load their volumes on their own job runner threads, so the 
+    shared state is guarded by a lock, and each volume has a lock of its 
+    own so that concurrent misses on the same image set decode it once.
+    """
+    _mapped = weakref.WeakValueDictionary()
+    # guards _mapped, _keyLocks, _loading and the hit and miss counts
+    _lock = threading.Lock()
+    _keyLocks = {}
+    # keys of the volumes being loaded, which must not be evicted
+    _loading = set()
+
+    def __init__(self, directory, maxSize=None):
+        """
+        :@type directory: str
+        :@param directory: The folder in which to store decoded volumes.
+                           It is created if it does not exist.
+        :@type maxSize: int
+        :@param maxSize: The maximum total size of the stored volumes in 
+                         bytes. None for no limit.
+        """
+        self.directory = directory
+        self.maxSize = maxSize
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def Key(self, filepaths):
+        """
+        Create the identifier for the volume decoded from filepaths.
+
+        :@type filepaths: list
+        :@param filepaths: The image files (str or unicode paths) that 
+                           make up the volume.
+        :@rtype: str
+        """
+        h = hashlib.sha1()
+        for fname in filepaths:
+            st = os.stat(fname)
+            path = os.path.abspath(fname)
+            # wx file dialogs return unicode paths, which hashlib cannot
+            # take directly if they are not plain ASCII
+            if isinstance(path, unicode):
+                path = path.encode('utf-8')
+            h.update(path)
+            h.update('\0%i\0%r\0' % (st.st_size, st.st_mtime))
+        return h.hexdigest()
+
+    def Path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    def Contains(self, filepaths):
+        """
+        Determine whether the volume for filepaths has already been decoded.
+        This does not count as a cache lookup.
+        
+        :@rtype: bool
+        """
+        key = self.Key(filepaths)
+        with self._lock:
+            if key in self._mapped:
+                return True
+        return os.path.exists(self.Path(key))
+
+    def Load(self, filepaths, workers=None):
+        """
+        Retrieve the decoded volume for filepaths, decoding and storing it
+        first if necessary.
+
+        :@type filepaths: list
+        :@param filepaths: The image files that make up the volume.
+        :@type workers: int
+        :@param workers: The number of decoding threads to use on a miss.
+        :@rtype: numpy.memmap
+        :@return: A copy-on-write mapping of the volume indexed as [z, y, x].
+        """
+        key = self.Key(filepaths)
+        with self._lock:
+            keyLock = self._keyLocks.setdefault(key, threading.Lock())
+        
+        with keyLock:
+            with self._lock:
+                volume = self._mapped.get(key)
+                if volume is not None:
+                    self.hits += 1
+                    return volume
+                self._loading.add(key)
+            
+            try:
+                path = self.Path(key)
+                if os.path.exists(path):
+                    with self._lock:
+                        self.hits += 1
+                    # mark as most recently used
+                    os.utime(path, None)
+                else:
+                    with self._lock:
+                        self.misses += 1
+                    self._Store(path, filepaths, workers)
+                    self.Evict(keep=path)
+        
+                # copy-on-write so VTK can be handed a writable buffer while 
+                # the file on disk is never modified
+                volume = np.load(path, mmap_mode='c')
+                with self._lock:
+                    self._mapped[key] = volume
+            finally:
+                with self._lock:
+                    self._loading.discard(key)
+        
+        return volume
+
+    def _Store(self, path, filepaths, workers):
+        """
+        Decode filepaths directly into a new .npy file. The file is
+        written under a unique temporary name and renamed once complete so 
+        that an interrupted decode never leaves a partial volume in the 
+        cache, and other processes decoding the same volume do not clash.
+        """
+        shape, dtype = stackLayout(filepaths)
+        fd, tmpPath = tempfile.mkstemp('.tmp', os.path.basename(path) + '.', 
+                                       self.directory)
+        os.close(fd)
+        out = np.lib.format.open_memmap(tmpPath, mode='w+',
+                                        dtype=dtype, shape=shape)
+        try:
+            decodeStack(filepaths, workers, out)
+            out.flush()
+        except:
+            del out
+            os.remove(tmpPath)
+            raise
+        del out
+
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(tmpPath, path)
+
+    def Entries(self):
+        """
+        List the stored volumes from least to most recently used.
+        
+        :@rtype: list
+        :@return: (last used, size in bytes, path) for each stored volume.
+        """
+        entries = []
+        for fname in os.listdir(self.directory):
+            if not fname.endswith('.npy'):
+                continue
+            path = os.path.join(self.directory, fname)
+            try:
+                st = os.stat(path)
+            except OSError:
+                # removed by another thread or process since listdir
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        
+        return sorted(entries)
+
+    def Evict(self, keep=None):
+        """
+        Remove least recently used volumes until the cache fits within 
+        maxSize. Volumes that are currently mapped are never removed.
+        
+        :@type keep: str
+        :@param keep: The path of a volume that must not be removed, 
+                      e.g. one that is about to be mapped.
+        """
+        if self.maxSize is None:
+            return
+        
+        entries = self.Entries()
+        with self._lock:
+            inUse = set(self._mapped.keys()) | self._loading
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.maxSize:
+                break
+            key = os.path.splitext(os.path.basename(path))[0]
+            if key in inUse or path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                if os.path.exists(path):
+                    raise
+            total -= size
+
+    @property
+    def Stats(self):
+        """
+        The hit and miss counts of this cache since it was created.
+        
+        :@rtype: CacheStats
+        """
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        rate = float(hits) / lookups if lookups else 0.0
+        size = sum(size for _, size, _ in self.Entries())
+        return CacheStats(hits, misses, rate, size)
+
+    def Clear(self):
+        """
+        Remove every stored volume from the cache directory.
+        """
+        for fname in os.listdir(self.directory):
+            if fname.endswith('.npy'):
+                os.remove(os.path.join(self.directory, fname))
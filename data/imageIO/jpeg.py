@@ -7,8 +7,8 @@ from .base import VolumeImageReader
 import vtk
 
 class VolumeJPEGReader(VolumeImageReader):
-    def __init__(self, filepaths):
-        VolumeImageReader.__init__(self, filepaths)
+    def __init__(self, filepaths, workers=None, cache=None):
+        VolumeImageReader.__init__(self, filepaths, workers, cache)
         self.reader = vtk.vtkJPEGReader()
     
     @property
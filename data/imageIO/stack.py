@@ -0,0 +1,210 @@
+'''
+Created on Oct 18, 2026
+
+Decode a stack of 2D image slices into a single preallocated volume
+buffer and hand that buffer to VTK without copying it.
+'''
+from multiprocessing import cpu_count
+from multiprocessing.pool import ThreadPool
+
+import Image
+import numpy as np
+import vtk
+from vtk.util.numpy_support import get_vtk_array_type
+
+
+def decodeSlice(fname, region=None):
+    """
+    Decode a single image file into a 2D (or 3D for multi-component
+    images) array. Rows are flipped so that the first row is the bottom
+    of the image, matching the default orientation of vtkImageReader2.
+
+    :@type fname: str
+    :@param fname: The path of the image file to decode.
+    :@type region: tuple
+    :@param region: Optional (xmin, xmax, ymin, ymax) pixel extents, in 
+                    VTK (bottom-up) coordinates, to crop the slice to. 
+                    Only the strips or tiles of a multi-strip (e.g. 
+                    uncompressed TIFF) file that overlap the region are 
+                    read and decoded; other files are decoded whole and
+                    then cropped, which only saves memory.
+    :@rtype: numpy.ndarray
+    """
+    im = Image.open(fname)
+    if region is not None:
+        height = im.size[1]
+        box = (region[0], height-1 - region[3], region[1]+1, height - region[2])
+        im = im.crop(_restrictTiles(im, box))
+    return np.asarray(im)[::-1]
+
+
+def _restrictTiles(im, box):
+    """
+    Drop the tiles of an image that has not been loaded yet which lie 
+    outside box, and shrink the image to the bounding box of the rest, so 
+    that loading it reads and decodes only those tiles.
+
+    :@type im: Image.Image
+    :@type box: tuple
+    :@param box: The (left, upper, right, lower) region to be cropped.
+    :@rtype: tuple
+    :@return: box relative to the shrunken image.
+    """
+    # a single tile (e.g. JPEG, PNG or compressed TIFF) has to be decoded 
+    # whole
+    if len(im.tile) < 2:
+        return box
+    tiles = [t for t in im.tile if t[1][0] < box[2] and t[1][2] > box[0] and
+                                   t[1][1] < box[3] and t[1][3] > box[1]]
+    if not tiles:
+        return box
+    x0 = min(t[1][0] for t in tiles)
+    y0 = min(t[1][1] for t in tiles)
+    x1 = max(t[1][2] for t in tiles)
+    y1 = max(t[1][3] for t in tiles)
+
+    im.tile = [(t[0], (t[1][0]-x0, t[1][1]-y0, t[1][2]-x0, t[1][3]-y0)) + 
+               tuple(t[2:]) for t in tiles]
+    # Pillow keeps the size in _size behind a read-only property
+    if hasattr(im, '_size'):
+        im._size = (x1-x0, y1-y0)
+    else:
+        im.size = (x1-x0, y1-y0)
+    return (box[0]-x0, box[1]-y0, box[2]-x0, box[3]-y0)
+
+
+def stackLayout(filepaths, region=None):
+    """
+    Determine the shape and data type of the volume that the given files 
+    decode into. The first slice is assumed to be representative.
+    
+    :@type filepaths: list
+    :@param filepaths: The image files that make up the volume.
+    :@type region: tuple
+    :@param region: Optional (xmin, xmax, ymin, ymax) pixel extents.
+    :@rtype: tuple
+    :@return: The (slices, rows, columns[, components]) shape and the 
+              numpy dtype of the volume.
+    """
+    first = decodeSlice(filepaths[0], region)
+    return (len(filepaths),) + first.shape, first.dtype
+
+
+def allocateVolume(filepaths, region=None):
+    """
+    Create an empty volume buffer large enough to hold every slice in
+    filepaths. The first slice determines the size and data type.
+
+    :@type filepaths: list
+    :@param filepaths: The image files that make up the volume.
+    :@type region: tuple
+    :@param region: Optional (xmin, xmax, ymin, ymax) pixel extents.
+    :@rtype: numpy.ndarray
+    :@return: An uninitialized (slices, rows, columns[, components]) array.
+    """
+    shape, dtype = stackLayout(filepaths, region)
+    return np.empty(shape, dtype=dtype)
+
+
+def decodeStack(filepaths, workers=None, out=None, region=None):
+    """
+    Decode each file in filepaths on a pool of threads, writing every
+    slice directly into its place in one volume buffer.
+
+    :@type filepaths: list
+    :@param filepaths: The image files that make up the volume, in z order.
+    :@type workers: int
+    :@param workers: The number of decoding threads. Defaults to the
+                     number of available CPUs.
+    :@type out: numpy.ndarray
+    :@param out: An optional preallocated buffer to decode into.
+    :@type region: tuple
+    :@param region: Optional (xmin, xmax, ymin, ymax) pixel extents, so 
+                    that only that part of each slice is kept.
+    :@rtype: numpy.ndarray
+    :@return: The decoded volume indexed as [z, y, x].
+    """
+    if out is None:
+        out = allocateVolume(filepaths, region)
+    if workers is None:
+        workers = cpu_count()
+
+    def decodeInto(i):
+        out[i] = decodeSlice(filepaths[i], region)
+
+    if workers < 2:
+        map(decodeInto, range(len(filepaths)))
+        return out
+
+    pool = ThreadPool(min(workers, len(filepaths)))
+    try:
+        pool.map(decodeInto, range(len(filepaths)))
+    finally:
+        pool.close()
+        pool.join()
+
+    return out
+
+
+def cropVolume(volume, volumeExtents, extents):
+    """
+    Extract the part of volume that lies within extents. Crops along z 
+    alone are returned as views of volume; any other crop is copied into 
+    a new C-contiguous buffer sized to the requested region.
+    
+    :@type volume: numpy.ndarray
+    :@param volume: A volume indexed as [z, y, x].
+    :@type volumeExtents: list
+    :@param volumeExtents: The 6D (xmin, xmax, ymin, ymax, zmin, zmax) 
+                           extents covered by volume.
+    :@type extents: list
+    :@param extents: The 6D extents to extract. Must lie within 
+                     volumeExtents.
+    :@rtype: numpy.ndarray
+    """
+    lo = [extents[i] - volumeExtents[i] for i in (0, 2, 4)]
+    hi = [extents[i] - volumeExtents[i-1] + 1 for i in (1, 3, 5)]
+    sub = volume[lo[2]:hi[2], lo[1]:hi[1], lo[0]:hi[0]]
+    if sub.flags.c_contiguous:
+        return sub
+    return np.ascontiguousarray(sub)
+
+
+def importVolume(volume, dataSpacing, offset=(0, 0, 0), importer=None):
+    """
+    Wrap a [z, y, x] volume buffer as VTK image data without copying it.
+
+    Note: the caller must keep a reference to volume for as long as the
+          importer is in use since VTK does not own the memory.
+
+    :@type volume: numpy.ndarray
+    :@param volume: A C-contiguous volume as returned by decodeStack.
+    :@type dataSpacing: tuple
+    :@param dataSpacing: The x, y, z spacing of the voxels.
+    :@type offset: tuple
+    :@param offset: The x, y, z index of the first voxel in volume, for 
+                    volumes that hold only part of an image stack.
+    :@type importer: vtk.vtkImageImport
+    :@param importer: An existing importer to point at the new buffer.
+    :@rtype: vtk.vtkImageImport
+    """
+    if not volume.flags.c_contiguous:
+        raise ValueError("Volume buffer must be C-contiguous")
+
+    if importer is None:
+        importer = vtk.vtkImageImport()
+
+    components = volume.shape[3] if volume.ndim == 4 else 1
+    zdim, ydim, xdim = volume.shape[:3]
+    x0, y0, z0 = offset
+    extent = (x0, x0+xdim-1, y0, y0+ydim-1, z0, z0+zdim-1)
+
+    importer.SetDataScalarType(get_vtk_array_type(volume.dtype))
+    importer.SetNumberOfScalarComponents(components)
+    importer.SetDataExtent(extent)
+    importer.SetWholeExtent(extent)
+    importer.SetDataSpacing(dataSpacing)
+    importer.SetImportVoidPointer(volume, 1)
+    importer.Modified()
+
+    return importer
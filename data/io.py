@@ -62,12 +62,16 @@ def exportBacteria(path):
     try:
         writer = csv.writer(f, delimiter=',')
         
-        for bacterium in DataStore.Bacteria():
-            row = [len(bacterium.Markers)]
+        columns = DataStore.Columns()
+        offsets = columns.Offsets.tolist()
+        coords = columns.Coords.tolist()
+        
+        for i, orientation in enumerate(columns.Orientation.tolist()):
+            row = [offsets[i+1] - offsets[i]]
             # add the marker positions
-            for loc in bacterium.Markers:
-                row.extend([loc.x, loc.y, loc.z])
-            row.extend(bacterium.Orientation.toTuple())
+            for loc in coords[offsets[i]:offsets[i+1]]:
+                row.extend(loc)
+            row.extend(orientation)
             
             writer.writerow(row)
     finally:
@@ -1,15 +1,18 @@
 import data.io as dio
 from data.imageIO import export
+from data.imageIO.cache import VolumeCache
 import data.imageIO.types as imageIOTypes
 from render.basic import IBCColor
 from render.ibc import IBCSettingsDialog
 from render.bacteria import BacteriaLayerSettingsDialog
+from render.contour import ContourPool
 from settings import RenderActionsPanel
 from store import DataStore
 from vector import Vec3f
 from view.dialogs import SelectImageLayerDialog
 from vtkRender import IBCRenderPanel
 
+from multiprocessing import cpu_count
 import wx
 import os.path
 import sys
@@ -21,11 +24,21 @@ ID_SAVE_PROJECT = wx.NewId()
 ID_EXPORT_BACTERIA = wx.NewId()
 ID_EXPORT_LENGTHS = wx.NewId()
 ID_EXPORT_ORIENTATIONS = wx.NewId()
+ID_EXPORT_TIMINGS = wx.NewId()
 
 ID_DYNGAUSS = wx.NewId()
 
+# Number of threads used to decode image slices (None for serial VTK reading)
+DECODE_WORKERS = cpu_count()
+# Number of processes used to extract isosurfaces (1 for a single pass)
+CONTOUR_WORKERS = cpu_count()
+# Location of the memory-mapped cache of decoded image volumes
+VOLUME_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.prokarymetrics', 'volumes')
+VOLUME_CACHE_SIZE = 8 * 1024**3
+
 ID_FIT_MVE_ELLIPSOID = wx.NewId()
 ID_FIT_LOWNER_ELLIPSOID = wx.NewId()
+ID_FIT_SPHERE = wx.NewId()
 ID_TOGGLE_ELLIPSOID_VIS = wx.NewId()
 
 # Color schemes for orientation coloring
@@ -43,9 +56,11 @@ class MainWindow(wx.Frame):
     Main display window for the project.
     """
     
-    def __init__(self,parent,ID,title):
+    def __init__(self,parent,ID,title,contourPool=None):
         wx.Frame.__init__(self, parent, wx.ID_ANY, title, size=(800,700))
         self.Center(direction=wx.HORIZONTAL)
+        
+        self.volumeCache = VolumeCache(VOLUME_CACHE_DIR, VOLUME_CACHE_SIZE)
 
         # Set up status bar
         self.StatusBar = self.CreateStatusBar(4)
@@ -56,7 +71,9 @@ class MainWindow(wx.Frame):
         self.pnlIBCRender = IBCRenderPanel(self, imode_callback=self.setInteractionMode, 
                                                  rmode_callback=self.setRecordingMode, 
                                                  ppos_callback=self.setPickerPosition,
-                                                 ao=self.AppendOutput)
+                                                 ao=self.AppendOutput,
+                                                 status_callback=self.setMainStatus,
+                                                 contour_pool=contourPool)
         self.pnlActions =  RenderActionsPanel(self, self.pnlIBCRender, 
                                               status_callback=self.setMainStatus)
         self.pnlIBCRender.updateCount = self.pnlActions.UpdateBacteriaCount()
@@ -94,6 +111,10 @@ class MainWindow(wx.Frame):
         exportSubMenu.Append(ID_EXPORT_ORIENTATIONS, "Orientation Data...",
                              "Export a csv of the X/Y/Z orientations of recorded bacteria")
         self.Bind(wx.EVT_MENU, self.OnExport, id=ID_EXPORT_ORIENTATIONS)
+        ### Export pipeline timings
+        exportSubMenu.Append(ID_EXPORT_TIMINGS, "Pipeline Timings...",
+                             "Export the time and memory used by each image rendering stage")
+        self.Bind(wx.EVT_MENU, self.OnExportTimings, id=ID_EXPORT_TIMINGS)
         # Exit
         item = fileMenu.Append(wx.ID_EXIT,"E&xit"," Terminate the program")
         self.Bind(wx.EVT_MENU, self.OnMenuExit, item)
@@ -123,6 +144,9 @@ class MainWindow(wx.Frame):
         fitSubMenu.Append(ID_FIT_LOWNER_ELLIPSOID, "Fit Lowner Ellipsoid", 
                           "Fit an ellipsoid using the Lowner method")
         self.Bind(wx.EVT_MENU, self.OnFitEllipsoid, id=ID_FIT_LOWNER_ELLIPSOID)
+        fitSubMenu.Append(ID_FIT_SPHERE, "Fit Minimum Enclosing Sphere", 
+                          "Fit the smallest sphere containing the bacteria")
+        self.Bind(wx.EVT_MENU, self.OnFitSphere, id=ID_FIT_SPHERE)
         
         self.toolsToggleEVis = wx.MenuItem(toolsMenu, ID_TOGGLE_ELLIPSOID_VIS, 
                                       "Toggle Ellipsoid Visibility")
@@ -155,6 +179,14 @@ class MainWindow(wx.Frame):
                                      "Calculate descriptive statistics for the distance between bacteria.")
         toolsMenu.AppendItem(toolsCalcCommDensity)
         self.Bind(wx.EVT_MENU, self.OnCalcCommDensity, id=toolsCalcCommDensity.GetId())
+        toolsCalcNNDensity = wx.MenuItem(toolsMenu, wx.NewId(), "Calculate Nearest Neighbour Distance Stats",
+                                     "Calculate descriptive statistics for the distance from each bacterium to its nearest neighbour.")
+        toolsMenu.AppendItem(toolsCalcNNDensity)
+        self.Bind(wx.EVT_MENU, self.OnCalcNNDensity, id=toolsCalcNNDensity.GetId())
+        toolsCalcVolume = wx.MenuItem(toolsMenu, wx.NewId(), "Calculate Bacteria Volume",
+                                     "Calculate the volume occupied by the bacteria, counting overlaps once.")
+        toolsMenu.AppendItem(toolsCalcVolume)
+        self.Bind(wx.EVT_MENU, self.OnCalcVolume, id=toolsCalcVolume.GetId())
         
         toolsScreenshot = wx.MenuItem(toolsMenu, wx.NewId(), 'Take Screenshot',
                                       """Saves the contents of the display \
@@ -234,9 +266,11 @@ class MainWindow(wx.Frame):
         dlg = BacteriaLayerSettingsDialog(self, self.pnlIBCRender.BacteriaLayer, self.setMainStatus)
         dlg.Show()
         
-    def AddImageSet(self, imgReader, ID=None):
+    def AddImageSet(self, imgReader, ID=None, settings=None, ready_callback=None,
+                    stopped_callback=None):
         ID = DataStore.AddImageSet(IBCColor, imgReader.FilePaths, ID)
-        self.pnlIBCRender.RenderImageData(ID, imgReader)        
+        self.pnlIBCRender.RenderImageData(ID, imgReader, settings, ready_callback,
+                                          stopped_callback)
         if ID is None:
             self.ShowRenderSettings()
         
@@ -251,7 +285,8 @@ class MainWindow(wx.Frame):
         dlg = wx.FileDialog(self, "Choose a set of files", "", "", formats, 
                             wx.FD_OPEN|wx.FD_MULTIPLE|wx.FD_CHANGE_DIR|wx.FD_FILE_MUST_EXIST)
         if dlg.ShowModal() == wx.ID_OK and dlg.Paths:
-            imgReader = imageIOTypes.Available[dlg.FilterIndex](dlg.Paths)
+            imgReader = imageIOTypes.Available[dlg.FilterIndex](dlg.Paths, DECODE_WORKERS, 
+                                                                self.volumeCache)
             self.AddImageSet(imgReader)
         
         dlg.Destroy()
@@ -301,6 +336,19 @@ class MainWindow(wx.Frame):
             # temp backwards compatibility
             idArray = settings['image-set-ids'] if 'image-set-ids' in settings else settings['image-sets']
             
+            # the cache is only used once the layers are read in the 
+            # background, so report it once every layer's first run has 
+            # finished, failed or been cancelled
+            loading = set(idArray)
+            def layerDone(layer, message=None):
+                if layer.imageSetID not in loading:
+                    return
+                loading.discard(layer.imageSetID)
+                if not loading:
+                    cs = self.volumeCache.Stats
+                    self.AppendOutput("Volume cache: %i hits, %i misses (%.0f%% hit rate)" % 
+                                      (cs.hits, cs.misses, 100*cs.hitRate))
+            
             for imgSetID in idArray:
                 imgSettings = settings['img-%i' % imgSetID]
                 paths = dio.testPaths(DataStore.GetImageSet(imgSetID).filepaths)
@@ -316,22 +364,16 @@ class MainWindow(wx.Frame):
                 # get correct file reader by stored file extension
                 ftype = os.path.splitext(paths[0])[1]
                 readerClass = imageIOTypes.GetReaderByType(ftype)
-                imgReader = readerClass(paths)
-                self.AddImageSet(imgReader, imgSetID)
-                self.pnlIBCRender.GetImageLayerByID(imgSetID).Settings = imgSettings
+                imgReader = readerClass(paths, DECODE_WORKERS, self.volumeCache)
+                self.AddImageSet(imgReader, imgSetID, imgSettings, layerDone, layerDone)
             
             if bactLayerSettings:
                 self.pnlIBCRender.BacteriaLayer.Settings = bactLayerSettings
             
-            for ID in DataStore.ImageSets():
-                self.pnlIBCRender.RenderImageData(ID, imgReader)
-            
             # render recorded items
             self.pnlIBCRender.RenderStoredBacteria()
             self.pnlIBCRender.RenderStoredMarkers()
             
-            self.pnlActions.UpdateBacteriaCount()
-            
             self.pnlIBCRender.iren.Render()
             self.StatusBar.SetStatusText("Project loaded from %s" % dlg.Path, 0)
             
@@ -369,6 +411,25 @@ class MainWindow(wx.Frame):
         
         dlg.Destroy()
             
+    def OnExportTimings(self, event):
+        timer = self.pnlIBCRender.pipelineTimer
+        if not timer.records:
+            wx.MessageBox("No image layers have been rendered yet", "", wx.ICON_INFORMATION | wx.OK)
+            return
+        
+        formats = "JSON (*.json)|*.json|Chrome trace (*.json)|*.json"
+        dlg = wx.FileDialog(self, "Export pipeline timings", "", "", formats, wx.FD_SAVE|wx.FD_OVERWRITE_PROMPT)
+        if dlg.ShowModal() == wx.ID_OK and dlg.Filename:
+            if not '.json' in dlg.Filename:
+                dlg.Path = dlg.Path + '.json'
+            if dlg.FilterIndex == 1:
+                timer.WriteChromeTrace(dlg.Path)
+            else:
+                timer.WriteJSON(dlg.Path)
+            self.StatusBar.SetStatusText("File exported to %s" % dlg.Path, 0)
+        
+        dlg.Destroy()
+    
     def OnExportOrients(self):
         dlg = wx.FileDialog(self, "Export orientation data for recorded bacteria", "", "", "*.csv", wx.FD_SAVE|wx.FD_OVERWRITE_PROMPT)
         if dlg.ShowModal() == wx.ID_OK and dlg.Filename:
@@ -399,6 +460,10 @@ class MainWindow(wx.Frame):
         self.pnlIBCRender.RenderFittedEllipsoid(mve=mve)
         self.toolsToggleEVis.Enable(True)
     
+    def OnFitSphere(self, event):
+        self.pnlIBCRender.RenderFittedSphere()
+        self.toolsToggleEVis.Enable(True)
+    
     def OnToggleEllipsoidVis(self, event):
         self.pnlIBCRender.ToggleEllipsoidVisibility()
         
@@ -420,6 +485,12 @@ class MainWindow(wx.Frame):
     def OnCalcCommDensity(self, event):
         self.pnlIBCRender.CalculateCommunityDensity()    
     
+    def OnCalcNNDensity(self, event):
+        self.pnlIBCRender.CalculateCommunityDensity(nearest=True)
+    
+    def OnCalcVolume(self, event):
+        self.pnlIBCRender.CalculateBacteriaVolume()
+    
     def TakeScreenshot(self, event):
         fmts = export.exportClasses.keys()
         dlg = wx.FileDialog(self, "Take Screenshot", "", "", 
@@ -495,7 +566,11 @@ class MainWindow(wx.Frame):
 
 
 if __name__ == '__main__':
+    # start the contouring processes before the GUI exists, so that it 
+    # is never forked
+    contourPool = ContourPool(CONTOUR_WORKERS)
     app = wx.PySimpleApp()
-    frame = MainWindow(None, -1, "ProkaryMetrics")
+    frame = MainWindow(None, -1, "ProkaryMetrics", contourPool)
     app.MainLoop()
+    contourPool.Close()
     sys.exit(0)
\ No newline at end of file
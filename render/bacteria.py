@@ -9,25 +9,47 @@ related to user-created bacteria.
 from data.objects import Bacterium
 #from data.util import CopyMatrix4x4, StoreAsMatrix4x4
 from render.basic import (Color, RenderLayer, BacteriaColor, MarkerColor, boolInt, generateSpline)
+from render.batch import BacteriaBatch, BatchItem, meshArrays
+from render.glyphs import Glyph, GlyphSet
 from store import DataStore
 from vector import Vec3f
 
+import numpy as np
 import vtk
 import wx
 
 class BacteriaLayer(RenderLayer):
-    def __init__(self, renderer, renwin_update_callback, color=BacteriaColor):
+    def __init__(self, renderer, renwin_update_callback, color=BacteriaColor,
+                 markerRenderer=None, glyphs=False, batched=False):
         """
         :@type renderer: vtk.vtkRenderer
         :@param renderer: The 'canvas' into which the bacteria should 
                           be drawn.
+        :@type markerRenderer: vtk.vtkRenderer
+        :@param markerRenderer: The renderer holding markers that have not 
+                                yet been recorded as a bacterium. Defaults 
+                                to renderer.
+        :@type glyphs: bool
+        :@param glyphs: Draw all markers, and all coccoid bacteria, as a 
+                        single glyph actor each rather than an actor per 
+                        sphere.
+        :@type batched: bool
+        :@param batched: Draw all bacilli and filaments as one mesh rather 
+                         than an assembly of actors per bacterium.
         """
         self.renderer = renderer
+        self.markerRenderer = markerRenderer if markerRenderer is not None else renderer
         self.renwin_update_callback = renwin_update_callback
         self.color = color
         self.markerColor = MarkerColor
         self.actor_radius = 0.5
         self.visible = True
+        self.markerGlyphs = None
+        self.coccoidGlyphs = None
+        if glyphs:
+            self.markerGlyphs = GlyphSet(self.markerRenderer)
+            self.coccoidGlyphs = GlyphSet(self.renderer)
+        self.batch = BacteriaBatch(self.renderer, self.actor_radius) if batched else None
 
         
     @property
@@ -48,27 +70,36 @@ class BacteriaLayer(RenderLayer):
         
     def UpdateRadius(self, radius):
         """
-        Set the radius of all actors.
+        Set the radius of all actors. Glyphs and batched bacteria are 
+        resized in place; only bacteria drawn as separate actors are 
+        rebuilt, replacing their entries in the DataStore.
         
         :@type radius: float
         :@param radius: The new radius to use.
         """
         self.actor_radius = radius
-        newMarkers = []
-        for marker in DataStore.Markers():
-            new = Vec3f(marker.GetCenter())
-            self.renderer.RemoveActor(marker)
-            newMarkers.append(self.CreateMarker(new))
+        if self.markerGlyphs is not None:
+            self.markerGlyphs.SetAllRadii(radius)
+        else:
+            newMarkers = []
+            for marker in DataStore.Markers():
+                new = Vec3f(marker.GetCenter())
+                self.RemoveMarker(marker)
+                newMarkers.append(self.PlaceMarker(new))
+            
+            DataStore.ClearMarkers()
+            map(DataStore.AddMarker, newMarkers)
         
-        map(self.renderer.AddActor, newMarkers)
-        DataStore.ClearMarkers()
-        map(DataStore.AddMarker, newMarkers)
+        if self.coccoidGlyphs is not None:
+            self.coccoidGlyphs.SetAllRadii(radius)
+        if self.batch is not None:
+            self.batch.SetRadius(radius)
         
-        for bactActor in DataStore.BacteriaActors():
-            self.renderer.RemoveActor(bactActor)
-            
-        self.AddStoredBacteria()
-            
+        actors = DataStore.BacteriaActors()
+        for i, bacterium in enumerate(DataStore.Bacteria()):
+            if not isinstance(actors[i], (Glyph, BatchItem)):
+                self.RemoveBacteriumActor(actors[i])
+                actors[i] = self._placeBacterium(bacterium.Markers)
         
         self.renwin_update_callback()
         
@@ -82,11 +113,17 @@ class BacteriaLayer(RenderLayer):
         """
         self.color = color
         for marker in DataStore.Markers():
+            if isinstance(marker, Glyph):
+                marker.SetColor(color)
+                continue
             marker.GetProperty().SetDiffuseColor(color.r, 
                                                  color.g, 
                                                  color.b)
         
         for bact in DataStore.BacteriaActors():
+            if isinstance(bact, (Glyph, BatchItem)):
+                bact.SetColor(color)
+                continue
             aColl = vtk.vtkPropCollection()
             bact.GetActors(aColl)
             aColl.InitTraversal()
@@ -104,7 +141,12 @@ class BacteriaLayer(RenderLayer):
         actors.extend(DataStore.Markers())
         actors.extend(DataStore.BacteriaActors())
         for actor in actors:
-            actor.SetVisibility(boolInt(visible))
+            if not isinstance(actor, (Glyph, BatchItem)):
+                actor.SetVisibility(boolInt(visible))
+        
+        for group in (self.markerGlyphs, self.coccoidGlyphs, self.batch):
+            if group is not None:
+                group.SetVisibility(visible)
         
         self.renwin_update_callback()
         
@@ -132,6 +174,62 @@ class BacteriaLayer(RenderLayer):
         
         return sphereActor
     
+    def PlaceMarker(self, loc):
+        """
+        Create a marker in the marker renderer.
+        
+        :@type loc: Vec3f
+        :@param loc: The 3D location of the marker.
+        :@rtype: vtk.vtkActor or render.glyphs.Glyph
+        :@return: The marker, to be added to the DataStore.
+        """
+        if self.markerGlyphs is not None:
+            return self.markerGlyphs.Add(loc, self.actor_radius, self.markerColor)
+        
+        marker = self.CreateMarker(loc)
+        self.markerRenderer.AddActor(marker)
+        return marker
+    
+    def RemoveMarker(self, marker):
+        """
+        Remove a marker created by PlaceMarker from the marker renderer.
+        """
+        if isinstance(marker, Glyph):
+            marker.Remove()
+        else:
+            self.markerRenderer.RemoveActor(marker)
+    
+    def RemoveBacteriumActor(self, bacterium):
+        """
+        Remove the representation of a recorded bacterium from the renderer.
+        """
+        if isinstance(bacterium, (Glyph, BatchItem)):
+            bacterium.Remove()
+        else:
+            self.renderer.RemoveActor(bacterium)
+    
+    def _placeBacterium(self, centers):
+        """
+        Create the representation of a bacterium and add it to the renderer.
+        
+        :@type centers: list
+        :@param centers: The Vec3f marker locations of the bacterium.
+        :@rtype: vtk.vtkProp3D, render.glyphs.Glyph or render.batch.BatchItem
+        """
+        if self.coccoidGlyphs is not None and len(centers) == 1:
+            return self.coccoidGlyphs.Add(centers[0], self.actor_radius, self.color)
+        if self.batch is not None and len(centers) > 1:
+            # the layer radius may have been set without UpdateRadius
+            if self.batch.radius != self.actor_radius:
+                self.batch.SetRadius(self.actor_radius)
+            points, normals, triangles, params, thickness = self._bacteriumMesh(centers)
+            return self.batch.Add(points, normals, triangles, params, 
+                                  self.color, thickness)
+        
+        bacterium = self._createBacterium([self.CreateMarker(c) for c in centers])
+        self.renderer.AddActor(bacterium)
+        return bacterium
+    
     def AddBacterium(self):
         """
         Retrieve the placed markers and replace them with a single actor
@@ -141,17 +239,16 @@ class BacteriaLayer(RenderLayer):
         :@return: The representation of a bacterium as determined by the number 
                   and placement of markers. 
         """
-        markers = DataStore.Markers()
+        centers = [Vec3f(marker.GetCenter()) for marker in DataStore.Markers()]
         
-        bacterium = self._createBacterium(markers)
+        bacterium = self._placeBacterium(centers)
     
-        DataStore.AddBacterium(Bacterium([marker.GetCenter() for marker in markers]))
+        DataStore.AddBacterium(Bacterium([c.toTuple() for c in centers]))
         DataStore.AddBacteriumActor(bacterium)
-        self.renderer.AddActor(bacterium)
             
         # Cleanup
         for marker in DataStore.Markers():
-            self.renderer.RemoveActor(marker)
+            self.RemoveMarker(marker)
         DataStore.ClearMarkers()
         
     
@@ -160,12 +257,7 @@ class BacteriaLayer(RenderLayer):
         Create VTK Actors for each Bacterium object in the DataStore
         """
         for bacterium in DataStore.Bacteria():
-            markers = [self.CreateMarker(loc) for loc in bacterium.Markers]
-            
-            bacterium = self._createBacterium(markers)
-        
-            DataStore.AddBacteriumActor(bacterium)
-            self.renderer.AddActor(bacterium)
+            DataStore.AddBacteriumActor(self._placeBacterium(bacterium.Markers))
             
 #    def CaptureTransforms(self):
 #        """
@@ -302,6 +394,66 @@ class BacteriaLayer(RenderLayer):
         
         return filament
     
+    def _bacteriumMesh(self, centers):
+        """
+        Triangulate a bacillus or filament as a tube along its markers 
+        between two capping spheres, matching _createBacillus and 
+        _createFilamentSpline.
+        
+        :@type centers: list
+        :@param centers: The Vec3f marker locations, at least two.
+        :@rtype: tuple
+        :@return: The points, normals and triangles of the surface, the 
+                  spline parameter of each triangle (0 at the first 
+                  marker) as used by ColorByOrientation for filaments, and 
+                  the radius relative to actor_radius.
+        """
+        path = vtk.vtkPolyData()
+        if len(centers) == 2:
+            thickness = 1.0
+            line = vtk.vtkLineSource()
+            line.SetPoint1(centers[0].x, centers[0].y, centers[0].z)
+            line.SetPoint2(centers[1].x, centers[1].y, centers[1].z)
+            line.Update()
+            path = line.GetOutput()
+        else:
+            thickness = 1.5
+            points, scalars, _, sList = generateSpline(centers)
+            lines = vtk.vtkCellArray()
+            lines.InsertNextCell(len(sList))
+            for i in range(len(sList)):
+                lines.InsertCellPoint(i)
+            path.SetPoints(points)
+            path.SetLines(lines)
+            path.GetPointData().SetScalars(scalars)
+        
+        radius = self.actor_radius * thickness
+        tube = vtk.vtkTubeFilter()
+        tube.SetInput(path)
+        tube.SetRadius(radius)
+        tube.SetNumberOfSides(20)
+        tube.Update()
+        
+        parts = []
+        for center, part in ((centers[0], None), (None, tube.GetOutput()), 
+                             (centers[-1], None)):
+            if part is None:
+                sphere = vtk.vtkSphereSource()
+                sphere.SetCenter(center.x, center.y, center.z)
+                sphere.SetRadius(radius)
+                sphere.SetPhiResolution(20)
+                sphere.SetThetaResolution(20)
+                sphere.Update()
+                part = sphere.GetOutput()
+            parts.append(meshArrays(part))
+        
+        (p1, n1, t1, _), (p2, n2, t2, s2), (p3, n3, t3, _) = parts
+        params = np.concatenate([np.zeros(len(t1)), s2[t2].mean(axis=1), 
+                                 np.ones(len(t3)) * (len(centers) - 1)])
+        return (np.vstack([p1, p2, p3]), np.vstack([n1, n2, n3]),
+                np.vstack([t1, t2 + len(p1), t3 + len(p1) + len(p2)]), params, 
+                thickness)
+    
     def _createCylinder(self, endPt1, endPt2, res=20):
         """
         Create a cylinder oriented to have the given end points.
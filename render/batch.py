@@ -0,0 +1,321 @@
+'''
+Created on Oct 18, 2026
+
+Draw all bacilli and filaments of a layer as a single triangle mesh.
+Each bacterium owns a contiguous range of the mesh's points and cells,
+so changing its colour, hiding it or deleting it only touches that range.
+'''
+from render.basic import boolInt
+from render.contour import polyDataArrays
+
+import numpy as np
+import vtk
+from vtk.util.numpy_support import (numpy_to_vtk, numpy_to_vtkIdTypeArray,
+                                    vtk_to_numpy)
+
+ID_TYPE = np.int64 if vtk.vtkIdTypeArray().GetDataTypeSize() == 8 else np.int32
+
+
+def meshArrays(polydata):
+    """
+    Triangulate a surface and copy it into numpy arrays.
+
+    :@type polydata: vtk.vtkPolyData
+    :@rtype: tuple
+    :@return: (n x 3) points, (n x 3) point normals, (m x 3) triangle point
+              indices, and the n point scalars (zeros if there are none).
+    """
+    triangles = vtk.vtkTriangleFilter()
+    triangles.SetInput(polydata)
+    triangles.Update()
+    output = triangles.GetOutput()
+
+    points, tris = polyDataArrays(output)
+    pd = output.GetPointData()
+    normals = np.zeros(points.shape, np.float32)
+    if pd.GetNormals() is not None:
+        normals = vtk_to_numpy(pd.GetNormals()).astype(np.float32)
+    scalars = np.zeros(len(points), np.float32)
+    if pd.GetScalars() is not None:
+        scalars = vtk_to_numpy(pd.GetScalars()).astype(np.float32)
+    return points.astype(np.float32), normals, tris, scalars
+
+
+class BatchItem(object):
+    """
+    A bacterium in a BacteriaBatch: its ID and the ranges of points and
+    cells it occupies.
+    """
+    def __init__(self, batch, ID, triangles, params):
+        self.batch = batch
+        self.id = ID
+        self.triangles = triangles
+        self.params = params
+        self.pointStart = 0
+        self.pointCount = 0
+        self.cellStart = 0
+        self.cellCount = len(triangles)
+        self.visible = True
+
+    def SetColor(self, color):
+        """
+        :@type color: render.basic.Color
+        """
+        self.batch.SetColors(self, np.array([color.toTuple()]))
+
+    def SetColorFunction(self, ctf):
+        """
+        Colour each cell by looking up its position along the bacterium.
+
+        :@type ctf: vtk.vtkColorTransferFunction
+        """
+        values, inverse = np.unique(self.params, return_inverse=True)
+        colors = np.array([ctf.GetColor(v) for v in values])
+        self.batch.SetColors(self, colors[inverse])
+
+    def SetVisibility(self, visible):
+        self.batch.SetItemVisibility(self, visible)
+
+    def Remove(self):
+        self.batch.Remove(self)
+
+
+class BacteriaBatch(object):
+    """
+    One vtkPolyData holding the surfaces of any number of bacteria, with
+    the bacterium ID and RGB colour of every cell in cell data arrays.
+
+    The arrays are numpy buffers shared with VTK, grown by doubling, so
+    adding a bacterium copies only its own geometry. Hiding or deleting a
+    bacterium collapses its triangles to a point. The space of deleted
+    bacteria is reclaimed once it makes up half of the mesh.
+
+    Every surface point lies at its thickness times the layer radius 
+    along its normal from a point on the bacterium's axis (the spine), so 
+    the radius of all bacteria can be changed in place with SetRadius.
+    """
+    def __init__(self, renderer, radius):
+        """
+        :@type renderer: vtk.vtkRenderer
+        :@type radius: float
+        :@param radius: The layer radius the surfaces are built with.
+        """
+        self.renderer = renderer
+        self.radius = radius
+        self.items = {}
+        self.nextID = 0
+        self.nPoints = 0
+        self.nCells = 0
+        self.deadCells = 0
+
+        self.points = np.zeros((0, 3), np.float32)
+        self.normals = np.zeros((0, 3), np.float32)
+        self.spines = np.zeros((0, 3), np.float32)
+        self.thickness = np.zeros(0, np.float32)
+        self.cells = np.zeros((0, 4), ID_TYPE)
+        self.ids = np.zeros(0, np.int32)
+        self.colors = np.zeros((0, 3), np.uint8)
+
+        self.polydata = vtk.vtkPolyData()
+        mapper = vtk.vtkPolyDataMapper()
+        mapper.SetInput(self.polydata)
+        mapper.SetScalarModeToUseCellData()
+        mapper.SetColorModeToDefault()
+        self.actor = vtk.vtkActor()
+        self.actor.SetMapper(mapper)
+        renderer.AddActor(self.actor)
+        self._Bind()
+
+    def __len__(self):
+        return len(self.items)
+
+    def Item(self, ID):
+        """
+        :@rtype: BatchItem
+        :@return: The bacterium with the given ID, or None.
+        """
+        return self.items.get(ID)
+
+    def Add(self, points, normals, triangles, params, color, thickness=1.0):
+        """
+        Append the surface of a bacterium.
+
+        :@type points: numpy.ndarray
+        :@param points: (n x 3) point coordinates.
+        :@type normals: numpy.ndarray
+        :@param normals: (n x 3) point normals.
+        :@type triangles: numpy.ndarray
+        :@param triangles: (m x 3) point indices.
+        :@type params: numpy.ndarray
+        :@param params: A value per triangle for SetColorFunction, e.g. the
+                        position of the triangle along a filament.
+        :@type color: render.basic.Color
+        :@type thickness: float
+        :@param thickness: The radius of the surface relative to the layer 
+                           radius.
+        :@rtype: BatchItem
+        """
+        item = BatchItem(self, self.nextID, np.asarray(triangles, ID_TYPE),
+                         np.asarray(params))
+        self.nextID += 1
+        self.items[item.id] = item
+
+        self._Reserve(self.nPoints + len(points), self.nCells + len(triangles))
+        thickness = np.ones(len(points), np.float32) * thickness
+        spines = points - (thickness * self.radius)[:, None] * normals
+        self._Place(item, points, normals, spines, thickness)
+        self.colors[item.cellStart:self.nCells] = _rgb(color.toTuple())
+        self._Bind()
+        return item
+
+    def SetRadius(self, radius):
+        """
+        Move every surface point to the new radius from its spine.
+        """
+        self.radius = radius
+        n = self.nPoints
+        self.points[:n] = (self.spines[:n] + 
+                           (self.thickness[:n] * radius)[:, None] * self.normals[:n])
+        self.vpoints.Modified()
+        self.polydata.Modified()
+
+    def SetColors(self, item, colors):
+        """
+        :@type colors: numpy.ndarray
+        :@param colors: RGB values from 0 to 1 for each cell of the item,
+                        or a single row for all of them.
+        """
+        self.colors[item.cellStart:item.cellStart+item.cellCount] = _rgb(colors)
+        self.vcolors.Modified()
+
+    def SetItemVisibility(self, item, visible):
+        item.visible = bool(visible)
+        self._Draw(item)
+        self.vcells.Modified()
+        self.polydata.Modified()
+
+    def Remove(self, item):
+        del self.items[item.id]
+        item.visible = False
+        self._Draw(item)
+        self.ids[item.cellStart:item.cellStart+item.cellCount] = -1
+        self.deadCells += item.cellCount
+        item.batch = None
+
+        if self.deadCells > self.nCells / 2:
+            self._Compact()
+        else:
+            self.vcells.Modified()
+            self.vids.Modified()
+            self.polydata.Modified()
+
+    def Clear(self):
+        for item in self.items.values():
+            item.batch = None
+        self.items = {}
+        self.nPoints = self.nCells = self.deadCells = 0
+        self._Bind()
+
+    def SetVisibility(self, visible):
+        """
+        Show or hide the whole batch.
+        """
+        self.actor.SetVisibility(boolInt(visible))
+
+    def _Place(self, item, points, normals, spines, thickness):
+        """
+        Copy an item's geometry to the end of the used part of the arrays.
+        """
+        item.pointStart, item.pointCount = self.nPoints, len(points)
+        item.cellStart = self.nCells
+        p0, p1 = self.nPoints, self.nPoints + len(points)
+        c0, c1 = self.nCells, self.nCells + item.cellCount
+        self.points[p0:p1] = points
+        self.normals[p0:p1] = normals
+        self.spines[p0:p1] = spines
+        self.thickness[p0:p1] = thickness
+        self.cells[c0:c1, 0] = 3
+        self.ids[c0:c1] = item.id
+        self.nPoints, self.nCells = p1, c1
+        self._Draw(item)
+
+    def _Draw(self, item):
+        """
+        Write the item's triangles, or collapse them to a point if hidden.
+        """
+        cells = self.cells[item.cellStart:item.cellStart+item.cellCount, 1:]
+        if item.visible:
+            cells[:] = item.triangles + item.pointStart
+        else:
+            cells[:] = item.pointStart
+
+    def _Reserve(self, points, cells):
+        if points > len(self.points):
+            size = max(points, 2 * len(self.points))
+            self.points = _grow(self.points, size)
+            self.normals = _grow(self.normals, size)
+            self.spines = _grow(self.spines, size)
+            self.thickness = _grow(self.thickness, size)
+        if cells > len(self.cells):
+            size = max(cells, 2 * len(self.cells))
+            self.cells = _grow(self.cells, size)
+            self.ids = _grow(self.ids, size)
+            self.colors = _grow(self.colors, size)
+
+    def _Compact(self):
+        """
+        Rebuild the arrays from the live items, dropping deleted ones.
+        """
+        old = (self.points, self.normals, self.spines, self.thickness)
+        oldColors = self.colors
+        live = sorted(self.items.values(), key=lambda item: item.cellStart)
+        self.points = np.zeros_like(self.points)
+        self.normals = np.zeros_like(self.normals)
+        self.spines = np.zeros_like(self.spines)
+        self.thickness = np.zeros_like(self.thickness)
+        self.cells = np.zeros_like(self.cells)
+        self.ids = np.zeros_like(self.ids)
+        self.colors = np.zeros_like(self.colors)
+        self.nPoints = self.nCells = self.deadCells = 0
+
+        for item in live:
+            p0, c0 = item.pointStart, item.cellStart
+            self._Place(item, *[a[p0:p0+item.pointCount] for a in old])
+            self.colors[item.cellStart:self.nCells] = oldColors[c0:c0+item.cellCount]
+        self._Bind()
+
+    def _Bind(self):
+        """
+        Point the polydata at the used part of the numpy arrays. The VTK
+        arrays share their memory, so later in place edits need only a
+        Modified().
+        """
+        n, m = self.nPoints, self.nCells
+        self.vpoints = numpy_to_vtk(self.points[:n])
+        vpoints = vtk.vtkPoints()
+        vpoints.SetData(self.vpoints)
+        self.vnormals = numpy_to_vtk(self.normals[:n])
+        self.vcells = numpy_to_vtkIdTypeArray(self.cells[:m].ravel())
+        polys = vtk.vtkCellArray()
+        polys.SetCells(m, self.vcells)
+        self.vids = numpy_to_vtk(self.ids[:m])
+        self.vids.SetName('bacteriumID')
+        self.vcolors = numpy_to_vtk(self.colors[:m])
+        self.vcolors.SetName('color')
+
+        self.polydata.SetPoints(vpoints)
+        self.polydata.SetPolys(polys)
+        self.polydata.GetPointData().SetNormals(self.vnormals)
+        self.polydata.GetCellData().AddArray(self.vids)
+        self.polydata.GetCellData().SetScalars(self.vcolors)
+        self.polydata.Modified()
+
+
+def _grow(array, size):
+    grown = np.zeros((size,) + array.shape[1:], array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+def _rgb(colors):
+    return (np.clip(np.asarray(colors, float), 0, 1) * 255).astype(np.uint8)
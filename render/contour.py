@@ -0,0 +1,296 @@
+'''
+Created on Oct 18, 2026
+
+Parallel isosurface extraction. The volume is split into z-slabs that
+share their boundary planes, each slab is contoured with vtkMarchingCubes
+on a persistent pool of processes, and the partial meshes are merged with
+the duplicated boundary points removed.
+'''
+from data.imageIO.stack import importVolume
+
+from multiprocessing import Pool, cpu_count
+import numpy as np
+import os
+import tempfile
+import vtk
+from vtk.util.numpy_support import (numpy_to_vtk, numpy_to_vtkIdTypeArray,
+                                    vtk_to_numpy)
+
+
+def slabBounds(zdim, slabs):
+    """
+    Split zdim planes into consecutive slabs that overlap by one plane,
+    so every cube (pair of adjacent planes) belongs to exactly one slab.
+
+    :@type zdim: int
+    :@param zdim: The number of z planes in the volume.
+    :@type slabs: int
+    :@param slabs: The desired number of slabs.
+    :@rtype: list
+    :@return: (first, last) plane indices, inclusive, for each slab.
+    """
+    cubes = zdim - 1
+    slabs = max(1, min(slabs, cubes))
+    edges = [int(round(i * cubes / float(slabs))) for i in range(slabs+1)]
+    return [(edges[i], edges[i+1]) for i in range(slabs)]
+
+
+class ContourPool(object):
+    """
+    The processes that parallelContour runs marching cubes on.
+
+    Create a single pool at startup, before the GUI: forking a process
+    that is running the GUI is unsafe (e.g. with Cocoa and OpenGL on
+    Mac OS X), and on Windows every new process imports the application
+    again. The volume is handed to the workers through a temporary
+    memory-mapped .npy file, so each worker only reads the pages of its
+    own slabs instead of being sent a pickled copy.
+    """
+    def __init__(self, workers=None, directory=None):
+        """
+        :@type workers: int
+        :@param workers: The number of processes. Defaults to the number 
+                         of CPUs. With fewer than 2 no processes are 
+                         started and slabs are contoured serially.
+        :@type directory: str
+        :@param directory: The folder for the shared volume files. 
+                           Defaults to the system temporary folder.
+        """
+        self.workers = workers if workers is not None else cpu_count()
+        self.directory = directory
+        self.pool = Pool(self.workers) if self.workers > 1 else None
+        # shared files that could not be removed yet (e.g. still mapped 
+        # by a worker on Windows)
+        self.stale = []
+
+    def Contour(self, volume, jobs, progress=None):
+        """
+        Contour slabs of volume on the worker processes.
+
+        :@type volume: numpy.ndarray
+        :@param volume: A volume indexed as [z, y, x].
+        :@type jobs: list
+        :@param jobs: (first plane, last plane, spacing, origin, x/y/z 
+                      index offset, isocontour range) for each slab.
+        :@type progress: func
+        :@param progress: Called with the completed fraction after each 
+                          slab. Any exception it raises stops collecting 
+                          results; slabs already handed out still finish 
+                          in the background and are discarded.
+        :@rtype: list
+        :@return: The (points, triangles) of each slab, in order.
+        """
+        self._RemoveStale()
+        fd, path = tempfile.mkstemp('.npy', 'contour-', self.directory)
+        os.close(fd)
+        try:
+            shared = np.lib.format.open_memmap(path, mode='w+', dtype=volume.dtype,
+                                               shape=volume.shape)
+            shared[:] = volume
+            shared.flush()
+            del shared
+
+            parts = []
+            for part in self.pool.imap(_contourSharedSlab,
+                                       [(path,) + tuple(job) for job in jobs]):
+                parts.append(part)
+                if progress is not None:
+                    progress(len(parts) / float(len(jobs)))
+            return parts
+        finally:
+            self.stale.append(path)
+            self._RemoveStale()
+
+    def _RemoveStale(self):
+        stale, self.stale = self.stale, []
+        for path in stale:
+            try:
+                os.remove(path)
+            except OSError:
+                if os.path.exists(path):
+                    self.stale.append(path)
+
+    def Close(self):
+        """
+        Stop the worker processes and remove any remaining shared files.
+        """
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+        self._RemoveStale()
+
+
+def _contourSharedSlab(args):
+    """
+    Contour the planes first to last of the volume in a shared .npy file. 
+    This runs in a worker process.
+    """
+    path, first, last, spacing, origin, offset, values = args
+    # copy-on-write, since VTK must be handed a writable buffer
+    volume = np.load(path, mmap_mode='c')
+    return contourSlab((volume[first:last+1], spacing, origin, offset, values))
+
+
+def contourSlab(args):
+    """
+    Extract the isosurface from one slab.
+
+    :@type args: tuple
+    :@param args: (slab array, spacing, origin, x/y/z index offset,
+                  isocontour range)
+    :@rtype: tuple
+    :@return: The (n x 3) point coordinates and (m x 3) triangle point
+              indices of the slab's surface.
+    """
+    slab, spacing, origin, offset, values = args
+
+    importer = importVolume(slab, spacing, offset)
+    importer.SetDataOrigin(origin)
+
+    mc = vtk.vtkMarchingCubes()
+    mc.GenerateValues(1, values)
+    mc.ComputeNormalsOff()
+    mc.ComputeScalarsOff()
+    mc.SetInputConnection(importer.GetOutputPort())
+    mc.Update()
+
+    return polyDataArrays(mc.GetOutput())
+
+
+def polyDataArrays(polydata):
+    """
+    Copy the points and triangles of a triangle mesh into numpy arrays.
+
+    :@type polydata: vtk.vtkPolyData
+    :@rtype: tuple
+    :@return: (n x 3) point coordinates and (m x 3) triangle point indices.
+    """
+    if not polydata.GetNumberOfPoints():
+        return np.zeros((0, 3), np.float32), np.zeros((0, 3), np.int64)
+
+    points = vtk_to_numpy(polydata.GetPoints().GetData()).copy()
+    cells = vtk_to_numpy(polydata.GetPolys().GetData())
+    triangles = cells.reshape(-1, 4)[:, 1:].astype(np.int64)
+    return points, triangles
+
+
+def arraysPolyData(points, triangles):
+    """
+    Build a triangle mesh from numpy point and triangle arrays.
+
+    :@rtype: vtk.vtkPolyData
+    """
+    vpoints = vtk.vtkPoints()
+    vpoints.SetData(numpy_to_vtk(np.ascontiguousarray(points), deep=1))
+
+    cells = np.empty((len(triangles), 4), dtype=np.int64)
+    cells[:, 0] = 3
+    cells[:, 1:] = triangles
+    polys = vtk.vtkCellArray()
+    polys.SetCells(len(triangles), numpy_to_vtkIdTypeArray(cells.ravel(), deep=1))
+
+    polydata = vtk.vtkPolyData()
+    polydata.SetPoints(vpoints)
+    polydata.SetPolys(polys)
+    return polydata
+
+
+def mergeSlabs(parts):
+    """
+    Join the per-slab meshes into one, merging points that two adjacent
+    slabs both generated on their shared plane. Points on a shared plane
+    are interpolated from the same two voxels in both slabs, so duplicates
+    are exactly equal and only the points at the top and bottom of each
+    slab need to be compared.
+
+    :@type parts: list
+    :@param parts: (points, triangles) for each slab, in z order.
+    :@rtype: tuple
+    :@return: The merged (points, triangles).
+    """
+    points = []
+    triangles = []
+    candidates = []
+    offset = 0
+    for i, (pts, tris) in enumerate(parts):
+        points.append(pts)
+        triangles.append(tris + offset)
+        if len(pts):
+            z = pts[:, 2]
+            edge = np.zeros(len(pts), dtype=bool)
+            if i > 0:
+                edge |= z == z.min()
+            if i < len(parts) - 1:
+                edge |= z == z.max()
+            candidates.append(np.flatnonzero(edge) + offset)
+        offset += len(pts)
+
+    points = np.vstack(points)
+    triangles = np.vstack(triangles)
+    if not candidates or not len(points):
+        return points, triangles
+    candidates = np.concatenate(candidates)
+
+    # find the first occurrence of every distinct candidate point
+    cpts = np.ascontiguousarray(points[candidates])
+    rows = cpts.view(np.dtype((np.void, cpts.dtype.itemsize * 3))).ravel()
+    _, first, inverse = np.unique(rows, return_index=True, return_inverse=True)
+
+    # map every point to the point it is kept as, then renumber
+    remap = np.arange(len(points))
+    remap[candidates] = candidates[first[inverse]]
+    keep = remap == np.arange(len(points))
+    newIndex = np.cumsum(keep) - 1
+
+    return points[keep], newIndex[remap][triangles]
+
+
+def parallelContour(image, values, pool=None, slabs=None, progress=None):
+    """
+    Extract an isosurface from image data using marching cubes on
+    several processes. The result is topologically equivalent to running
+    vtkMarchingCubes on the whole volume.
+
+    :@type image: vtk.vtkImageData
+    :@param image: Single component image data, e.g. the output of
+                   vtkExtractVOI.
+    :@type values: list
+    :@param values: The isocontour range passed to GenerateValues.
+    :@type pool: ContourPool
+    :@param pool: The processes to contour on. Without a pool (or one with
+                  no processes) the slabs are contoured one after another 
+                  in the calling thread.
+    :@type slabs: int
+    :@param slabs: The number of z-slabs. Defaults to twice the number
+                   of workers to balance uneven slabs.
+    :@type progress: func
+    :@param progress: Called with the completed fraction after each slab.
+                      Any exception it raises stops the contouring.
+    :@rtype: vtk.vtkPolyData
+    """
+    parallel = pool is not None and pool.pool is not None
+    if slabs is None:
+        slabs = 2 * pool.workers if parallel else 1
+
+    ext = image.GetExtent()
+    dims = [ext[1]-ext[0]+1, ext[3]-ext[2]+1, ext[5]-ext[4]+1]
+    scalars = vtk_to_numpy(image.GetPointData().GetScalars())
+    volume = scalars.reshape((dims[2], dims[1], dims[0]) + scalars.shape[1:])
+    spacing = image.GetSpacing()
+    origin = image.GetOrigin()
+
+    jobs = [(first, last, spacing, origin, (ext[0], ext[2], ext[4]+first), 
+             tuple(values)) for first, last in slabBounds(dims[2], slabs)]
+
+    if parallel and len(jobs) > 1:
+        parts = pool.Contour(volume, jobs, progress)
+    else:
+        parts = []
+        for first, last, spacing, origin, offset, values in jobs:
+            slab = np.ascontiguousarray(volume[first:last+1])
+            parts.append(contourSlab((slab, spacing, origin, offset, values)))
+            if progress is not None:
+                progress(len(parts) / float(len(jobs)))
+
+    return arraysPolyData(*mergeSlabs(parts))
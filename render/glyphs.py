@@ -0,0 +1,162 @@
+'''
+Created on Oct 18, 2026
+
+Draw many spheres (markers and coccoid bacteria) as instances of one
+shared sphere source with a single actor, instead of one source, mapper
+and actor per sphere.
+'''
+from render.basic import boolInt
+
+import vtk
+from vtk.util.numpy_support import vtk_to_numpy
+
+
+class Glyph(object):
+    """
+    A handle to one sphere in a GlyphSet. It stays valid while other
+    spheres are added or removed, and can be used in place of a marker
+    actor wherever only the center of the marker is needed.
+    """
+    def __init__(self, glyphSet, index):
+        self.glyphSet = glyphSet
+        self.index = index
+
+    def GetCenter(self):
+        return self.glyphSet.points.GetPoint(self.index)
+
+    def SetColor(self, color):
+        """
+        :@type color: render.basic.Color
+        """
+        self.glyphSet.SetColor(self, color)
+
+    def SetRadius(self, radius):
+        self.glyphSet.SetRadius(self, radius)
+
+    def Remove(self):
+        self.glyphSet.Remove(self)
+
+
+class GlyphSet(object):
+    """
+    Positions, radii and colors of the spheres are kept in the point data
+    of a single vtkPolyData, drawn by a vtkGlyph3DMapper over a shared
+    unit sphere. Adding, removing or changing a sphere edits those arrays
+    in place; the number of actors and draw calls does not grow with the
+    number of spheres.
+    """
+    def __init__(self, renderer, resolution=20):
+        """
+        :@type renderer: vtk.vtkRenderer
+        :@param renderer: The renderer to draw the spheres in.
+        :@type resolution: int
+        :@param resolution: The phi and theta resolution of the sphere.
+        """
+        self.renderer = renderer
+        self.glyphs = []
+
+        self.points = vtk.vtkPoints()
+        self.radii = vtk.vtkFloatArray()
+        self.radii.SetName('radius')
+        self.colors = vtk.vtkUnsignedCharArray()
+        self.colors.SetName('color')
+        self.colors.SetNumberOfComponents(3)
+
+        self.polydata = vtk.vtkPolyData()
+        self.polydata.SetPoints(self.points)
+        self.polydata.GetPointData().AddArray(self.radii)
+        self.polydata.GetPointData().SetScalars(self.colors)
+
+        sphere = vtk.vtkSphereSource()
+        sphere.SetRadius(1.0)
+        sphere.SetPhiResolution(resolution)
+        sphere.SetThetaResolution(resolution)
+
+        mapper = vtk.vtkGlyph3DMapper()
+        mapper.SetInput(self.polydata)
+        mapper.SetSourceConnection(sphere.GetOutputPort())
+        mapper.SetScaleArray('radius')
+        mapper.SetScaleModeToScaleByMagnitude()
+        mapper.ScalingOn()
+        mapper.OrientOff()
+        mapper.SetColorModeToDefault()
+
+        self.actor = vtk.vtkActor()
+        self.actor.SetMapper(mapper)
+        renderer.AddActor(self.actor)
+
+    def __len__(self):
+        return len(self.glyphs)
+
+    def Add(self, center, radius, color):
+        """
+        :@type center: Vec3f
+        :@type radius: float
+        :@type color: render.basic.Color
+        :@rtype: Glyph
+        :@return: The handle to the new sphere.
+        """
+        glyph = Glyph(self, len(self.glyphs))
+        self.glyphs.append(glyph)
+        self.points.InsertNextPoint(center.x, center.y, center.z)
+        self.radii.InsertNextValue(radius)
+        self.colors.InsertNextTuple3(*_rgb(color))
+        self._Modified()
+        return glyph
+
+    def Remove(self, glyph):
+        """
+        Remove a sphere by moving the last sphere into its place.
+        """
+        last = self.glyphs.pop()
+        n = len(self.glyphs)
+        if last is not glyph:
+            i = glyph.index
+            self.points.SetPoint(i, self.points.GetPoint(n))
+            self.radii.SetValue(i, self.radii.GetValue(n))
+            self.colors.SetTuple3(i, *self.colors.GetTuple3(n))
+            self.glyphs[i] = last
+            last.index = i
+
+        self.points.SetNumberOfPoints(n)
+        self.radii.SetNumberOfTuples(n)
+        self.colors.SetNumberOfTuples(n)
+        glyph.index = None
+        self._Modified()
+
+    def Clear(self):
+        for glyph in self.glyphs:
+            glyph.index = None
+        self.glyphs = []
+        self.points.SetNumberOfPoints(0)
+        self.radii.SetNumberOfTuples(0)
+        self.colors.SetNumberOfTuples(0)
+        self._Modified()
+
+    def SetColor(self, glyph, color):
+        self.colors.SetTuple3(glyph.index, *_rgb(color))
+        self._Modified()
+
+    def SetRadius(self, glyph, radius):
+        self.radii.SetValue(glyph.index, radius)
+        self._Modified()
+
+    def SetAllRadii(self, radius):
+        """
+        Give every sphere the same radius.
+        """
+        vtk_to_numpy(self.radii)[:] = radius
+        self._Modified()
+
+    def SetVisibility(self, visible):
+        self.actor.SetVisibility(boolInt(visible))
+
+    def _Modified(self):
+        self.points.Modified()
+        self.radii.Modified()
+        self.colors.Modified()
+        self.polydata.Modified()
+
+
+def _rgb(color):
+    return int(255*color.r), int(255*color.g), int(255*color.b)
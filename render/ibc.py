@@ -4,24 +4,67 @@ Created on Dec 28, 2010
 @author: Shareef Dabdoub
 '''
 #from data.util import StoreAsMatrix4x4
+from data.imageIO.base import within
 from render.basic import (Color, ImageRenderer, boolInt)
+from render.contour import parallelContour
+from render.jobs import PipelineJobRunner
+from render.stages import StageCache
+from render.timing import PipelineTimer
 from store import DataStore
 
+import math
 import vtk
 
 
 class IBCRenderer(ImageRenderer):
 
-    def __init__(self, renderer, renwin_update_callback):
+    def __init__(self, renderer, renwin_update_callback, contourPool=None,
+                 status_callback=None, output_callback=None, timer=None):
+        """
+        :@type contourPool: render.contour.ContourPool
+        :@param contourPool: The processes used to extract the isosurface. 
+                             Without one (or with one that has no processes) 
+                             marching cubes runs on the whole volume in the 
+                             pipeline's worker thread.
+        :@type status_callback: func
+        :@param status_callback: Receives progress messages while the 
+                                 pipeline executes in the background.
+        :@type output_callback: func
+        :@param output_callback: Receives the timing summary and stage 
+                                 reuse report of each completed pipeline 
+                                 execution.
+        :@type timer: render.timing.PipelineTimer
+        :@param timer: Records the time and output size of each pipeline 
+                       stage. Pass one timer to several renderers to 
+                       collect all of their records together.
+        """
         ImageRenderer.__init__(self)
         self.renderer = renderer
         self.renwin_update_callback = renwin_update_callback
         self.name = ""
         self.color = None
         self.volumeReader = None
+        self.vtkReader = None
         self.dataSpacing = (0.1, 0.1, 0.56)
         self.isocontourLevel = [20000,20000]
+        self.gaussStdDev = 1
+        self.gaussRadius = (1, 1, 1)
+        self.meshIterations = 50
+        self.meshFeatureAngle = 60.0
+        # quadric clustering divisions of the reduced meshes drawn while the
+        # camera moves, from most to least detailed
+        self.lodDivisions = (128, 48)
         self.visible = True
+        self.contourPool = contourPool
+        self.stages = StageCache({'contour': 2, 'mesh': 2, 'lod': 2})
+        self.jobs = PipelineJobRunner(self.Execute, self._SwapMesh, status_callback,
+                                      stopped=self._Stopped)
+        self.job = None
+        self.ready_callback = None
+        self.stopped_callback = None
+        self.output_callback = output_callback
+        self.timer = timer if timer is not None else PipelineTimer()
+        self.timingRun = None
         
     @property
     def Settings(self):
@@ -31,7 +74,7 @@ class IBCRenderer(ImageRenderer):
         s['DataSpacing'] = self.dataSpacing
         s['Color'] = self.color
         s['SliceRange'] = self.volumeReader.sliceRange
-        #s['PixelExtents'] = self.volumeReader.pixelExtents
+        s['PixelExtents'] = self.volumeReader.pixelExtents
         s['IsocontourLevel'] = self.isocontourLevel
         s['Visible'] = self.visible
         
@@ -39,6 +82,9 @@ class IBCRenderer(ImageRenderer):
     
     @Settings.setter
     def Settings(self, s):
+        self.jobs.Submit(lambda: self._ApplySettings(s), execute=False)
+    
+    def _ApplySettings(self, s):
         self.imageSetID = s['ImageSetID']
         self.name = s['name'] if 'name' in s else ''
         self.color = s['Color']
@@ -53,110 +99,398 @@ class IBCRenderer(ImageRenderer):
         
         if self.volumeReader is not None:
             self.volumeReader.sliceRange = s['SliceRange']
-            #self.volumeReader.pixelExtents = s['PixelExtents']
+            if 'PixelExtents' in s:
+                self.PixelExtents = s['PixelExtents']
             
         if 'Visible' in s:
             self.visible = s['Visible']
         
 
-    def Render(self, volumeReader):
+    def Render(self, volumeReader, ready_callback=None, settings=None, 
+               stopped_callback=None):
         """
-        This method attempts to tesselate the image data.
+        This method attempts to tesselate the image data. The image data 
+        are read and tesselated in the background; the actor is empty 
+        until the first mesh is ready.
         
         :@type volumeReader: data.imageIO.base.VolumeImageReader
         :@param volumeReader: This object handles opening image data and 
                               passing it to the appropriate VTK image container
-        :@rtype: 2-tuple
-        :@return: The vtkActor created from tesselated image data and a 
-                  vtkLocator for improving picking operations.
+        :@type ready_callback: func
+        :@param ready_callback: Called with this renderer, on the GUI thread, 
+                               once the first mesh is in place.
+        :@type settings: dict
+        :@param settings: Saved layer settings (see Settings) to apply 
+                          before the first execution, so that e.g. the 
+                          slice range and pixel extents of a loaded project 
+                          limit what is read from the start.
+        :@type stopped_callback: func
+        :@param stopped_callback: Called with this renderer and a message, 
+                                  on the GUI thread, if the first execution 
+                                  fails or is cancelled before any mesh is 
+                                  in place.
+        :@rtype: vtk.vtkCellLocator
+        :@return: A vtkLocator for improving picking operations.
         """
         if self.imageSetID is None: return        
         
         self.volumeReader = volumeReader
-        self.vtkReader = volumeReader.LoadVTKReader(self.dataSpacing)
+        self.ready_callback = ready_callback
+        self.stopped_callback = stopped_callback
+        if settings is not None:
+            self._ApplySettings(settings)
+        
+        ibcColor = DataStore.GetImageSet(self.imageSetID).color
+        self.ibcProperty = vtk.vtkProperty()
+        self.ibcProperty.SetDiffuseColor(ibcColor.r, ibcColor.g, ibcColor.b)
+        self.ibcProperty.SetSpecular(.1)
+        self.ibcProperty.SetSpecularPower(5)
+        self.ibcProperty.SetOpacity(1)
+        
+        # Finally create a renderable object "Actor" that can be passed to 
+        # the render window. It draws the full mesh when the view is still 
+        # and the fastest reduced mesh that meets the desired frame rate
+        # while the camera moves.
+        self.ibcActor = vtk.vtkLODProp3D()
+        self.meshMapper = self._CreateMapper()
+        self.fullLOD = self.ibcActor.AddLOD(self.meshMapper, self.ibcProperty, 0.0)
+        self.ibcActor.SetLODLevel(self.fullLOD, 0.0)
+        self.lodMappers = []
+        for level in range(1, len(self.lodDivisions)+1):
+            mapper = self._CreateMapper()
+            lod = self.ibcActor.AddLOD(mapper, self.ibcProperty, 0.0)
+            self.ibcActor.SetLODLevel(lod, level)
+            self.lodMappers.append(mapper)
+        
+        # always pick against the full mesh, which the locator holds
+        self.ibcActor.AutomaticPickLODSelectionOff()
+        self.ibcActor.SetSelectedPickLODID(self.fullLOD)
+        self.ibcActor.SetVisibility(boolInt(self.visible))
+        
+        self.renderer.AddActor(self.ibcActor)
+        
+        # Optional Locator to help the ray traced picker
+        self.bactLocator = vtk.vtkCellLocator()
+        self.bactLocator.LazyEvaluationOn()
+        
+        self.jobs.Submit()
+        
+        return self.bactLocator
+    
+    def _CreateMapper(self):
+        """
+        Convert mesh to graphics primitives. The mapper starts with an 
+        empty mesh so the actor can be drawn before tesselation finishes.
+        """
+        mapper = vtk.vtkPolyDataMapper()
+        mapper.ScalarVisibilityOff()
+        mapper.SetInput(vtk.vtkPolyData())
+        return mapper
+    
+    def Execute(self, job=None):
+        """
+        Run the tesselation pipeline: 
+            reader -> Gaussian smoothing -> spacing -> VOI -> marching cubes 
+                   -> mesh smoothing -> normals -> stripping
+        
+        The output of each stage is kept in a StageCache keyed by the 
+        parameters it depends on, so only the stages downstream of a 
+        changed parameter are executed again. e.g. changing the isocontour 
+        level reuses the smoothed volume, and since smoothing works in 
+        voxel units, so does changing the data spacing.
+        
+        :@type job: render.jobs.PipelineJobRunner
+        :@param job: The runner executing the pipeline in the background, 
+                     which receives stage progress and may cancel the run.
+                     None when run directly.
+        :@rtype: tuple
+        :@return: The mesh, its reduced levels of detail and the report of 
+                  the stages reused and computed, to be passed to _SwapMesh 
+                  on the GUI thread.
+        """
+        self.job = job
+        self.timingRun = self.timer.BeginRun()
+        self.stages.BeginRun()
+        smoothKey, smoothed = self._SmoothStage()
+        contourKey, contour = self._ContourStage(smoothKey, smoothed)
+        meshKey, mesh = self._MeshStage(contourKey, contour)
+        levels = self._DetailStage(meshKey, mesh)
+        
+        return mesh, levels, self.stages.Report
+    
+    def _SwapMesh(self, output):
+        """
+        Display a newly executed mesh. Must be called on the GUI thread.
+        """
+        mesh, levels, report = output
+        self.meshMapper.SetInput(mesh)
+        for mapper, level in zip(self.lodMappers, levels):
+            mapper.SetInput(level)
+        
+        if self.output_callback is not None:
+            self.output_callback('%s\n  stages %s' % (self.timer.Summary(self.timingRun), 
+                                                      report))
+        self.bactLocator.SetDataSet(mesh)
+        self.bactLocator.Modified()
+        self.renwin_update_callback()
+        
+        self.stopped_callback = None
+        if self.ready_callback is not None:
+            callback, self.ready_callback = self.ready_callback, None
+            callback(self)
+    
+    def _Stopped(self, message):
+        """
+        An execution failed or was cancelled. Must be called on the GUI 
+        thread. A later successful execution still calls ready_callback.
+        """
+        if self.stopped_callback is not None:
+            callback, self.stopped_callback = self.stopped_callback, None
+            callback(self, message)
+    
+    def CancelExecution(self):
+        """
+        Stop the pipeline if it is executing. The previous mesh is kept.
+        """
+        self.jobs.Cancel()
+    
+    def _Watch(self, algorithm, stage):
+        """
+        Time each execution of algorithm as the given stage and, when 
+        running in the background, report its progress.
+        """
+        self.timer.Watch(algorithm, self.timingRun, self.LayerName, stage)
+        if self.job is not None:
+            self.job.Watch(algorithm, stage)
+        return algorithm
+    
+    def _Time(self, stage, output=None):
+        """
+        Time a with block as the given stage. See PipelineTimer.Time
+        """
+        return self.timer.Time(self.timingRun, self.LayerName, stage, output)
+    
+    @property
+    def Timings(self):
+        """
+        The time and output size of each stage executed by the most 
+        recent run of the pipeline. Stages reused from the stage cache 
+        are not included.
+        
+        :@rtype: list
+        :@return: render.timing.StageRecord for each executed stage.
+        """
+        return self.timer.Run(self.timingRun)
+    
+    @property
+    def LayerName(self):
+        return self.name or 'image set %s' % self.imageSetID
+    
+    def _Report(self, stage, fraction):
+        if self.job is not None:
+            self.job.Report(stage, fraction)
+    
+    def _CheckCancelled(self):
+        if self.job is not None:
+            self.job.CheckCancelled()
+    
+    def _SmoothStage(self):
+        """
+        :@rtype: tuple
+        :@return: The cache key and the smoothed volume (vtkImageData). 
+                  A cached volume is reused if it was smoothed with the 
+                  same parameters and covers the VOI plus SmoothingMargin.
+        """
+        params = (self.gaussStdDev, self.gaussRadius)
+        self.volumeReader.margin = self.SmoothingMargin
+        required = self.volumeReader.ReadExtents
+        
+        key, smoothed = self.stages.Find('smooth', lambda k: k[:2] == params and 
+                                                             within(required, k[2]))
+        if smoothed is not None:
+            return key, smoothed
+        
+        self._Report('reading', 0)
+        with self._Time('reading', lambda: self.vtkReader.GetOutput()):
+            self._ReloadVolume()
+            self.vtkReader.Update()
+        self._CheckCancelled()
         
         # Gaussian Smoothing
-        self.gaussFilter = vtk.vtkImageGaussianSmooth()
-        self.gaussFilter.SetDimensionality(3)
-        self.gaussFilter.SetStandardDeviation(1)
-        self.gaussFilter.SetRadiusFactors(1, 1, 1)
-        self.gaussFilter.SetInput(self.vtkReader.GetOutput())
+        gaussFilter = vtk.vtkImageGaussianSmooth()
+        gaussFilter.SetDimensionality(3)
+        gaussFilter.SetStandardDeviation(self.gaussStdDev)
+        gaussFilter.SetRadiusFactors(self.gaussRadius)
+        gaussFilter.SetInput(self.vtkReader.GetOutput())
+        self._Watch(gaussFilter, 'smoothing')
+        gaussFilter.Update()
+        self._CheckCancelled()
+        
+        smoothed = vtk.vtkImageData()
+        smoothed.ShallowCopy(gaussFilter.GetOutput())
+        key = params + (tuple(smoothed.GetExtent()),)
+        self.stages.Put('smooth', key, smoothed)
+        
+        return key, smoothed
+    
+    def _ContourStage(self, smoothKey, smoothed):
+        """
+        :@rtype: tuple
+        :@return: The cache key and the isosurface (vtkPolyData) extracted 
+                  from the VOI of the smoothed volume.
+        """
+        voiExtents = tuple(self.volumeReader.VolumeExtents)
+        key = (smoothKey, tuple(self.dataSpacing), voiExtents, 
+               tuple(self.isocontourLevel))
+        contour = self.stages.Get('contour', key)
+        if contour is not None:
+            return key, contour
+        
+        # Apply the data spacing after smoothing
+        spacing = vtk.vtkImageChangeInformation()
+        spacing.SetInput(smoothed)
+        spacing.SetOutputSpacing(self.dataSpacing)
         
         # VOI Extractor
-        self.voi = vtk.vtkExtractVOI()
-        self.voi.SetInputConnection(self.gaussFilter.GetOutputPort())
-#        self.voi.SetInputConnection(self.vtkReader.GetOutputPort())
-        self.voi.SetVOI(self.volumeReader.VolumeExtents)
+        voi = vtk.vtkExtractVOI()
+        voi.SetInputConnection(spacing.GetOutputPort())
+        voi.SetVOI(voiExtents)
+        
+        if self.contourPool is not None and self.contourPool.pool is not None:
+            def progress(fraction):
+                self._CheckCancelled()
+                self._Report('contouring', fraction)
+            
+            with self._Time('contouring', lambda: contour):
+                voi.Update()
+                progress(0)
+                contour = parallelContour(voi.GetOutput(), self.isocontourLevel,
+                                          self.contourPool, progress=progress)
+            self.stages.Put('contour', key, contour)
+            return key, contour
         
         # Surface rendering
-        self.bactExtractor = vtk.vtkMarchingCubes()
-        self.bactExtractor.GenerateValues(1, self.isocontourLevel)
-        self.bactExtractor.ComputeNormalsOff()
-        self.bactExtractor.SetInputConnection(self.voi.GetOutputPort())
+        bactExtractor = vtk.vtkMarchingCubes()
+        bactExtractor.GenerateValues(1, self.isocontourLevel)
+        bactExtractor.ComputeNormalsOff()
+        bactExtractor.SetInputConnection(voi.GetOutputPort())
+        self._Watch(bactExtractor, 'contouring')
+        bactExtractor.Update()
+        self._CheckCancelled()
 
         # surface rendering with dividing cubes
-#        self.bactExtractor = vtk.vtkRecursiveDividingCubes()
-#        self.bactExtractor.SetInputConnection(self.voi.GetOutputPort())
-#        self.bactExtractor.SetValue(self.isocontourLevel[0])
-#        self.bactExtractor.SetDistance(0.5)
-#        self.bactExtractor.SetIncrement(2)
-
+#        bactExtractor = vtk.vtkRecursiveDividingCubes()
+#        bactExtractor.SetInputConnection(voi.GetOutputPort())
+#        bactExtractor.SetValue(self.isocontourLevel[0])
+#        bactExtractor.SetDistance(0.5)
+#        bactExtractor.SetIncrement(2)
+        
+        contour = vtk.vtkPolyData()
+        contour.ShallowCopy(bactExtractor.GetOutput())
+        self.stages.Put('contour', key, contour)
+        
+        return key, contour
+    
+    def _MeshStage(self, contourKey, contour):
+        """
+        :@rtype: tuple
+        :@return: The cache key and the smoothed, stripped isosurface 
+                  with normals.
+        """
+        key = (contourKey, self.meshIterations, self.meshFeatureAngle)
+        mesh = self.stages.Get('mesh', key)
+        if mesh is not None:
+            return key, mesh
+        
         # Smooth the mesh
         relaxedMesh = vtk.vtkSmoothPolyDataFilter()
-        relaxedMesh.SetNumberOfIterations(50)
-        relaxedMesh.SetInput(self.bactExtractor.GetOutput())
+        relaxedMesh.SetNumberOfIterations(self.meshIterations)
+        relaxedMesh.SetInput(contour)
+        self._Watch(relaxedMesh, 'mesh smoothing')
 
         # Calculate normals
         meshNormals = vtk.vtkPolyDataNormals()
-        meshNormals.SetFeatureAngle(60.0)
+        meshNormals.SetFeatureAngle(self.meshFeatureAngle)
         meshNormals.SetInput(relaxedMesh.GetOutput())
+        self._Watch(meshNormals, 'normals')
 
         # Restrip mesh after normal computation
         restrippedMesh = vtk.vtkStripper()
         restrippedMesh.SetInput(meshNormals.GetOutput())
+        self._Watch(restrippedMesh, 'stripping')
+        restrippedMesh.Update()
+        self._CheckCancelled()
         
-        # Convert mesh to graphics primitives
-        self.meshMapper = vtk.vtkPolyDataMapper()
-        self.meshMapper.ScalarVisibilityOff()
-        self.meshMapper.SetInput(restrippedMesh.GetOutput())
+        mesh = vtk.vtkPolyData()
+        mesh.ShallowCopy(restrippedMesh.GetOutput())
+        self.stages.Put('mesh', key, mesh)
         
-        # Finally create a renderable object "Actor" 
-        # that can be passed to the render window
-        self.ibcActor = vtk.vtkActor()
-        self.ibcActor.SetMapper(self.meshMapper)
-        ibcColor = DataStore.GetImageSet(self.imageSetID).color
-        self.ibcActor.GetProperty().SetDiffuseColor(ibcColor.r, ibcColor.g, ibcColor.b)
-        self.ibcActor.GetProperty().SetSpecular(.1)
-        self.ibcActor.GetProperty().SetSpecularPower(5)
-        self.ibcActor.GetProperty().SetOpacity(1)
-        self.ibcActor.SetVisibility(boolInt(self.visible))
+        return key, mesh
+    
+    def _DetailStage(self, meshKey, mesh):
+        """
+        Reduce the mesh by quadric clustering, which takes time linear in 
+        the size of the mesh, once for each entry in lodDivisions.
         
-        self.renderer.AddActor(self.ibcActor)
+        :@rtype: list
+        :@return: The reduced meshes (vtkPolyData) with normals, from most 
+                  to least detailed.
+        """
+        key = (meshKey, self.lodDivisions)
+        levels = self.stages.Get('lod', key)
+        if levels is not None:
+            return levels
+        
+        levels = []
+        for divisions in self.lodDivisions:
+            cluster = vtk.vtkQuadricClustering()
+            cluster.SetNumberOfDivisions(divisions, divisions, divisions)
+            cluster.AutoAdjustNumberOfDivisionsOn()
+            cluster.SetInput(mesh)
+            self._Watch(cluster, 'detail levels')
+            
+            normals = vtk.vtkPolyDataNormals()
+            normals.SetFeatureAngle(self.meshFeatureAngle)
+            normals.SetInputConnection(cluster.GetOutputPort())
+            self._Watch(normals, 'detail normals')
+            normals.Update()
+            self._CheckCancelled()
+            
+            level = vtk.vtkPolyData()
+            level.ShallowCopy(normals.GetOutput())
+            levels.append(level)
         
-        # Optional Locator to help the ray traced picker
-        self.bactLocator = vtk.vtkCellLocator()
-        self.bactLocator.SetDataSet(restrippedMesh.GetOutput())
-        self.bactLocator.LazyEvaluationOn()
+        self.stages.Put('lod', key, levels)
         
-        return self.bactLocator
+        return levels
     
     @property
     def VolumeMapper(self):
         return self.meshMapper
     
+    def UpdateClippingPlanes(self, planes):
+        """
+        Clip every level of detail of the mesh with the given planes.
+        
+        :@type planes: vtk.vtkPlanes
+        """
+        for mapper in [self.meshMapper] + self.lodMappers:
+            mapper.SetClippingPlanes(planes)
+    
     @property
     def DescriptiveName(self):
         """
         Get a descriptive name for the files behind the image stack
         """
-        return self.vtkReader.GetDescriptiveName()
+        return self.volumeReader.reader.GetDescriptiveName()
     
     
     def UpdateDataSpacing(self, dataSpacing):
-        self.dataSpacing = dataSpacing
-        self.vtkReader.SetDataSpacing(dataSpacing)
-        self.vtkReader.Update()
-        self.renwin_update_callback()
+        def setup():
+            self.dataSpacing = dataSpacing
+            if self.vtkReader is not None:
+                self.vtkReader.SetDataSpacing(dataSpacing)
+        self.jobs.Submit(setup)
     
     def UpdateImageDataExtent(self, sliceRange=None, pixelExtents=None):
         """
@@ -166,22 +500,42 @@ class IBCRenderer(ImageRenderer):
                             those in the range will be used as input data 
                             for tesselation.
         :@type pixelExtents: list len=4
-        :@param param: 
+        :@param pixelExtents: The (xmin, xmax, ymin, ymax) pixels of each 
+                              image to use as input data for tesselation.
         """
-        if sliceRange is not None:
-            self.SliceRange = sliceRange
-#        if pixelExtents is not None:
-#            self.volumeReader.pixelExtents = pixelExtents
-        
-        self.voi.SetVOI(self.volumeReader.VolumeExtents)
-        self.voi.Update()
-        self.renderer.Render()
+        def setup():
+            if sliceRange is not None:
+                self.SliceRange = sliceRange
+            if pixelExtents is not None:
+                self.PixelExtents = pixelExtents
+        self.jobs.Submit(setup)
     
     def UpdateGaussianFilter(self, stdDev=1, radius=(1,1,1)):
-        self.gaussFilter.SetStandardDeviations(stdDev)
-        self.gaussFilter.SetRadiusFactors(radius[0], radius[1], radius[2])
-        self.gaussFilter.Update()
-        self.renwin_update_callback()
+        def setup():
+            self.gaussStdDev = stdDev
+            self.gaussRadius = tuple(radius)
+        self.jobs.Submit(setup)
+    
+    @property
+    def SmoothingMargin(self):
+        """
+        The number of voxels along each axis that the Gaussian kernel 
+        reaches beyond the voxel being smoothed. The volume is read with 
+        this margin around the VOI so that smoothing at its edges is 
+        unaffected by cropping.
+        
+        :@rtype: tuple
+        """
+        return tuple(int(math.ceil(self.gaussStdDev * r)) for r in self.gaussRadius)
+    
+    def _ReloadVolume(self):
+        """
+        Re-read the volume so it covers the current slice range and pixel 
+        extents. Regions that are already in memory are not decoded again.
+        """
+        self.vtkReader = self.volumeReader.LoadVTKReader(self.dataSpacing, 
+                                                         self.volumeReader.sliceRange, 
+                                                         self.SmoothingMargin)
     
     
     @property
@@ -192,16 +546,13 @@ class IBCRenderer(ImageRenderer):
         if isinstance(level, int):
             level = [level, level]
         
-        self.isocontourLevel = level
-        self.bactExtractor.GenerateValues(1, self.isocontourLevel)
-#        self.bactExtractor.SetValue(self.isocontourLevel[0])
-        self.bactExtractor.Update()
-        self.renwin_update_callback()
+        def setup():
+            self.isocontourLevel = level
+        self.jobs.Submit(setup)
         
     def UpdateColor(self, color):
         self.color = color
-        self.ibcActor.GetProperty().SetDiffuseColor(color.r, color.g, color.b)
-        self.ibcActor.ApplyProperties()
+        self.ibcProperty.SetDiffuseColor(color.r, color.g, color.b)
         self.renwin_update_callback()
         
     
@@ -218,7 +569,7 @@ class IBCRenderer(ImageRenderer):
     @property
     def Actor(self):
         """
-        The vtkActor created by this class
+        The vtkLODProp3D created by this class
         """
         return self.ibcActor
 
@@ -253,6 +604,30 @@ class IBCRenderer(ImageRenderer):
             if sliceRange[0] > sliceRange[1]:
                 self.volumeReader.sliceRange = [sliceRange[1], sliceRange[0]]
     
+    @property
+    def PixelExtents(self):
+        """
+        Specifies the (xmin, xmax, ymin, ymax) pixels of each image 
+        to use as input data for tesselation.
+        """
+        return self.volumeReader.pixelExtents
+    
+    @PixelExtents.setter
+    def PixelExtents(self, pixelExtents):
+        whole = self.volumeReader.WholeExtents
+        # error checking on pixel extents: order each axis and clamp it 
+        # to the images, so the VOI is never empty
+        if not pixelExtents:
+            self.volumeReader.pixelExtents = tuple(whole[:4])
+            return
+        
+        ext = []
+        for axis in range(2):
+            lo, hi = whole[2*axis], whole[2*axis+1]
+            for e in sorted(pixelExtents[2*axis:2*axis+2]):
+                ext.append(min(max(int(e), lo), hi))
+        self.volumeReader.pixelExtents = tuple(ext)
+    
 #    @property
 #    def TransformMatrix(self):
 #        return self.ibcActor.GetMatrix()
@@ -267,7 +642,7 @@ import wx
 
 class IBCSettingsDialog(wx.Dialog):
     def __init__(self, parent, ibcRenderer, status_callback=None, title='Image Layer Settings', **kwargs):
-        wx.Dialog.__init__(self, parent, size=(360,320), title=title, **kwargs)
+        wx.Dialog.__init__(self, parent, size=(360,390), title=title, **kwargs)
 
         self.ibcRenderer = ibcRenderer
         self.setStatusMessage = status_callback
@@ -307,17 +682,17 @@ class IBCSettingsDialog(wx.Dialog):
         
         # pixel extents
         # X
-#        sizer.Add(wx.StaticText(self, wx.ID_ANY, "Pixel Extents (X):"))
-#        self.txtXPixelExtLower = wx.TextCtrl(self, wx.ID_ANY, "")
-#        self.txtXPixelExtUpper = wx.TextCtrl(self, wx.ID_ANY, "")
-#        sizer.Add(self.txtXPixelExtLower)
-#        sizer.Add(self.txtXPixelExtUpper)
+        sizer.Add(wx.StaticText(self, wx.ID_ANY, "Pixel Extents (X):"))
+        self.txtXPixelExtLower = wx.TextCtrl(self, wx.ID_ANY, "")
+        self.txtXPixelExtUpper = wx.TextCtrl(self, wx.ID_ANY, "")
+        sizer.Add(self.txtXPixelExtLower, 0, wx.RIGHT, 5)
+        sizer.Add(self.txtXPixelExtUpper)
         # Y
-#        sizer.Add(wx.StaticText(self, wx.ID_ANY, "Pixel Extents (Y):"))
-#        self.txtYPixelExtLower = wx.TextCtrl(self, wx.ID_ANY, "")
-#        self.txtYPixelExtUpper = wx.TextCtrl(self, wx.ID_ANY, "")
-#        sizer.Add(self.txtYPixelExtLower)
-#        sizer.Add(self.txtYPixelExtUpper)
+        sizer.Add(wx.StaticText(self, wx.ID_ANY, "Pixel Extents (Y):"))
+        self.txtYPixelExtLower = wx.TextCtrl(self, wx.ID_ANY, "")
+        self.txtYPixelExtUpper = wx.TextCtrl(self, wx.ID_ANY, "")
+        sizer.Add(self.txtYPixelExtLower, 0, wx.RIGHT, 5)
+        sizer.Add(self.txtYPixelExtUpper)
         
         # color picker
         sizer.Add(wx.StaticText(self, wx.ID_ANY, "Color:"))
@@ -333,6 +708,11 @@ class IBCSettingsDialog(wx.Dialog):
         # update button
         self.cmdUpdate = wx.Button(self, wx.NewId(), "Update")
         self.Bind(wx.EVT_BUTTON, self._cmdUpdate_click, id=self.cmdUpdate.Id)
+        self.cmdStop = wx.Button(self, wx.NewId(), "Stop Rendering")
+        self.Bind(wx.EVT_BUTTON, self._cmdStop_click, id=self.cmdStop.Id)
+        cmdSizer = wx.BoxSizer(wx.HORIZONTAL)
+        cmdSizer.Add(self.cmdStop, 0, wx.RIGHT, 5)
+        cmdSizer.Add(self.cmdUpdate)
         
         infoSizer = wx.BoxSizer(wx.HORIZONTAL)
         infoSizer.Add(wx.StaticText(self, wx.ID_ANY, "Loaded image set: "))
@@ -342,7 +722,7 @@ class IBCSettingsDialog(wx.Dialog):
         self.Sizer = wx.BoxSizer(wx.VERTICAL)
         self.Sizer.Add(infoSizer, 0, wx.TOP | wx.LEFT | wx.RIGHT, 10)
         self.Sizer.Add(sizer, 1, wx.EXPAND | wx.LEFT | wx.TOP | wx.BOTTOM | wx.RIGHT, 10)
-        self.Sizer.Add(self.cmdUpdate, 0, wx.ALIGN_RIGHT | wx.RIGHT | wx.BOTTOM, 10)
+        self.Sizer.Add(cmdSizer, 0, wx.ALIGN_RIGHT | wx.RIGHT | wx.BOTTOM, 10)
         
         self.settings = self._RetrieveSettings()
 
@@ -377,12 +757,12 @@ class IBCSettingsDialog(wx.Dialog):
             self._UpdateIsocontourLevel(isovals)
         
         # pixel extents
-#        if self.txtXPixelExtLower.Value != str(s['PixelExtents'][0]) or \
-#           self.txtXPixelExtUpper.Value != str(s['PixelExtents'][1]) or \
-#           self.txtYPixelExtLower.Value != str(s['PixelExtents'][2]) or \
-#           self.txtYPixelExtUpper.Value != str(s['PixelExtents'][3]):
-#            print 'Updating pixel extents'
-#            self._UpdatePixelExtents()
+        if self.txtXPixelExtLower.Value != str(s['PixelExtents'][0]) or \
+           self.txtXPixelExtUpper.Value != str(s['PixelExtents'][1]) or \
+           self.txtYPixelExtLower.Value != str(s['PixelExtents'][2]) or \
+           self.txtYPixelExtUpper.Value != str(s['PixelExtents'][3]):
+            print 'Updating pixel extents'
+            self._UpdatePixelExtents()
         
         color = Color.fromWX(self.btnColor.GetColour().Get())
         if color != s['Color']:
@@ -396,6 +776,9 @@ class IBCSettingsDialog(wx.Dialog):
             self.ibcRenderer.UpdateVisibility(visible)
             
     
+    def _cmdStop_click(self, events):
+        self.ibcRenderer.CancelExecution()
+    
     def _UpdateDataSpacing(self):
         x = float(self.txtSpacingX.Value)
         y = float(self.txtSpacingY.Value)
@@ -413,11 +796,11 @@ class IBCSettingsDialog(wx.Dialog):
         self.settings['IsocontourLevel'] = isovals
         self.ibcRenderer.UpdateIsocontour(isovals)
         
-#    def _UpdatePixelExtents(self):
-#        pe = (int(self.txtXPixelExtLower.Value), int(self.txtXPixelExtUpper.Value), 
-#              int(self.txtYPixelExtLower.Value), int(self.txtYPixelExtUpper.Value))
-#        self.settings['PixelExtents'] = pe
-#        self.ibcRenderer.UpdateImageDataExtent(pixelExtents=pe)
+    def _UpdatePixelExtents(self):
+        pe = (int(self.txtXPixelExtLower.Value), int(self.txtXPixelExtUpper.Value), 
+              int(self.txtYPixelExtLower.Value), int(self.txtYPixelExtUpper.Value))
+        self.settings['PixelExtents'] = pe
+        self.ibcRenderer.UpdateImageDataExtent(pixelExtents=pe)
         
     def _UpdateColor(self, color):
         self.ibcRenderer.UpdateColor(color)
@@ -441,10 +824,10 @@ class IBCSettingsDialog(wx.Dialog):
         self.lblImageSetSlices.Label = str(s['SliceRange'][1] - s['SliceRange'][0])
         self.txtSliceLower.Value = str(s['SliceRange'][0])
         self.txtSliceUpper.Value = str(s['SliceRange'][1])
-#        self.txtXPixelExtLower.Value = str(s['PixelExtents'][0])
-#        self.txtXPixelExtUpper.Value = str(s['PixelExtents'][1])
-#        self.txtYPixelExtLower.Value = str(s['PixelExtents'][2])
-#        self.txtYPixelExtUpper.Value = str(s['PixelExtents'][3])
+        self.txtXPixelExtLower.Value = str(s['PixelExtents'][0])
+        self.txtXPixelExtUpper.Value = str(s['PixelExtents'][1])
+        self.txtYPixelExtLower.Value = str(s['PixelExtents'][2])
+        self.txtYPixelExtUpper.Value = str(s['PixelExtents'][3])
         self.btnColor.SetColour(s['Color'].toWX())
         self.chkVisible.Value = s['Visible']
 
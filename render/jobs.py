@@ -0,0 +1,197 @@
+'''
+Created on Oct 18, 2026
+
+Run a VTK pipeline on a worker thread so that the GUI stays responsive
+while it executes, with per-stage progress reporting and cancellation.
+'''
+import threading
+import traceback
+import wx
+
+
+class JobCancelled(Exception):
+    """
+    Raised within a pipeline execution when it has been cancelled.
+    """
+    pass
+
+
+class PipelineJobRunner(object):
+    """
+    Executes a pipeline on a single worker thread.
+
+    Parameter changes are submitted as setup functions. When no execution
+    is running they are applied immediately, otherwise they are queued and
+    applied by the worker before its next execution, so the pipeline
+    never sees parameters change part way through a run. Submitting while
+    an execution is running cancels it and starts another, so a burst of
+    edits results in a single execution with all of them applied.
+
+    The finished, stopped and status callbacks are always invoked on the 
+    GUI thread.
+
+    Note: VTK 5 does not release the GIL while a filter executes. The GUI
+          thread gets to run each time a watched filter reports progress,
+          so every long running filter should be passed to Watch.
+    """
+    def __init__(self, execute, finished, status_callback=None, post=wx.CallAfter,
+                 stopped=None):
+        """
+        :@type execute: func
+        :@param execute: Runs the pipeline on the worker thread. Called with
+                         this runner and returns the pipeline output.
+        :@type finished: func
+        :@param finished: Called with the output of each execution that
+                          completed without being cancelled or superseded.
+        :@type status_callback: func
+        :@param status_callback: Called with a progress message.
+        :@type post: func
+        :@param post: Schedules a call on the GUI thread.
+        :@type stopped: func
+        :@param stopped: Called with a message when an execution failed or 
+                         was cancelled and no further execution follows.
+        """
+        self.execute = execute
+        self.finished = finished
+        self.status_callback = status_callback
+        self.post = post
+        self.stopped = stopped
+        self.lock = threading.Lock()
+        self.worker = None
+        self.setups = []
+        self.requested = False
+        self.cancelled = False
+        self.reported = None
+
+    @property
+    def Busy(self):
+        """
+        True while the worker thread is running.
+        """
+        return self.worker is not None
+
+    def Submit(self, setup=None, execute=True):
+        """
+        Apply a parameter change and (re-)execute the pipeline.
+
+        :@type setup: func
+        :@param setup: Applies the parameter change. Takes no arguments.
+        :@type execute: bool
+        :@param execute: If False and no execution is running, only apply
+                         setup. A running execution is always restarted
+                         since its output no longer matches the parameters.
+        """
+        with self.lock:
+            busy = self.worker is not None
+            if setup is not None:
+                if busy:
+                    self.setups.append(setup)
+                else:
+                    setup()
+
+            if not (execute or busy):
+                return
+
+            self.requested = True
+            self.cancelled = busy
+            if not busy:
+                self.worker = threading.Thread(target=self._Run,
+                                               name='PipelineJobRunner')
+                self.worker.daemon = True
+                self.worker.start()
+
+    def Cancel(self):
+        """
+        Stop the running execution, if any. Its output is discarded and
+        the previous output stays in place.
+        """
+        with self.lock:
+            self.requested = False
+            self.cancelled = self.worker is not None
+
+    def Watch(self, algorithm, stage):
+        """
+        Report the progress of a VTK algorithm under the given stage name
+        and abort it if the execution is cancelled. Must be called on the
+        worker thread before the algorithm is updated.
+
+        :@type algorithm: vtk.vtkAlgorithm
+        :@type stage: str
+        :@param stage: A short description of the stage, e.g. 'smoothing'.
+        :@rtype: vtk.vtkAlgorithm
+        :@return: The algorithm.
+        """
+        def onProgress(obj, event):
+            if self.cancelled:
+                obj.SetAbortExecute(1)
+            self.Report(stage, obj.GetProgress())
+
+        algorithm.AddObserver('ProgressEvent', onProgress)
+        return algorithm
+
+    def Report(self, stage, fraction):
+        """
+        Post a progress message for stage, skipping repeats so the GUI
+        thread is not flooded with events.
+
+        :@type fraction: float
+        :@param fraction: The completed fraction of the stage, 0 to 1.
+        """
+        message = 'Rendering: %s %i%%' % (stage, 100*fraction)
+        if message != self.reported:
+            self.reported = message
+            self._Status(message)
+
+    def CheckCancelled(self):
+        """
+        Raise JobCancelled if the running execution has been cancelled.
+        Call after each stage so that the output of an aborted filter is
+        never used.
+        """
+        if self.cancelled:
+            raise JobCancelled()
+
+    def _Status(self, message):
+        if self.status_callback is not None:
+            self.post(self.status_callback, message)
+
+    def _Run(self):
+        """
+        The worker thread loop: apply queued setups and execute until no
+        further execution has been requested.
+        """
+        stopped = None
+        while True:
+            with self.lock:
+                setups, self.setups = self.setups, []
+                for setup in setups:
+                    setup()
+
+                if not self.requested:
+                    self.worker = None
+                    if stopped is not None and self.stopped is not None:
+                        self.post(self.stopped, stopped)
+                    return
+
+                self.requested = False
+                self.cancelled = False
+                self.reported = None
+
+            stopped = None
+            try:
+                output = self.execute(self)
+            except JobCancelled:
+                stopped = 'Rendering cancelled'
+                self._Status(stopped)
+                continue
+            except Exception, e:
+                traceback.print_exc()
+                stopped = 'Rendering failed: %s' % e
+                self._Status(stopped)
+                continue
+
+            with self.lock:
+                superseded = self.requested or self.cancelled
+            if not superseded:
+                self._Status('')
+                self.post(self.finished, output)
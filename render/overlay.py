@@ -0,0 +1,159 @@
+'''
+Created on Oct 18, 2026
+
+Cache the rendered static scene so that frames in which only a few
+overlay actors change (e.g. the picker cones following the mouse) do not
+redraw the whole scene.
+'''
+import vtk
+from vtk.util.numpy_support import vtk_to_numpy
+
+
+class SceneCache(object):
+    """
+    Draws a scene renderer and an overlay renderer in layers 0 and 1 of
+    one render window. The overlay shares the scene's camera and keeps the
+    scene's depth buffer, so overlay actors are hidden behind scene
+    geometry exactly as if they were part of the scene.
+
+    RenderOverlay keeps the color and depth buffers of the scene alone.
+    While the camera and scene content are unchanged, later calls copy
+    the buffers back into the window and draw only the overlay on top.
+    The cache is invalidated when the camera, window size, or the
+    modification time of any scene prop changes, or on Invalidate.
+
+    Ordinary window renders (e.g. by the interactor during camera motion)
+    draw both layers normally and are unaffected.
+    """
+    def __init__(self, renwin, scene, overlay):
+        """
+        :@type renwin: vtk.vtkRenderWindow
+        :@type scene: vtk.vtkRenderer
+        :@param scene: The renderer holding the static scene.
+        :@type overlay: vtk.vtkRenderer
+        :@param overlay: The renderer holding actors that change often.
+        """
+        self.renwin = renwin
+        self.scene = scene
+        self.overlay = overlay
+        self.rgba = vtk.vtkUnsignedCharArray()
+        self.zbuffer = vtk.vtkFloatArray()
+        self.signature = None
+        self.hits = 0
+        self.misses = 0
+
+        renwin.SetNumberOfLayers(2)
+        scene.SetLayer(0)
+        overlay.SetLayer(1)
+        overlay.PreserveDepthBufferOn()
+        # interactor styles should act on the scene, not the overlay
+        overlay.InteractiveOff()
+        self.SyncCamera()
+
+    def SyncCamera(self):
+        """
+        Point the overlay at the scene's active camera. Call after
+        changing the active camera of the scene.
+        """
+        self.overlay.SetActiveCamera(self.scene.GetActiveCamera())
+
+    def Invalidate(self):
+        """
+        Discard the cached scene, e.g. after changing scene content in
+        a way its modification times do not reflect.
+        """
+        self.signature = None
+
+    def Signature(self):
+        """
+        :@rtype: tuple
+        :@return: Everything that, when changed, changes the rendered scene.
+        """
+        props = self.scene.GetViewProps()
+        props.InitTraversal()
+        propTimes = [props.GetNextProp().GetRedrawMTime()
+                     for _ in range(props.GetNumberOfItems())]
+
+        return (self.renwin.GetSize(), self.scene.GetActiveCamera().GetMTime(),
+                self.scene.GetMTime(), props.GetMTime(), max(propTimes or [0]),
+                sum(propTimes))
+
+    def RenderOverlay(self):
+        """
+        Render the window after a change to overlay actors only.
+        """
+        if not self._Validate():
+            self.renwin.Render()
+            return
+
+        self._Restore()
+        self.scene.DrawOff()
+        try:
+            self.renwin.Render()
+        finally:
+            self.scene.DrawOn()
+
+    def Depth(self, x0, y0, x1, y1):
+        """
+        Retrieve the depth of the scene alone, without the overlay.
+
+        :@rtype: numpy.ndarray
+        :@return: The depth values of the inclusive display rectangle,
+                  indexed as [y - y0, x - x0].
+        """
+        if self._Validate():
+            w, h = self.renwin.GetSize()
+            z = vtk_to_numpy(self.zbuffer).reshape(h, w)
+            return z[y0:y1+1, x0:x1+1]
+
+        values = vtk.vtkFloatArray()
+        self.renwin.GetZbufferData(x0, y0, x1, y1, values)
+        return vtk_to_numpy(values).reshape(y1-y0+1, x1-x0+1)
+
+    def _Validate(self):
+        """
+        Capture the scene again if it has changed since it was cached.
+
+        :@rtype: bool
+        :@return: False if the cache cannot be used.
+        """
+        self.SyncCamera()
+        # accumulation buffer rendering does not leave usable buffers
+        if self.renwin.GetAAFrames() or self.renwin.GetFDFrames():
+            return False
+
+        signature = self.Signature()
+        if signature != self.signature:
+            self.misses += 1
+            self._Capture()
+            self.signature = signature
+        else:
+            self.hits += 1
+        return True
+
+    def _Capture(self):
+        """
+        Draw the scene alone into the back buffer and keep its color and
+        depth values.
+        """
+        self.overlay.DrawOff()
+        self.renwin.SwapBuffersOff()
+        try:
+            self.renwin.Render()
+        finally:
+            self.renwin.SwapBuffersOn()
+            self.overlay.DrawOn()
+
+        w, h = self.renwin.GetSize()
+        self.renwin.GetRGBACharPixelData(0, 0, w-1, h-1, 0, self.rgba)
+        self.renwin.GetZbufferData(0, 0, w-1, h-1, self.zbuffer)
+
+    def _Restore(self):
+        """
+        Copy the cached scene back into the back buffer. Capturing leaves
+        the scene in the back buffer too, so this is only strictly needed 
+        after a swap, but is cheap compared to drawing the scene.
+        """
+        w, h = self.renwin.GetSize()
+        self.renwin.SetRGBACharPixelData(0, 0, w-1, h-1, self.rgba, 0)
+        self.renwin.SetZbufferData(0, 0, w-1, h-1, self.zbuffer)
@@ -0,0 +1,240 @@
+'''
+Created on Oct 18, 2026
+
+Picking for the 3D cursor. Mouse move events are coalesced and rate
+limited by a PickScheduler before a picker resolves the position under
+the mouse, either by ray casting (RayCastPicker) or by reading back the
+rendered depth buffer (ZBufferPicker).
+'''
+import json
+import math
+import time
+
+import numpy as np
+import wx
+
+
+def wxPost(delay, func):
+    """
+    Schedule func on the wx event loop after delay seconds. A zero delay
+    still runs func only once the events already queued are handled.
+    """
+    if delay > 0:
+        wx.CallLater(int(math.ceil(delay * 1000)), func)
+    else:
+        wx.CallAfter(func)
+
+
+class PickScheduler(object):
+    """
+    Coalesces cursor positions so that at most one pick is pending at any
+    time and picks are no more frequent than once per interval. A position
+    that arrives while a pick is pending replaces the pending one, so
+    positions that are already stale are never picked.
+    """
+    def __init__(self, pick, interval=1/60.0, post=wxPost, clock=time.time):
+        """
+        :@type pick: func
+        :@param pick: Called with the (x, y) display position to pick.
+        :@type interval: float
+        :@param interval: The minimum time between picks in seconds.
+        :@type post: func
+        :@param post: Schedules a call after a delay in seconds on the
+                      thread that delivers the events.
+        :@type clock: func
+        :@param clock: Returns the current time in seconds.
+        """
+        self.pick = pick
+        self.interval = interval
+        self.post = post
+        self.clock = clock
+        self.pending = None
+        self.scheduled = False
+        self.lastPick = None
+        self.trace = None
+        self.received = 0
+        self.dropped = 0
+        self.latencies = []
+
+    def Post(self, x, y, timestamp=None):
+        """
+        Request a pick at the given display position.
+
+        :@type timestamp: float
+        :@param timestamp: When the event occurred. Defaults to now.
+        """
+        if timestamp is None:
+            timestamp = self.clock()
+        if self.trace is not None:
+            self.trace.append((timestamp, x, y))
+
+        self.received += 1
+        if self.pending is not None:
+            self.dropped += 1
+        self.pending = (x, y, timestamp)
+
+        if not self.scheduled:
+            self.scheduled = True
+            delay = 0
+            if self.lastPick is not None:
+                delay = max(0, self.lastPick + self.interval - self.clock())
+            self.post(delay, self._Fire)
+
+    def Flush(self):
+        """
+        Pick the pending position immediately, e.g. before handling a click
+        that uses the picked position.
+        """
+        self._Fire()
+
+    def _Fire(self):
+        self.scheduled = False
+        if self.pending is None:
+            return
+
+        x, y, timestamp = self.pending
+        self.pending = None
+        self.lastPick = self.clock()
+        self.pick(x, y)
+        self.latencies.append(self.clock() - timestamp)
+
+    def StartRecording(self):
+        """
+        Record every posted position so it can be replayed later.
+        """
+        self.trace = []
+
+    def StopRecording(self):
+        """
+        :@rtype: list
+        :@return: The recorded (timestamp, x, y) events.
+        """
+        trace, self.trace = self.trace, None
+        return trace
+
+    @property
+    def Stats(self):
+        """
+        :@rtype: dict
+        :@return: The number of events received and dropped, picks
+                  performed, and median and 95th percentile latency in
+                  seconds from an event to the end of its pick.
+        """
+        lat = np.array(self.latencies)
+        return {'received': self.received, 'dropped': self.dropped,
+                'picks': len(lat),
+                'median': float(np.median(lat)) if len(lat) else 0.0,
+                'p95': float(np.percentile(lat, 95)) if len(lat) else 0.0}
+
+
+def saveTrace(path, trace):
+    """
+    Write a recorded mouse trace, with timestamps relative to its first
+    event, to a JSON file.
+    """
+    start = trace[0][0] if trace else 0
+    with open(path, 'w') as f:
+        json.dump([(t - start, x, y) for t, x, y in trace], f)
+
+
+def loadTrace(path):
+    """
+    :@rtype: list
+    :@return: The (timestamp, x, y) events of a saved mouse trace.
+    """
+    with open(path) as f:
+        return [tuple(e) for e in json.load(f)]
+
+
+class RayCastPicker(object):
+    """
+    Picks by casting a ray through the scene, using the cell locators
+    registered with the vtkVolumePicker.
+    """
+    def __init__(self, picker, renderer):
+        self.picker = picker
+        self.renderer = renderer
+
+    def Pick(self, x, y):
+        """
+        :@rtype: tuple
+        :@return: The world (position, normal) of the surface under the
+                  display position, or None if nothing was hit.
+        """
+        if not self.picker.Pick(x, y, 0, self.renderer):
+            return None
+        return self.picker.GetPickPosition(), self.picker.GetPickNormal()
+
+
+class ZBufferPicker(object):
+    """
+    Picks by reading the depth of the rendered scene under the cursor
+    and unprojecting it, which costs the same regardless of the size of
+    the scene. The normal is estimated from the depths of the
+    neighbouring pixels. Unlike RayCastPicker, which only hits the IBC 
+    surfaces, it hits any opaque geometry that is drawn, e.g. recorded 
+    bacteria or the fitted ellipsoid.
+    """
+    def __init__(self, renderer, depth):
+        """
+        :@type renderer: vtk.vtkRenderer
+        :@type depth: func
+        :@param depth: Returns the depth values for the inclusive display
+                       rectangle (x0, y0, x1, y1) as a (rows, columns)
+                       array, e.g. SceneCache.Depth.
+        """
+        self.renderer = renderer
+        self.depth = depth
+
+    def Unproject(self, x, y, z):
+        self.renderer.SetDisplayPoint(x, y, z)
+        self.renderer.DisplayToWorld()
+        w = self.renderer.GetWorldPoint()
+        return np.array(w[:3]) / w[3]
+
+    def Pick(self, x, y):
+        """
+        :@rtype: tuple
+        :@return: The world (position, normal) of the surface under the
+                  display position, or None if nothing was drawn there.
+        """
+        width, height = self.renderer.GetRenderWindow().GetSize()
+        if not (0 <= x < width and 0 <= y < height):
+            return None
+
+        x0, y0 = max(x-1, 0), max(y-1, 0)
+        x1, y1 = min(x+1, width-1), min(y+1, height-1)
+        z = self.depth(x0, y0, x1, y1)
+        zc = z[y-y0, x-x0]
+        if zc >= 1.0:
+            return None
+
+        p = self.Unproject(x, y, zc)
+
+        # tangents from the nearest drawn neighbours along each axis
+        tangents = []
+        for (dx, dy) in ((1, 0), (0, 1)):
+            t = None
+            for s in (1, -1):
+                nx, ny = x + s*dx, y + s*dy
+                if x0 <= nx <= x1 and y0 <= ny <= y1 and z[ny-y0, nx-x0] < 1.0:
+                    t = s * (self.Unproject(nx, ny, z[ny-y0, nx-x0]) - p)
+                    break
+            tangents.append(t)
+
+        camera = self.renderer.GetActiveCamera()
+        toCamera = np.array(camera.GetPosition()) - p
+        if tangents[0] is None or tangents[1] is None:
+            n = toCamera
+        else:
+            n = np.cross(tangents[0], tangents[1])
+            if np.dot(n, toCamera) < 0:
+                n = -n
+
+        length = np.linalg.norm(n)
+        if length == 0:
+            n = np.array(camera.GetDirectionOfProjection()) * -1
+        else:
+            n = n / length
+
+        return tuple(p), tuple(n)
@@ -0,0 +1,106 @@
+'''
+Created on Oct 18, 2026
+
+Storage for the intermediate outputs of a multi-stage VTK pipeline so
+that a parameter change only re-executes the stages that depend on it.
+'''
+from collections import OrderedDict
+
+
+class StageCache(object):
+    """
+    Keeps the outputs of named pipeline stages, keyed by the parameters
+    that produced them. Each stage holds a limited number of outputs and
+    the least recently used output is dropped first.
+
+    The stages reused or computed since the last call to BeginRun are
+    recorded so that callers can report what work was actually done.
+    """
+    def __init__(self, capacity=None, default=1):
+        """
+        :@type capacity: dict
+        :@param capacity: The number of outputs to keep for each stage name.
+        :@type default: int
+        :@param default: The number of outputs to keep for stages not
+                         listed in capacity.
+        """
+        self.capacity = capacity if capacity is not None else {}
+        self.default = default
+        self.entries = {}
+        self.reused = []
+        self.computed = []
+
+    def BeginRun(self):
+        """
+        Reset the record of reused and computed stages.
+        """
+        self.reused = []
+        self.computed = []
+
+    def Get(self, stage, key):
+        """
+        Retrieve the stored output of stage for the given parameters.
+
+        :@type stage: str
+        :@param stage: The name of the pipeline stage.
+        :@type key: tuple
+        :@param key: The (hashable) parameters the output depends on.
+        :@rtype: vtk.vtkDataObject
+        :@return: The stored output, or None if it has not been computed.
+        """
+        outputs = self.entries.get(stage)
+        if outputs is None or key not in outputs:
+            return None
+
+        output = outputs.pop(key)
+        outputs[key] = output
+        self.reused.append(stage)
+        return output
+
+    def Find(self, stage, match):
+        """
+        Retrieve a stored output of stage whose key satisfies match, for
+        stages whose outputs can serve requests beyond an exact key.
+
+        :@type match: func
+        :@param match: Called with each stored key, returns True if the
+                       corresponding output can be used.
+        :@rtype: tuple
+        :@return: The matching (key, output), or (None, None).
+        """
+        for key in reversed(self.entries.get(stage, {}).keys()):
+            if match(key):
+                return key, self.Get(stage, key)
+        return None, None
+
+    def Put(self, stage, key, output):
+        """
+        Store a newly computed stage output.
+        """
+        outputs = self.entries.setdefault(stage, OrderedDict())
+        outputs.pop(key, None)
+        outputs[key] = output
+        self.computed.append(stage)
+
+        while len(outputs) > self.capacity.get(stage, self.default):
+            outputs.popitem(last=False)
+
+    def Invalidate(self, stage=None):
+        """
+        Discard the stored outputs of one stage, or of all stages.
+        """
+        if stage is None:
+            self.entries = {}
+        else:
+            self.entries.pop(stage, None)
+
+    @property
+    def Report(self):
+        """
+        A one-line summary of the stages reused and computed in the
+        last run.
+
+        :@rtype: str
+        """
+        return "reused: %s; computed: %s" % (', '.join(self.reused) or '-',
+                                             ', '.join(self.computed) or '-')
@@ -0,0 +1,178 @@
+'''
+Created on Oct 18, 2026
+
+Timing and memory instrumentation for VTK pipelines. Each executed stage
+is recorded with its wall time and the size of its output so that slow
+loads can be traced to a particular filter and compared across datasets
+and machines.
+'''
+from collections import namedtuple
+from contextlib import contextmanager
+import json
+import os
+import threading
+import time
+
+# One executed pipeline stage. start and duration are in seconds, start
+# relative to the creation of the PipelineTimer. memory is the output's
+# GetActualMemorySize() in kibibytes.
+StageRecord = namedtuple('StageRecord', 'run layer stage start duration '
+                                        'voxels points cells memory thread')
+
+
+def dataSize(data):
+    """
+    Measure the output of a pipeline stage.
+
+    :@type data: vtk.vtkDataObject
+    :@rtype: tuple
+    :@return: The number of voxels, points and cells, and the actual
+              memory size in kibibytes. Image data report voxels only;
+              other data sets report points and cells.
+    """
+    if data is None:
+        return 0, 0, 0, 0
+
+    memory = data.GetActualMemorySize()
+    if data.IsA('vtkImageData'):
+        return data.GetNumberOfPoints(), 0, 0, memory
+    if data.IsA('vtkDataSet'):
+        return 0, data.GetNumberOfPoints(), data.GetNumberOfCells(), memory
+    return 0, 0, 0, memory
+
+
+class PipelineTimer(object):
+    """
+    Collects StageRecords from any number of pipelines and threads.
+    """
+    def __init__(self):
+        self.origin = time.time()
+        self.records = []
+        self.runs = 0
+        self.lock = threading.Lock()
+
+    def BeginRun(self):
+        """
+        :@rtype: int
+        :@return: A new identifier to group the stages of one execution.
+        """
+        with self.lock:
+            self.runs += 1
+            return self.runs
+
+    def Add(self, run, layer, stage, start, end, output=None):
+        """
+        Record an executed stage.
+
+        :@type start: float
+        :@param start: The time.time() at which the stage started.
+        :@type output: vtk.vtkDataObject
+        :@param output: The output of the stage, to be measured.
+        """
+        record = StageRecord(run, layer, stage, start - self.origin,
+                             end - start, *dataSize(output),
+                             thread=threading.current_thread().name)
+        with self.lock:
+            self.records.append(record)
+
+    def Watch(self, algorithm, run, layer, stage):
+        """
+        Record each execution of a VTK algorithm using its StartEvent and
+        EndEvent. Executions pulled by a downstream Update are included.
+
+        :@type algorithm: vtk.vtkAlgorithm
+        :@rtype: vtk.vtkAlgorithm
+        :@return: The algorithm.
+        """
+        started = []
+
+        def onStart(obj, event):
+            started.append(time.time())
+
+        def onEnd(obj, event):
+            if started:
+                self.Add(run, layer, stage, started.pop(), time.time(),
+                         obj.GetOutputDataObject(0))
+
+        algorithm.AddObserver('StartEvent', onStart)
+        algorithm.AddObserver('EndEvent', onEnd)
+        return algorithm
+
+    @contextmanager
+    def Time(self, run, layer, stage, output=None):
+        """
+        Record the code run within a with block as a stage.
+
+        :@type output: func
+        :@param output: Returns the output of the stage once the block
+                        has finished.
+        """
+        start = time.time()
+        yield
+        self.Add(run, layer, stage, start, time.time(),
+                 output() if output is not None else None)
+
+    def Run(self, run):
+        """
+        :@rtype: list
+        :@return: The StageRecords of one execution, in order of completion.
+        """
+        with self.lock:
+            return [r for r in self.records if r.run == run]
+
+    def Summary(self, run):
+        """
+        Format the stages of one execution as a table for the output pane.
+
+        :@rtype: str
+        """
+        records = self.Run(run)
+        if not records:
+            return 'Pipeline run %i: all stages reused' % run
+
+        lines = ['Pipeline run %i (%s): %.3fs' % (run, records[0].layer,
+                                                   sum(r.duration for r in records))]
+        for r in records:
+            lines.append('  %-16s %8.3fs  vox=%-10i pts=%-9i cells=%-9i %8.1f MiB' %
+                         (r.stage, r.duration, r.voxels, r.points, r.cells,
+                          r.memory / 1024.0))
+        return '\n'.join(lines)
+
+    def Clear(self):
+        with self.lock:
+            self.records = []
+
+    def WriteJSON(self, path):
+        """
+        Write every record as a list of JSON objects.
+        """
+        with self.lock:
+            records = [r._asdict() for r in self.records]
+        with open(path, 'w') as f:
+            json.dump({'records': records}, f, indent=1)
+
+    def WriteChromeTrace(self, path):
+        """
+        Write every record as a complete ('X') event in the Chrome trace
+        event format, which can be loaded in chrome://tracing or Perfetto.
+        """
+        pid = os.getpid()
+        with self.lock:
+            records = list(self.records)
+
+        events = []
+        threads = {}
+        for r in records:
+            tid = threads.setdefault(r.thread, len(threads) + 1)
+            events.append({'name': r.stage, 'cat': str(r.layer), 'ph': 'X',
+                           'ts': int(r.start * 1e6), 'dur': int(r.duration * 1e6),
+                           'pid': pid, 'tid': tid,
+                           'args': {'run': r.run, 'voxels': r.voxels,
+                                    'points': r.points, 'cells': r.cells,
+                                    'memoryKiB': r.memory}})
+        for name, tid in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid,
+                           'tid': tid, 'args': {'name': name}})
+
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
@@ -21,6 +21,8 @@ class RenderActionsPanel(wx.Panel):
         self.lblSizer.Add(wx.StaticText(self, wx.ID_ANY, "Recorded Bacteria: "), 0, wx.ALIGN_CENTER)
         self.lblSizer.Add(self.lblRecordedBacteria, 0, wx.ALIGN_CENTER)
         self.Sizer.Add(self.lblSizer, 0, wx.ALIGN_CENTER | wx.BOTTOM, 5)
+        self.lblLiveStats = wx.StaticText(self, wx.ID_ANY, "", style=wx.ALIGN_CENTER)
+        self.Sizer.Add(self.lblLiveStats, 0, wx.ALIGN_CENTER | wx.BOTTOM, 5)
         
         # Buttons
         self.cmdRecord = wx.Button(self, wx.NewId(), "Record Bacterium")
@@ -31,26 +33,42 @@ class RenderActionsPanel(wx.Panel):
         self.cmdSizer.Add(self.cmdUndo, 0, wx.ALIGN_LEFT | wx.ALL, 5)
         
         self.Sizer.Add(self.cmdSizer, 0, wx.ALIGN_CENTER)
+        
+        # keep the labels current however bacteria are recorded or deleted
+        self.countPending = False
+        DataStore.AddObserver('BacteriumAdded', self.OnBacteriaChanged)
+        DataStore.AddObserver('BacteriumRemoved', self.OnBacteriaChanged)
+        self.UpdateBacteriaCount()
 
         
         
     # EVENT HANDLING    
     def cmdRecord_click(self, event):
         self.renderPanel.RecordBacterium()
-        self.UpdateBacteriaCount()
         
     def cmdUndo_click(self, event):
         self.renderPanel.DeleteBacterium()
-        self.UpdateBacteriaCount()
         
         
         
+    def OnBacteriaChanged(self, bact):
+        """
+        Schedule a single update of the labels for however many bacteria 
+        change before the GUI is next idle, e.g. while a project loads.
+        """
+        if not self.countPending:
+            self.countPending = True
+            wx.CallAfter(self.UpdateBacteriaCount)
+        
     def UpdateBacteriaCount(self):
         """
         Updates the visible count of recorded bacteria on the panel by 
-        checking the DataStore. 
+        checking the DataStore, and the live community statistics. 
         """
+        self.countPending = False
         self.lblRecordedBacteria.Label = str(len(DataStore.Bacteria()))
+        self.lblLiveStats.Label = self.renderPanel.liveStats.Summary()
+        self.Layout()
 
 
 
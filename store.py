@@ -7,6 +7,9 @@ This module contains classes used for storing rendering data.
 """
 from operator import itemgetter
 
+import numpy as np
+from scipy.spatial import cKDTree
+
 class DataStore(object):
     """
     DataStore is meant to be used as a pseudo-database of bacteria and marker objects.
@@ -18,6 +21,13 @@ class DataStore(object):
     _bacteriaActors = []
     _bacteria = []
     _imageSets = {}
+    # spatial indices, rebuilt on the first query after a change
+    _markerIndex = None
+    _bacteriaIndex = None
+    # event name -> functions called with the bacterium concerned
+    _observers = {}
+    # the markers, morphologies and orientations of _bacteria as arrays
+    _columns = None
     
     def __init__(self):
         pass
@@ -32,6 +42,18 @@ class DataStore(object):
         """
         # add to the store 
         cls._markers.append(marker)
+        cls._markerIndex = None
+    
+    @classmethod
+    def RemoveMarker(cls, idx):
+        """
+        Removes the marker at the specified index.
+        
+        :@type idx: int
+        :@param idx: The index of the marker in Markers().
+        """
+        del cls._markers[idx]
+        cls._markerIndex = None
     
     @classmethod
     def ClearMarkers(cls):
@@ -39,6 +61,7 @@ class DataStore(object):
         Removes all markers instance at the specified index
         """
         cls._markers = []
+        cls._markerIndex = None
 
     @classmethod
     def Markers(cls):
@@ -63,12 +86,68 @@ class DataStore(object):
 
     @classmethod
     def AddBacterium(cls, bact):
+        columns = cls.Columns()
         cls._bacteria.append(bact)
+        columns.Append(bact)
+        cls._bacteriaIndex = None
+        cls._Notify('BacteriumAdded', bact)
+    
+    @classmethod
+    def RemoveBacterium(cls, idx):
+        """
+        Removes the bacterium, and its actor if it has one, at the 
+        specified index.
+        
+        :@type idx: int
+        :@param idx: The index of the bacterium in Bacteria().
+        """
+        columns = cls.Columns()
+        bact = cls._bacteria.pop(idx)
+        columns.Delete(idx)
+        if cls._bacteriaActors:
+            del cls._bacteriaActors[idx]
+        cls._bacteriaIndex = None
+        cls._Notify('BacteriumRemoved', bact)
+    
+    @classmethod
+    def AddObserver(cls, event, callback):
+        """
+        Register a function to be called whenever a bacterium is added 
+        to or removed from the store.
+        
+        :@type event: str
+        :@param event: 'BacteriumAdded' or 'BacteriumRemoved'
+        :@type callback: func
+        :@param callback: Called with the data.objects.Bacterium concerned.
+        """
+        cls._observers.setdefault(event, []).append(callback)
+    
+    @classmethod
+    def RemoveObserver(cls, event, callback):
+        if callback in cls._observers.get(event, []):
+            cls._observers[event].remove(callback)
+    
+    @classmethod
+    def _Notify(cls, event, bact):
+        for callback in list(cls._observers.get(event, [])):
+            callback(bact)
     
     @classmethod
     def Bacteria(cls):
         return cls._bacteria
     
+    @classmethod
+    def Columns(cls):
+        """
+        :@rtype: BacteriaColumns
+        :@return: The recorded bacteria as arrays, in the order of Bacteria().
+        """
+        if cls._columns is None:
+            cls._columns = BacteriaColumns()
+            for bact in cls._bacteria:
+                cls._columns.Append(bact)
+        return cls._columns
+    
     @classmethod
     def BacteriaMarkers(cls):
         """
@@ -76,18 +155,73 @@ class DataStore(object):
         2D array (3xN) such that each column lists the x,y,z components
         for a single point.
         
-        :@rtype: list
-        :@return: A 2D list (3xN) where each row is an x,y,z component 
+        :@rtype: numpy.ndarray
+        :@return: A 2D array (3xN) where each row is an x,y,z component 
                   of a single point in 3D space corresponding to a 
-                  user-marked point on a bacterium.
+                  user-marked point on a bacterium. This is a view of 
+                  the stored markers and must not be modified.
+        """
+        return cls.Columns().Coords.T
+    
+    @classmethod
+    def NearestMarker(cls, pos, maxDist=np.inf):
         """
-        m = []
-        for bact in cls._bacteria:
-            m[0].extend([marker.x for marker in bact.Markers])
-            m[1].extend([marker.y for marker in bact.Markers])
-            m[2].extend([marker.z for marker in bact.Markers])
+        Finds the placed marker closest to a point.
         
-        return m
+        :@type pos: Vec3f
+        :@type maxDist: float
+        :@param maxDist: Markers further than this from pos are ignored.
+        :@rtype: tuple
+        :@return: The (index, distance) of the closest marker, or 
+                  (None, None) if there is none within maxDist.
+        """
+        return cls._MarkerIndex().Nearest(pos, maxDist)
+    
+    @classmethod
+    def MarkersWithin(cls, pos, radius):
+        """
+        :@rtype: list
+        :@return: The sorted indices of the placed markers within radius 
+                  of pos.
+        """
+        return cls._MarkerIndex().Within(pos, radius)
+    
+    @classmethod
+    def NearestBacterium(cls, pos, maxDist=np.inf):
+        """
+        Finds the recorded bacterium with a marker closest to a point.
+        
+        :@type pos: Vec3f
+        :@type maxDist: float
+        :@param maxDist: Markers further than this from pos are ignored.
+        :@rtype: tuple
+        :@return: The (index, distance) of the closest bacterium, or 
+                  (None, None) if there is none within maxDist.
+        """
+        return cls._BacteriaIndex().Nearest(pos, maxDist)
+    
+    @classmethod
+    def BacteriaWithin(cls, pos, radius):
+        """
+        :@rtype: list
+        :@return: The sorted indices of the recorded bacteria with a 
+                  marker within radius of pos.
+        """
+        return cls._BacteriaIndex().Within(pos, radius)
+    
+    @classmethod
+    def _MarkerIndex(cls):
+        if cls._markerIndex is None:
+            points = [position(marker) for marker in cls._markers]
+            cls._markerIndex = PointIndex(points, range(len(points)))
+        return cls._markerIndex
+    
+    @classmethod
+    def _BacteriaIndex(cls):
+        if cls._bacteriaIndex is None:
+            columns = cls.Columns()
+            cls._bacteriaIndex = PointIndex(columns.Coords, columns.Owners())
+        return cls._bacteriaIndex
     
     @classmethod
     def IsEmpty(cls):
@@ -132,6 +266,168 @@ class DataStore(object):
         
         
         
+def position(marker):
+    """
+    :@type marker: vtk.vtkActor, Vec3f, or tuple
+    :@rtype: tuple
+    :@return: The x,y,z location of a marker.
+    """
+    if hasattr(marker, 'GetCenter'):
+        return marker.GetCenter()
+    if hasattr(marker, 'toTuple'):
+        return marker.toTuple()
+    return tuple(marker)
+
+
+class PointIndex(object):
+    """
+    A KD-tree over a set of points, each of which belongs to an owner 
+    (e.g. the markers of a bacterium), for nearest neighbour and radius 
+    queries by owner.
+    """
+    def __init__(self, points, owners):
+        """
+        :@type points: list
+        :@param points: x,y,z tuples.
+        :@type owners: list
+        :@param owners: The owner (an int) of each point.
+        """
+        self.owners = np.array(owners, dtype=int)
+        self.tree = None
+        if len(points):
+            self.tree = cKDTree(np.array(points, dtype=float))
+    
+    def Nearest(self, pos, maxDist=np.inf):
+        """
+        :@rtype: tuple
+        :@return: The (owner, distance) of the point closest to pos, or 
+                  (None, None) if there is none within maxDist.
+        """
+        if self.tree is None:
+            return None, None
+        dist, i = self.tree.query(position(pos))
+        if dist > maxDist:
+            return None, None
+        return int(self.owners[i]), float(dist)
+    
+    def Within(self, pos, radius):
+        """
+        :@rtype: list
+        :@return: The sorted owners of the points within radius of pos.
+        """
+        if self.tree is None:
+            return []
+        idx = self.tree.query_ball_point(position(pos), radius)
+        return sorted(set(self.owners[idx].tolist()))
+
+
+# morphology codes, by the number of markers of a bacterium
+COCCUS, BACILLUS, FILAMENT = range(3)
+
+
+class BacteriaColumns(object):
+    """
+    The markers of a list of bacteria stored as one contiguous (N x 3) 
+    float64 array, with each bacterium's markers in the rows 
+    offsets[i]:offsets[i+1] (as in a CSR sparse matrix), alongside a 
+    morphology code and an orientation per bacterium.
+    
+    The arrays are allocated with spare capacity that doubles when full, 
+    so appending is amortized O(1). Deleting shifts the rows after the 
+    deleted bacterium down in place, which keeps the order of the 
+    bacteria (and so their indices) the same as in the DataStore.
+    
+    The Coords, Offsets, Morphology and Orientation properties are views 
+    of the live rows; they are only valid until the next change.
+    """
+    def __init__(self, capacity=64):
+        self.count = 0
+        self.nMarkers = 0
+        self.coords = np.zeros((capacity, 3))
+        self.offsets = np.zeros(capacity + 1, dtype=np.int64)
+        self.morphology = np.zeros(capacity, dtype=np.int8)
+        self.orientation = np.zeros((capacity, 3))
+    
+    def Append(self, bact):
+        """
+        :@type bact: data.objects.Bacterium
+        """
+        markers = [position(marker) for marker in bact.Markers]
+        n = len(markers)
+        self._Reserve(self.count + 1, self.nMarkers + n)
+        
+        self.coords[self.nMarkers:self.nMarkers+n] = markers
+        self.nMarkers += n
+        self.morphology[self.count] = min(n, 3) - 1
+        self.orientation[self.count] = position(bact.Orientation)
+        self.count += 1
+        self.offsets[self.count] = self.nMarkers
+    
+    def Delete(self, idx):
+        """
+        :@type idx: int
+        :@param idx: The index of the bacterium; negative indices count 
+                     from the end.
+        """
+        if idx < 0:
+            idx += self.count
+        if not 0 <= idx < self.count:
+            raise IndexError('bacterium index out of range')
+        
+        start, end = self.offsets[idx], self.offsets[idx+1]
+        n = end - start
+        self.coords[start:self.nMarkers-n] = self.coords[end:self.nMarkers]
+        self.offsets[idx+1:self.count] = self.offsets[idx+2:self.count+1] - n
+        self.morphology[idx:self.count-1] = self.morphology[idx+1:self.count]
+        self.orientation[idx:self.count-1] = self.orientation[idx+1:self.count]
+        self.count -= 1
+        self.nMarkers -= n
+    
+    def Markers(self, idx):
+        """
+        :@rtype: numpy.ndarray
+        :@return: A view of the (n x 3) markers of a bacterium.
+        """
+        return self.coords[self.offsets[idx]:self.offsets[idx+1]]
+    
+    def Owners(self):
+        """
+        :@rtype: numpy.ndarray
+        :@return: The index of the bacterium owning each row of Coords.
+        """
+        return np.repeat(np.arange(self.count), np.diff(self.Offsets))
+    
+    @property
+    def Coords(self):
+        return self.coords[:self.nMarkers]
+    
+    @property
+    def Offsets(self):
+        return self.offsets[:self.count+1]
+    
+    @property
+    def Morphology(self):
+        return self.morphology[:self.count]
+    
+    @property
+    def Orientation(self):
+        return self.orientation[:self.count]
+    
+    def _Reserve(self, count, nMarkers):
+        if nMarkers > len(self.coords):
+            self.coords = self._Grown(self.coords, nMarkers)
+        if count > len(self.morphology):
+            self.offsets = self._Grown(self.offsets, count + 1)
+            self.morphology = self._Grown(self.morphology, count)
+            self.orientation = self._Grown(self.orientation, count)
+    
+    def _Grown(self, a, size):
+        capacity = max(2 * len(a), size)
+        grown = np.zeros((capacity,) + a.shape[1:], dtype=a.dtype)
+        grown[:len(a)] = a
+        return grown
+
+
 class ImageSet(object):
     def __init__(self, ID, color, filepaths):
         self.id = ID
@@ -1,6 +1,8 @@
 # 3D Vector Class
 import math
 
+import numpy as np
+
 class Vec2f(object):
     def __init__(self, x, y):
         self.x = x
@@ -45,6 +47,9 @@ class Vec2f(object):
         return '<%f, %f>' % (self.x, self.y)
 
 class Vec3f(object):
+    # no per-instance __dict__; the bacteria hold one of these per marker
+    __slots__ = ('x', 'y', 'z')
+    
     def __init__(self, x=0, y=0, z=0):
         if isinstance(x, tuple) or isinstance(x, list):
             self.x = x[0]
@@ -74,7 +79,7 @@ class Vec3f(object):
     
     def dot(self, other):
         """Performs the dot product with the provided vector and returns a scalar"""
-        return sum([self.x*other.x, self.y*other.y, self.z*other.z]) 
+        return self.x*other.x + self.y*other.y + self.z*other.z
     
     def cross(self, other):
         """Performs the cross product with the provided vector and returns a new Vec3f"""
@@ -119,44 +124,152 @@ class Vec3f(object):
     def __rmul__(self, other):
         return self.__mul__(other)
     
-    def __neg__(self):
-        return Vec3f(-self.x, -self.y, -self.z)
-        
-    def __str__(self):
-        return '<%f, %f, %f>' % (self.x, self.y, self.z)
-  
-    def __repr__(self):
-        return '<%f, %f, %f>' % (self.x, self.y, self.z)
-    
-    
-    
-    
-    
-    
+    def __div__(self, other):
+        return Vec3f(self.x / other, self.y / other, self.z / other)
     
+    __truediv__ = __div__
     
+    def __neg__(self):
+        return Vec3f(-self.x, -self.y, -self.z)
     
+    ## IN-PLACE OPERATORS (no new Vec3f is allocated) ##
     
+    def __iadd__(self, other):
+        if (isinstance(other, int) or isinstance(other, float)):
+            self.x += other; self.y += other; self.z += other
+        else:
+            self.x += other.x; self.y += other.y; self.z += other.z
+        return self
     
+    def __isub__(self, other):
+        if (isinstance(other, int) or isinstance(other, float)):
+            self.x -= other; self.y -= other; self.z -= other
+        else:
+            self.x -= other.x; self.y -= other.y; self.z -= other.z
+        return self
     
+    def __imul__(self, other):
+        if (isinstance(other, int) or isinstance(other, float)):
+            self.x *= other; self.y *= other; self.z *= other
+        else:
+            self.x *= other.x; self.y *= other.y; self.z *= other.z
+        return self
     
+    def __idiv__(self, other):
+        self.x /= other; self.y /= other; self.z /= other
+        return self
     
+    __itruediv__ = __idiv__
     
+    ## PICKLING ##
+    # The state is kept as a dict so project files saved before Vec3f 
+    # was slotted still load, and vice versa.
     
+    def __getstate__(self):
+        return {'x': self.x, 'y': self.y, 'z': self.z}
     
+    def __setstate__(self, state):
+        self.x = state['x']
+        self.y = state['y']
+        self.z = state['z']
+        
+    def __str__(self):
+        return '<%f, %f, %f>' % (self.x, self.y, self.z)
+  
+    def __repr__(self):
+        return '<%f, %f, %f>' % (self.x, self.y, self.z)
+
+
+class Vec3fArray(object):
+    """
+    A batch of 3D vectors stored as the rows of an (N x 3) float array, 
+    with the Vec3f operations applied to every row at once.
+    """
+    def __init__(self, data):
+        """
+        :@type data: numpy.ndarray or list
+        :@param data: An (N x 3) array, or a list of Vec3f or x,y,z tuples.
+        """
+        if not isinstance(data, np.ndarray):
+            data = [v.toTuple() if isinstance(v, Vec3f) else v for v in data]
+        self.data = np.asarray(data, dtype=float).reshape(-1, 3)
     
+    def __len__(self):
+        return len(self.data)
     
+    def __getitem__(self, idx):
+        """
+        :@rtype: Vec3f or Vec3fArray
+        :@return: A Vec3f copy for an integer index, or a Vec3fArray view 
+                  for a slice or index array.
+        """
+        if isinstance(idx, (int, long, np.integer)):
+            return Vec3f(*self.data[idx].tolist())
+        return Vec3fArray(self.data[idx])
     
+    def length(self):
+        """
+        :@rtype: numpy.ndarray
+        :@return: The length of each vector.
+        """
+        return np.sqrt(np.einsum('ij,ij->i', self.data, self.data))
     
+    def normalize(self):
+        """Scales each vector, in place, to unit length"""
+        self.data /= self.length()[:, np.newaxis]
     
+    def dot(self, other):
+        """
+        :@type other: Vec3fArray or Vec3f
+        :@rtype: numpy.ndarray
+        :@return: The dot product of each pair of rows, or of each row with 
+                  a single Vec3f.
+        """
+        return (self.data * _rows(other)).sum(axis=1)
     
+    def cross(self, other):
+        return Vec3fArray(np.cross(self.data, _rows(other)))
     
+    def midpoint(self, other):
+        return Vec3fArray((self.data + _rows(other)) / 2.0)
     
+    def toList(self):
+        """
+        :@rtype: list
+        :@return: The vectors as a list of Vec3f.
+        """
+        return [Vec3f(*row) for row in self.data.tolist()]
     
+    def __add__(self, other):
+        return Vec3fArray(self.data + _rows(other))
     
+    def __sub__(self, other):
+        return Vec3fArray(self.data - _rows(other))
     
+    def __mul__(self, other):
+        return Vec3fArray(self.data * _rows(other))
     
+    __rmul__ = __mul__
     
+    def __div__(self, other):
+        return Vec3fArray(self.data / _rows(other))
     
+    __truediv__ = __div__
     
+    def __neg__(self):
+        return Vec3fArray(-self.data)
     
+    def __repr__(self):
+        return 'Vec3fArray(%s)' % repr(self.data)
+
+
+def _rows(other):
+    """
+    The operand of a Vec3fArray operation as something that broadcasts 
+    against its (N x 3) data.
+    """
+    if isinstance(other, Vec3fArray):
+        return other.data
+    if isinstance(other, Vec3f):
+        return np.array(other.toTuple(), dtype=float)
+    return other
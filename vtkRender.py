@@ -1,17 +1,42 @@
-from calc.fitting import fitEllipsoid
+from calc.fitting import (bacterialUnionVolume, communityEllipsoid, 
+                          communitySphere, ellipsoidActor, ellipsoidReport, 
+                          sphereActor, sphereReport)
+from calc.live import LiveStats
 from calc.stat import communityDistanceStats, communityOrientationStats
 from data.util import NoBacteria
 from render.ibc import IBCRenderer
 from render.bacteria import BacteriaLayer
-from render.basic import boolInt
+from render.basic import Color, boolInt
+from render.batch import BatchItem
+from render.overlay import SceneCache
+from render.picking import PickScheduler, RayCastPicker, ZBufferPicker, saveTrace
+from render.timing import PipelineTimer
 from store import DataStore
 from vector import Vec3f
 from wxVTK.wxVTKRenderWindowInteractor import wxVTKRenderWindowInteractor
 
 import math
+import os.path
+import time
 import vtk
 import wx
 
+# Frame rate that level of detail props aim for while the view is moving
+INTERACTIVE_UPDATE_RATE = 30
+# Minimum time between cursor picks, in seconds
+PICK_INTERVAL = 1/60.0
+# Draw markers and coccoids as one glyph actor each instead of an actor per sphere
+GLYPH_MARKERS = True
+# Draw all bacilli and filaments as one mesh instead of actors per bacterium
+BATCH_BACTERIA = True
+# Default cursor picking method: 'raycast' hits only the IBC surface, 
+# 'zbuffer' hits anything opaque that is drawn (bacteria, coccoid glyphs, 
+# the fitted ellipsoid) but costs the same for any size of scene. 
+# K switches between them.
+PICK_MODE = 'raycast'
+# Folder that recorded mouse traces are saved to (see bench.picking)
+TRACE_DIR = os.path.join(os.path.expanduser('~'), '.prokarymetrics', 'traces')
+
 class IBCRenderPanel(wx.Panel):
     """
     The panel class used for displaying and interacting with 3D microscope data.
@@ -24,8 +49,14 @@ class IBCRenderPanel(wx.Panel):
     :@param ppos_callback: Sets the status of the 3D location of the mouse.
     :@type ao: func
     :@param ao: Updates the output text area on the main frame.
+    :@type status_callback: func
+    :@param status_callback: Sets the main status, e.g. rendering progress.
+    :@type contour_pool: render.contour.ContourPool
+    :@param contour_pool: The processes that image layers extract their 
+                          isosurfaces on.
     """
-    def __init__( self, parent, imode_callback, rmode_callback, ppos_callback, ao, **kwargs ):
+    def __init__( self, parent, imode_callback, rmode_callback, ppos_callback, ao, 
+                  status_callback=None, contour_pool=None, **kwargs ):
         # initialize Panel
         if 'id' not in kwargs:
             kwargs['id'] = wx.ID_ANY
@@ -39,21 +70,31 @@ class IBCRenderPanel(wx.Panel):
         self.setRecordingMode(False)
         
         self.setPickerPos = ppos_callback
+        self.setStatus = status_callback
+        self.contourPool = contour_pool
+        self.pipelineTimer = PipelineTimer()
         
         self.ao = ao
         self.aa = False
         self.firstRender = True
+        self.resetView = False
 
         self.vtkWidget = wxVTKRenderWindowInteractor(self, wx.ID_ANY)
         self.iren = self.vtkWidget._Iren
         self.iren.SetInteractorStyle(vtk.vtkInteractorStyleTrackballCamera())
+        self.iren.SetDesiredUpdateRate(INTERACTIVE_UPDATE_RATE)
         
         self.renderer = vtk.vtkRenderer()
         self.renderer.SetBackground(0,0,0)
+        # cursor cones and in-progress markers are drawn over the cached scene
+        self.overlay = vtk.vtkRenderer()
         self.imageLayer = {}
         self.CISID = -1  # Current Image Set ID
-        self.imageLayer[self.CISID] = IBCRenderer(self.renderer, self.iren.Render)
-        self.bacteriaLayer = BacteriaLayer(self.renderer, self.iren.Render)
+        self.imageLayer[self.CISID] = self._CreateImageLayer()
+        self.bacteriaLayer = BacteriaLayer(self.renderer, self.RenderScene, 
+                                           markerRenderer=self.overlay,
+                                           glyphs=GLYPH_MARKERS,
+                                           batched=BATCH_BACTERIA)
         
         self.viewCamActive = True
         
@@ -61,6 +102,8 @@ class IBCRenderPanel(wx.Panel):
         self.planes = vtk.vtkPlanes()
         
         self.ellipsoid = None
+        self.ellipsoidFit = None
+        self.sphereFit = None
         self.ellipsoidTextActor = None
         
         # The SetInteractor method is how 3D widgets are associated with the
@@ -74,6 +117,18 @@ class IBCRenderPanel(wx.Panel):
         self.vtkWidget.Enable(1)
         self.vtkWidget.AddObserver("ExitEvent", lambda o,e,f=parent: f.Close())
         self.vtkWidget.GetRenderWindow().AddRenderer(self.renderer)
+        self.vtkWidget.GetRenderWindow().AddRenderer(self.overlay)
+        self.sceneCache = SceneCache(self.vtkWidget.GetRenderWindow(), 
+                                     self.renderer, self.overlay)
+        
+        # community statistics updated as bacteria are recorded
+        self.liveStats = LiveStats()
+        
+        # cursor picking
+        self.pickMode = PICK_MODE
+        self.pickPosition = (0, 0, 0)
+        self.pickScheduler = PickScheduler(self.UpdateCursor, PICK_INTERVAL)
+        self.zbufferPicker = ZBufferPicker(self.renderer, self.sceneCache.Depth)
         
         # Bind VTK events
         self.iren.AddObserver("KeyPressEvent", self.OnKeyDown)
@@ -105,12 +160,13 @@ class IBCRenderPanel(wx.Panel):
         self.greenCone.GetProperty().SetColor(0,1,0)
         
         # Add the two cones (or just one, if you want)
-        self.renderer.AddViewProp(self.redCone)
-        self.renderer.AddViewProp(self.greenCone)
+        self.overlay.AddViewProp(self.redCone)
+        self.overlay.AddViewProp(self.greenCone)
         
         self.picker = vtk.vtkVolumePicker()
         self.picker.SetTolerance(1e-6)
         self.picker.SetVolumeOpacityIsovalue(0.1)
+        self.rayPicker = RayCastPicker(self.picker, self.renderer)
         
     def _pickerVisibility(self, visible):
         self.redCone.SetVisibility(boolInt(visible))
@@ -138,18 +194,40 @@ class IBCRenderPanel(wx.Panel):
         selectedOutlineProperty.SetLineWidth(3)
     
 
-    def RenderImageData(self, ID, imgReader):
+    def _CreateImageLayer(self):
+        return IBCRenderer(self.renderer, self.RenderScene, self.contourPool, 
+                           self.setStatus, self.ao, self.pipelineTimer)
+    
+    def RenderImageData(self, ID, imgReader, settings=None, ready_callback=None,
+                        stopped_callback=None):
+        """
+        Create and render the image layer for an image set.
+        
+        :@type settings: dict
+        :@param settings: Saved layer settings to render with from the start.
+        :@type ready_callback: func
+        :@param ready_callback: Called with the layer once its first mesh 
+                                is in place.
+        :@type stopped_callback: func
+        :@param stopped_callback: Called with the layer and a message if its 
+                                  first execution fails or is cancelled.
+        """
         # check if this is the first loaded image set
         if self.CISID == -1:
             self.imageLayer = {}
         
         self.CISID = ID
-        self.imageLayer[self.CISID] = IBCRenderer(self.renderer, self.iren.Render)
+        self.imageLayer[self.CISID] = self._CreateImageLayer()
         self.imageLayer[self.CISID].SetImageSet(ID)
-        locator = self.imageLayer[self.CISID].Render(imgReader)
+        def ready(layer):
+            self.OnImageLayerReady(layer)
+            if ready_callback is not None:
+                ready_callback(layer)
+        
+        locator = self.imageLayer[self.CISID].Render(imgReader, ready, settings, 
+                                                     stopped_callback)
         self.initPicker()
         self.picker.AddLocator(locator)
-        self.initBoxWidgetInteraction(imgReader.VolumeReader.GetOutput())
         
         if self.firstRender:
             self.iren.AddObserver("MouseMoveEvent", self.MoveCursor)
@@ -174,16 +252,37 @@ class IBCRenderPanel(wx.Panel):
             self.picCam.SetFocalPoint(0, -0.25, 0)
             self.picCam.ComputeViewPlaneNormal()
             
+            self.renderer.SetActiveCamera(self.viewCam)
+            self.sceneCache.SyncCamera()
+            self.resetView = True
+            
+            self.firstRender = False
+    
+    def OnImageLayerReady(self, layer):
+        """
+        Called once the background tesselation of a newly rendered image 
+        layer has produced its first mesh.
+        """
+        self.initBoxWidgetInteraction(layer.volumeReader.VolumeReader.GetOutput())
+        
+        if self.resetView:
             # Actors are added to the renderer. An initial camera view is created.
             # The Dolly() method moves the camera towards the FocalPoint,
             # thereby enlarging the image.
-            self.renderer.SetActiveCamera(self.viewCam)
             self.renderer.ResetCamera() 
             self.viewCam.Dolly(1.0)
             self.renderer.ResetCameraClippingRange()
-            self.iren.Render()
-            
-            self.firstRender = False
+            self.resetView = False
+        
+        self.RenderScene()
+    
+    def RenderScene(self):
+        """
+        Render the window after a change to the scene, i.e. anything 
+        other than the cursor cones and in-progress markers.
+        """
+        self.sceneCache.Invalidate()
+        self.iren.Render()
         
     
     def CaptureCamera(self):
@@ -213,7 +312,7 @@ class IBCRenderPanel(wx.Panel):
         then refreshes the render window. 
         """
         self.bacteriaLayer.AddBacterium()
-        self.iren.Render()
+        self.RenderScene()
         
     def RenderStoredBacteria(self):
         self.bacteriaLayer.AddStoredBacteria()
@@ -224,10 +323,8 @@ class IBCRenderPanel(wx.Panel):
         DataStore.ClearMarkers()
         
         for marker in markers:
-            actor = self.bacteriaLayer.CreateMarker(marker)
-            DataStore.AddMarker(actor)
-            self.renderer.AddActor(actor)
-        self.renderer.Render()
+            DataStore.AddMarker(self.bacteriaLayer.PlaceMarker(marker))
+        self.overlay.Render()
         
     def DeleteBacterium(self, idx=None):
         """
@@ -247,12 +344,11 @@ class IBCRenderPanel(wx.Panel):
             idx = -1
         
         # remove actor from renderer
-        self.renderer.RemoveActor(DataStore.BacteriaActors()[idx])
+        self.bacteriaLayer.RemoveBacteriumActor(DataStore.BacteriaActors()[idx])
         
-        del DataStore.Bacteria()[idx]
-        del DataStore.BacteriaActors()[idx]
+        DataStore.RemoveBacterium(idx)
         
-        self.iren.Render()
+        self.RenderScene()
 
     def RenderFittedEllipsoid(self, mve):
         # if fit already exists, clear b/f fitting again
@@ -262,10 +358,30 @@ class IBCRenderPanel(wx.Panel):
         try:
             ds = Vec3f(self.imageLayer[self.CISID].dataSpacing)
             ar = self.bacteriaLayer.actor_radius
-            self.ellipsoid, out = fitEllipsoid(ds, ar, mve)
-            self.ao(out)
+            self.ellipsoidFit = communityEllipsoid(ds, mve)
+            self.ellipsoid = ellipsoidActor(self.ellipsoidFit, ar)
+            self.ao(ellipsoidReport(self.ellipsoidFit))
             self.renderer.AddActor(self.ellipsoid)
-            self.iren.Render()
+            self.RenderScene()
+        except RuntimeError, re:
+            wx.MessageBox(str(re), "Fitting Error", wx.ICON_ERROR | wx.OK)
+    
+    def RenderFittedSphere(self):
+        """
+        Show the minimum enclosing sphere of the recorded bacteria in 
+        place of the fitted ellipsoid.
+        """
+        if self.ellipsoid:
+            self.renderer.RemoveActor(self.ellipsoid)
+            
+        try:
+            ds = Vec3f(self.imageLayer[self.CISID].dataSpacing)
+            ar = self.bacteriaLayer.actor_radius
+            self.sphereFit = communitySphere(ds)
+            self.ellipsoid = sphereActor(self.sphereFit, ar)
+            self.ao(sphereReport(self.sphereFit))
+            self.renderer.AddActor(self.ellipsoid)
+            self.RenderScene()
         except RuntimeError, re:
             wx.MessageBox(str(re), "Fitting Error", wx.ICON_ERROR | wx.OK)
     
@@ -293,6 +409,11 @@ class IBCRenderPanel(wx.Panel):
             colorScheme = Vec3f(2,1,0)
         
         for i, a in enumerate(bacilli):
+            if isinstance(a, BatchItem):
+                a.SetColor(Color((bdots[colorScheme.x][i], 
+                                  bdots[colorScheme.y][i], 
+                                  bdots[colorScheme.z][i])))
+                continue
             aColl = vtk.vtkPropCollection()
             a.GetActors(aColl)
             aColl.InitTraversal()
@@ -303,11 +424,6 @@ class IBCRenderPanel(wx.Panel):
                                                     bdots[colorScheme.y][i], 
                                                     bdots[colorScheme.z][i])
         for j, fID in enumerate(filaments):
-            fColl = vtk.vtkPropCollection()
-            DataStore.BacteriaActors()[fID].GetActors(fColl)
-            fColl.InitTraversal()
-            factors = [fColl.GetNextProp() for _ in range(fColl.GetNumberOfItems())]
-            
             # Set color LUT for filament spline based on marker positions
             colorTransferFunction = vtk.vtkColorTransferFunction()
             
@@ -317,6 +433,16 @@ class IBCRenderPanel(wx.Panel):
                                                     fdots[colorScheme.y][fdotIdx+k],
                                                     fdots[colorScheme.z][fdotIdx+k])
 #                print 'RGB:',fdots[colorScheme.x][fdotIdx+k],fdots[colorScheme.y][fdotIdx+k],fdots[colorScheme.z][fdotIdx+k]
+            
+            filament = DataStore.BacteriaActors()[fID]
+            if isinstance(filament, BatchItem):
+                filament.SetColorFunction(colorTransferFunction)
+                continue
+            
+            fColl = vtk.vtkPropCollection()
+            filament.GetActors(fColl)
+            fColl.InitTraversal()
+            factors = [fColl.GetNextProp() for _ in range(fColl.GetNumberOfItems())]
             # filament spline
             factors[1].GetMapper().SetLookupTable(colorTransferFunction)
             factors[1].GetMapper().ScalarVisibilityOn()
@@ -328,7 +454,7 @@ class IBCRenderPanel(wx.Panel):
             self.setColor(factors[-1], fdotIdx+k, fdots, colorScheme)
             
 
-        self.iren.Render()
+        self.RenderScene()
         
     def setColor(self, actor, idx, dots, cs):
         actor.GetProperty().SetDiffuseColor(dots[cs.x][idx], 
@@ -336,9 +462,20 @@ class IBCRenderPanel(wx.Panel):
                                             dots[cs.z][idx])
     
 
-    def CalculateCommunityDensity(self):
+    def CalculateBacteriaVolume(self):
+        if NoBacteria(): return
+        ds = Vec3f(self.imageLayer[self.CISID].dataSpacing)
+        union = bacterialUnionVolume(ds)
+        self.ao("Bacteria Volume (union):\t%f" % union.volume)
+        self.ao("Bacteria Volume (summed):\t%f" % union.summedVolume)
+        self.ao("Overlap fraction:\t%f" % union.overlap)
+    
+    def CalculateCommunityDensity(self, nearest=False):
         if NoBacteria(): return
-        ds = communityDistanceStats()
+        ds = communityDistanceStats(nearest)
+        if ds is None:
+            self.ao('At least two coccoids or bacilli are needed for distance stats')
+            return
         self.ao(str(ds))
     
     # ACCESSORS/MODIFIERS
@@ -385,36 +522,22 @@ class IBCRenderPanel(wx.Panel):
     # MOUSE HANDLING
     def LeftClick(self, iren, event):
         if self.recordingMode:
-            pos = Vec3f(self.picker.GetPickPosition())
-            actor = self.bacteriaLayer.CreateMarker(pos)
-            self.renderer.AddActor(actor)
-            DataStore.AddMarker(actor)
-            self.iren.Render()
+            self.pickScheduler.Flush()
+            pos = Vec3f(self.pickPosition)
+            DataStore.AddMarker(self.bacteriaLayer.PlaceMarker(pos))
+            self.sceneCache.RenderOverlay()
     
     def RightClick(self, iren, event):
-        pos = Vec3f(self.picker.GetPickPosition())
-        minDist = -1
-        minMarker = None
-        mid = None
-        
-        if not len(DataStore.Markers()):
-            return
-        
-        # find the closest marker to the click position
-        for i, marker in enumerate(DataStore.Markers()):
-            mpos = Vec3f(marker.GetCenter())
-            dlen = (pos - mpos).length()
-            if minDist < 0 or dlen < minDist:
-                minDist = dlen
-                minMarker = marker
-                mid = i
+        self.pickScheduler.Flush()
+        pos = Vec3f(self.pickPosition)
         
         # make sure the user clicked somewhere near a marker before removing
-        if minDist <= self.bacteriaLayer.actor_radius * 2:
-            self.renderer.RemoveActor(minMarker)
-            del DataStore.Markers()[mid]
+        mid, _ = DataStore.NearestMarker(pos, self.bacteriaLayer.actor_radius * 2)
+        if mid is not None:
+            self.bacteriaLayer.RemoveMarker(DataStore.Markers()[mid])
+            DataStore.RemoveMarker(mid)
             
-            self.iren.Render()
+            self.sceneCache.RenderOverlay()
 
     
     # KEY PRESS EVENT HANDLING
@@ -435,6 +558,13 @@ class IBCRenderPanel(wx.Panel):
             self.OnDeleteRequest()
         elif key == 'C':
             self.switchCameras()
+        elif key == 'K':
+            self.pickMode = 'raycast' if self.pickMode == 'zbuffer' else 'zbuffer'
+            self.ao('Cursor picking: %s' % self.pickMode)
+        elif key == 'M':
+            self.ToggleTraceRecording()
+        elif iren.GetKeySym() == 'Escape':
+            self.ImageLayer.CancelExecution()
         elif key == 'A':
             if self.aa:
                 self.aa = False
@@ -451,48 +581,76 @@ class IBCRenderPanel(wx.Panel):
         else:
             self.viewCamActive = True
             self.renderer.SetActiveCamera(self.viewCam)
+        self.sceneCache.SyncCamera()
     
     def OnDeleteRequest(self):
-        minDist = -1
-        bactID = None
-        
         if not len(DataStore.Bacteria()):
             return
         
-        pos = Vec3f(self.picker.GetPickPosition())
-        # find the closest bacterium to the click position
-        for i, bact in enumerate(DataStore.Bacteria()):
-            for _, marker in enumerate(bact.Markers):
-                diff = pos - marker
-                dlen = diff.length()
-                if minDist < 0 or dlen < minDist:
-                    minDist = diff.length()
-                    bactID = i
-        
+        self.pickScheduler.Flush()
+        pos = Vec3f(self.pickPosition)
         # make sure the user clicked somewhere near a marker before removing
-        if minDist <= self.bacteriaLayer.actor_radius * 5:
+        bactID, _ = DataStore.NearestBacterium(pos, 
+                                               self.bacteriaLayer.actor_radius * 5)
+        if bactID is not None:
             self.DeleteBacterium(bactID)
 
  
     def MoveCursor(self, iren, event=""):
-#        self.vtkWidget.GetRenderWindow().HideCursor()
+        # the cursor stays put while the camera is being moved
+        if self.iren.GetInteractorStyle().GetState():
+            return
+        
+        # queued move events are coalesced and only the latest is picked
         x,y = self.iren.GetEventPosition()
-        self.picker.Pick(x, y, 0, self.renderer)
-        p = self.picker.GetPickPosition()
+        self.pickScheduler.Post(x, y)
+    
+    def UpdateCursor(self, x, y):
+        """
+        Pick the surface at the display position and move the cursor 
+        cones there. Positions over the background leave the cursor where 
+        it was.
+        """
+#        self.vtkWidget.GetRenderWindow().HideCursor()
+        picker = self.zbufferPicker if self.pickMode == 'zbuffer' else self.rayPicker
+        hit = picker.Pick(x, y)
+        if hit is None:
+            return
+        
+        p, n = hit
+        self.pickPosition = p
         self.setPickerPos(Vec3f(p))
-        n = self.picker.GetPickNormal()
         self.redCone.SetPosition(p[0],p[1],p[2])
         self.PointCone(self.redCone,n[0],n[1],n[2])
         self.greenCone.SetPosition(p[0],p[1],p[2])
         self.PointCone(self.greenCone,-n[0],-n[1],-n[2])
-        iren.Render()
+        # only the cones moved, so draw them over the cached scene
+        self.sceneCache.RenderOverlay()
+    
+    def ToggleTraceRecording(self):
+        """
+        Start or stop recording the mouse positions posted for picking. 
+        Stopped recordings are saved to TRACE_DIR for replay with 
+        bench.picking.
+        """
+        if self.pickScheduler.trace is None:
+            self.pickScheduler.StartRecording()
+            self.ao('Recording mouse trace (press M to stop)')
+            return
+        
+        trace = self.pickScheduler.StopRecording()
+        if not os.path.isdir(TRACE_DIR):
+            os.makedirs(TRACE_DIR)
+        path = os.path.join(TRACE_DIR, time.strftime('trace-%Y%m%d-%H%M%S.json'))
+        saveTrace(path, trace)
+        self.ao('Saved %i mouse events to %s' % (len(trace), path))
         
         
     def StartInteraction(self, obj, event):
         """
         Lower the rendering resolution to make interaction more smooth.
         """
-        self.vtkWidget.GetRenderWindow().SetDesiredUpdateRate(10)
+        self.vtkWidget.GetRenderWindow().SetDesiredUpdateRate(INTERACTIVE_UPDATE_RATE)
         self._pickerVisibility(False)
     
     def EndInteraction(self, obj, event):
@@ -505,7 +663,7 @@ class IBCRenderPanel(wx.Panel):
         
     def ClipVolumeRender(self, obj, event):
         obj.GetPlanes(self.planes)
-        self.imageLayer[self.CISID].VolumeMapper.SetClippingPlanes(self.planes)
+        self.imageLayer[self.CISID].UpdateClippingPlanes(self.planes)
         
     
     # UTILITY METHODS